@@ -0,0 +1,157 @@
+"""Compares the default requests transport with the HTTP2Adapter against a local stand-in server.
+
+Runs a Deezer-like workload from several threads: gw-style json POSTs, cover images and streamed tracks,
+and prints the time taken and the number of connections the server saw.
+
+Needs hypercorn and httpx[http2]:
+
+    pip install hypercorn httpx[http2]
+    python benchmarks/http2_transport.py
+    python benchmarks/http2_transport.py --cert cert.pem --key key.pem   # over TLS with ALPN
+
+Without a certificate, the HTTP/2 adapter speaks cleartext HTTP/2 with prior knowledge.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+TRACK = os.urandom(2 * 1024 * 1024)
+COVER = os.urandom(30 * 1024)
+
+clients = set()
+
+
+async def app(scope, receive, send):
+    # Stand-in of the gw api and the CDNs, every response takes a few ms of server side work
+    if scope["type"] != "http":
+        return
+
+    clients.add(tuple(scope["client"]))
+
+    while (await receive()).get("more_body"):
+        pass
+
+    await asyncio.sleep(0.005)
+
+    headers = [(b"content-type", b"application/json")]
+
+    if scope["path"].startswith("/images"):
+        body = COVER
+        headers = [(b"content-type", b"image/jpeg")]
+    elif scope["path"].startswith("/mobile"):
+        body = TRACK
+        headers = [(b"content-type", b"audio/mpeg")]
+    else:
+        body = json.dumps({"error": [], "results": {"SNG_ID": "1"}}).encode()
+        headers.append((b"set-cookie", b"sid=abc; Path=/"))
+
+    headers.append((b"content-length", str(len(body)).encode()))
+
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+def serve(port, cert, key, ready, stoppers):
+    from hypercorn.asyncio import serve as hypercorn_serve
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.loglevel = "WARNING"
+
+    if cert:
+        config.certfile = cert
+        config.keyfile = key
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        shutdown = asyncio.Event()
+        stoppers.append(lambda: loop.call_soon_threadsafe(shutdown.set))
+        ready.set()
+
+        await hypercorn_serve(app, config, shutdown_trigger=shutdown.wait)
+
+    asyncio.run(main())
+
+
+def workload(session, base_url, workers, gw_calls, covers, tracks):
+    def gw(i):
+        session.post(f"{base_url}/ajax/gw-light.php", params={"method": "song.getData"},
+                     json={"sng_id": str(i)}).json()
+
+    def cover(i):
+        session.get(f"{base_url}/images/cover/{i}/500x500.jpg").content
+
+    def track(i):
+        with session.get(f"{base_url}/mobile/media/{i}", stream=True) as res:
+            for _ in res.iter_content(16384):
+                pass
+
+    jobs = [(gw, i) for i in range(gw_calls)] + [(cover, i) for i in range(covers)] + \
+        [(track, i) for i in range(tracks)]
+
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(f, i) for f, i in jobs]:
+            future.result()
+
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--gw-calls", type=int, default=400)
+    parser.add_argument("--covers", type=int, default=200)
+    parser.add_argument("--tracks", type=int, default=8)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--cert", help="Serves over TLS with this certificate, give --key as well.")
+    parser.add_argument("--key")
+    parser.add_argument("--url", help="Sends the requests to this address instead, e.g. a proxy adding latency "
+                                      "in front of the server.")
+    args = parser.parse_args()
+
+    from pydeezer import Deezer, HTTP2Adapter
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    ready = threading.Event()
+    stoppers = []
+    threading.Thread(target=serve, args=(port, args.cert, args.key, ready, stoppers), daemon=True).start()
+    ready.wait()
+    time.sleep(0.5)
+
+    base_url = args.url or f"{'https' if args.cert else 'http'}://127.0.0.1:{port}"
+
+    for name in ("requests", "http2"):
+        for run in range(args.runs):
+            # Cleartext HTTP/2 needs prior knowledge, TLS negotiates it with ALPN
+            transport = HTTP2Adapter(http1=bool(args.cert)) if name == "http2" else None
+            deezer = Deezer(transport=transport)
+            deezer.session.trust_env = False
+            deezer.session.verify = args.cert or True
+
+            clients.clear()
+            elapsed = workload(deezer.session, base_url, args.workers, args.gw_calls, args.covers, args.tracks)
+            deezer.session.close()
+
+            print(f"{name:8} run {run + 1}: {elapsed:.2f} s over {len(clients)} connections")
+
+    for stop in stoppers:
+        stop()
+
+
+if __name__ == "__main__":
+    main()
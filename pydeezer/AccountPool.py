@@ -0,0 +1,215 @@
+from contextlib import contextmanager
+import itertools
+import threading
+import time
+
+from pydeezer.constants import error_types
+from pydeezer.exceptions import NoAccountAvailableError
+from pydeezer import util
+
+
+class Account:
+    def __init__(self, client):
+        """A logged in client inside an {AccountPool}, with its health and usage stats
+
+        Arguments:
+            client {Deezer} -- Logged in Deezer instance
+        """
+
+        self.client = client
+        self.qualities = client.get_allowed_qualities()
+
+        self.in_flight = 0
+        self.requests = 0
+        self.successes = 0
+        self.errors = {}
+        self.bytes = 0
+        self.busy_time = 0
+        self.disabled_until = 0
+
+    @property
+    def name(self):
+        return self.client.current_user.get("name")
+
+    @property
+    def healthy(self):
+        return self.disabled_until <= time.time()
+
+    @property
+    def throughput(self):
+        if not self.busy_time:
+            return 0
+
+        return self.bytes / self.busy_time
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "qualities": self.qualities,
+            "healthy": self.healthy,
+            "disabled_until": self.disabled_until or None,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "successes": self.successes,
+            "errors": dict(self.errors),
+            "bytes": self.bytes,
+            "throughput": self.throughput
+        }
+
+
+class AccountPool:
+    LEAST_IN_FLIGHT = "least_in_flight"
+    ROUND_ROBIN = "round_robin"
+
+    def __init__(self, accounts, strategy=LEAST_IN_FLIGHT, cooldown=60):
+        """Holds several logged in accounts and hands them out to the {Downloader} workers.
+        Accounts that hit an auth or rate limit error are taken out of rotation for {cooldown} seconds.
+
+        Arguments:
+            accounts {list} -- List of logged in Deezer instances or of arls to log in with
+
+        Keyword Arguments:
+            strategy {str} -- Either {AccountPool.LEAST_IN_FLIGHT} or {AccountPool.ROUND_ROBIN} (default: {LEAST_IN_FLIGHT})
+            cooldown {int} -- Seconds an account stays out of rotation after an auth or rate limit error (default: {60})
+        """
+
+        from pydeezer import Deezer
+
+        if strategy not in (self.LEAST_IN_FLIGHT, self.ROUND_ROBIN):
+            raise ValueError(f"Unknown account selection strategy {strategy}")
+
+        self.accounts = [Account(Deezer(arl=account) if isinstance(account, str) else account)
+                         for account in accounts]
+
+        if not self.accounts:
+            raise NoAccountAvailableError("The pool needs at least one account.")
+
+        self.strategy = strategy
+        self.cooldown = cooldown
+
+        # An outage of a backend is the same for every account, and so are the album and cover requests
+        self.circuit_breaker = self.accounts[0].client.circuit_breaker
+        self.single_flight = self.accounts[0].client.single_flight
+
+        for account in self.accounts:
+            account.client.circuit_breaker = self.circuit_breaker
+            account.client.single_flight = self.single_flight
+
+        self._lock = threading.Condition()
+        self._rotation = itertools.count()
+
+    @property
+    def arls(self):
+        return [account.client.arl for account in self.accounts]
+
+    def acquire(self, quality=None, timeout=None):
+        """Picks an account, blocks while every account is out of rotation
+
+        Keyword Arguments:
+            quality {str} -- Prefer the accounts allowed to stream this quality, use values from {constants.track_formats}.
+                             Any healthy account is used if none of them is allowed to. (default: {None})
+            timeout {float} -- Maximum seconds to wait for an account, waits forever if None (default: {None})
+
+        Raises:
+            NoAccountAvailableError: Will be raised if no account came back into rotation within {timeout}
+
+        Returns:
+            Account -- The picked account, give it back using {release()}
+        """
+
+        deadline = time.time() + timeout if timeout is not None else None
+
+        with self._lock:
+            while True:
+                account = self._select(quality)
+
+                if account:
+                    account.in_flight += 1
+                    account.requests += 1
+                    return account
+
+                wait = min(account.disabled_until for account in self.accounts) - time.time()
+
+                if deadline is not None:
+                    wait = min(wait, deadline - time.time())
+
+                    if wait <= 0:
+                        raise NoAccountAvailableError(
+                            "Every account is out of rotation.")
+
+                self._lock.wait(max(wait, 0.01))
+
+    def release(self, account, error=None, size=0, elapsed=0):
+        """Gives back an account acquired with {acquire()}
+
+        Arguments:
+            account {Account} -- The acquired account
+
+        Keyword Arguments:
+            error {Exception} -- The error raised while using the account, if any (default: {None})
+            size {int} -- Bytes downloaded with the account (default: {0})
+            elapsed {float} -- Seconds the account was used for (default: {0})
+        """
+
+        with self._lock:
+            account.in_flight -= 1
+            account.bytes += size
+            account.busy_time += elapsed
+
+            if error is None:
+                account.successes += 1
+            else:
+                error_type = util.classify_error(error)
+                account.errors[error_type] = account.errors.get(
+                    error_type, 0) + 1
+
+                if error_type in (error_types.AUTH, error_types.RATE_LIMITED):
+                    account.disabled_until = time.time() + self.cooldown
+
+            self._lock.notify_all()
+
+    @contextmanager
+    def session(self, quality=None):
+        """Acquires an account for the duration of the block, errors raised inside it are recorded
+
+        Keyword Arguments:
+            quality {str} -- See {acquire()} (default: {None})
+
+        Yields:
+            Account -- The acquired account
+        """
+
+        account = self.acquire(quality)
+        start = time.time()
+
+        try:
+            yield account
+        except Exception as e:
+            self.release(account, error=e, elapsed=time.time() - start)
+            raise
+        else:
+            self.release(account, elapsed=time.time() - start)
+
+    def stats(self):
+        """Gets the health and usage stats of every account
+
+        Returns:
+            list -- List of account stats
+        """
+
+        with self._lock:
+            return [account.to_dict() for account in self.accounts]
+
+    def _select(self, quality):
+        healthy = [account for account in self.accounts if account.healthy]
+
+        if not healthy:
+            return None
+
+        candidates = [account for account in healthy
+                      if not quality or quality in account.qualities] or healthy
+
+        if self.strategy == self.ROUND_ROBIN:
+            return candidates[next(self._rotation) % len(candidates)]
+
+        return min(candidates, key=lambda account: account.in_flight)
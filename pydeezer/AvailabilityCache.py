@@ -0,0 +1,141 @@
+from contextlib import contextmanager
+import json
+import sqlite3
+import threading
+import time
+
+
+class AvailabilityCache:
+    def __init__(self, db_path, ttl=7 * 86400):
+        """Qualities each track is available in, as found by an {AvailabilityScanner}, so a scan of the same tracks
+        skips the ones checked recently. Backed by SQLite, safe to share between processes on the same host.
+
+        Arguments:
+            db_path {str} -- Path of the SQLite database, created if it does not exist
+
+        Keyword Arguments:
+            ttl {int} -- Seconds a checked track is trusted for, the catalog and the files of a track change over time (default: {604800})
+        """
+
+        self.db_path = db_path
+        self.ttl = ttl
+
+        self._local = threading.local()
+
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS availability (
+                    track_id TEXT PRIMARY KEY,
+                    title TEXT,
+                    artist TEXT,
+                    sizes TEXT NOT NULL,
+                    source TEXT,
+                    checked_at REAL NOT NULL
+                )
+            """)
+
+    def __reduce__(self):
+        # Sent to other processes without the connections
+        return type(self), (self.db_path, self.ttl)
+
+    @property
+    def _conn(self):
+        # sqlite3 connections can not be shared between threads
+        conn = getattr(self._local, "conn", None)
+
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path, timeout=60, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def get(self, track_id):
+        """Gets the availability of a track
+
+        Arguments:
+            track_id {str} -- Track Id
+
+        Returns:
+            dict -- Entry with the {id}, {title}, {artist}, {sizes} keyed by quality, {source} and {checked_at} of the track,
+                    None if the track was not checked or if its entry has expired
+        """
+
+        return self.get_many([track_id]).get(str(track_id))
+
+    def get_many(self, track_ids):
+        """Gets the availability of many tracks at once
+
+        Arguments:
+            track_ids {list} -- List of track id
+
+        Returns:
+            dict -- Entries keyed by track id, see {get()}, the tracks without a valid entry are left out
+        """
+
+        track_ids = list(dict.fromkeys(str(track_id) for track_id in track_ids))
+        oldest = time.time() - self.ttl
+        entries = {}
+
+        # Below the default limit of 999 parameters of SQLite
+        for i in range(0, len(track_ids), 500):
+            chunk = track_ids[i:i + 500]
+            rows = self._conn.execute(
+                f"SELECT * FROM availability WHERE track_id IN ({', '.join('?' * len(chunk))}) AND checked_at >= ?",
+                chunk + [oldest]).fetchall()
+
+            for row in rows:
+                entries[row["track_id"]] = {
+                    "id": row["track_id"],
+                    "title": row["title"],
+                    "artist": row["artist"],
+                    "sizes": json.loads(row["sizes"]),
+                    "source": row["source"],
+                    "checked_at": row["checked_at"]
+                }
+
+        return entries
+
+    def put_many(self, entries):
+        """Records the availability of many tracks
+
+        Arguments:
+            entries {list} -- Dictionaries with the {id}, {title}, {artist}, {sizes} keyed by quality (0 when the quality
+                              is not available) and {source} of each track, e.g. the results of {AvailabilityScanner.scan()}
+        """
+
+        now = time.time()
+
+        with self._transaction() as conn:
+            conn.executemany("INSERT OR REPLACE INTO availability VALUES (?, ?, ?, ?, ?, ?)", [
+                (str(entry["id"]), entry.get("title"), entry.get("artist"), json.dumps(entry["sizes"]),
+                 entry.get("source"), now) for entry in entries])
+
+    def clear(self):
+        """Removes every entry"""
+
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM availability")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
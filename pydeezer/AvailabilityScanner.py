@@ -0,0 +1,253 @@
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import itertools
+import json
+from os import path
+import threading
+
+from pydeezer.constants import track_formats
+from pydeezer.Exporter import _open
+from pydeezer import util
+
+
+class AvailabilityScanner:
+    # Where the availability of a track comes from
+    FILESIZE = "filesize"
+    PROBE = "probe"
+    CACHE = "cache"
+
+    CSV = "csv"
+    JSONL = "jsonl"
+
+    FORMATS = [CSV, JSONL]
+
+    # Qualities checked by default, the ones of {Deezer.get_track_valid_quality()}
+    QUALITIES = [track_formats.MP3_128, track_formats.MP3_320, track_formats.FLAC]
+
+    # Track ids resolved by a single request
+    RESOLVE_BATCH = 100
+
+    def __init__(self, deezer, cache=None, qualities=None, max_workers=8, verify=False):
+        """Finds the qualities many tracks are available in before committing to a large job.
+        The file sizes of the gw track data tell it without any request per track, the tracks without them
+        are probed concurrently with a HEAD request per quality.
+
+        Arguments:
+            deezer {Deezer} -- Logged in Deezer instance, or an {AccountPool}
+
+        Keyword Arguments:
+            cache {AvailabilityCache} -- Records the results, the tracks it already holds are not checked again (default: {None})
+            qualities {list} -- Qualities checked, use values from {constants.track_formats} (default: {QUALITIES})
+            max_workers {int} -- Number of tracks probed at the same time (default: {8})
+            verify {bool} -- Probes every track on the CDN even if its file sizes are known, e.g. to catch files
+                             the account is not allowed to get. Only the probed entries of the cache are used (default: {False})
+        """
+
+        self.deezer = deezer
+        self.cache = cache
+        self.qualities = [quality for quality in track_formats.FORMAT_LIST
+                          if quality in (qualities or self.QUALITIES)]
+        self.max_workers = max_workers
+        self.verify = verify
+
+        self._lock = threading.Lock()
+        self._stats = {
+            "tracks": 0,
+            "best": {},
+            "unavailable": 0,
+            "errors": 0,
+            "cached": 0,
+            "probed": 0,
+            "requests": 0
+        }
+
+    def scan(self, tracks):
+        """Checks the availability of the given tracks, a batch of tracks at a time
+
+        Arguments:
+            tracks {iterable} -- gw track dictionaries, e.g. {Deezer.iter_playlist_tracks()}, or track ids.
+                                 The ids are resolved 100 per request.
+
+        Returns:
+            generator -- Generator of results in the given order, dictionaries with the {id}, {title}, {artist},
+                         the available {qualities} from the worst to the best, the {best} one (None if the track can not
+                         be downloaded at all), the {sizes} keyed by quality, the {source} and the {error} of each track
+        """
+
+        tracks = iter(tracks)
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        try:
+            while True:
+                batch = list(itertools.islice(tracks, self.RESOLVE_BATCH))
+
+                if not batch:
+                    return
+
+                yield from self._scan_batch(batch, executor)
+        finally:
+            executor.shutdown(wait=False)
+
+    def report(self, tracks, output, format=None):
+        """Scans the given tracks and writes a row per track as soon as its batch is checked
+
+        Arguments:
+            tracks {iterable} -- gw track dictionaries or track ids, see {scan()}
+            output {str} -- Path of the report file, or an opened file
+
+        Keyword Arguments:
+            format {str} -- Either {AvailabilityScanner.CSV} or {AvailabilityScanner.JSONL},
+                            guessed from the extension of {output} if None (default: {None})
+
+        Raises:
+            ValueError: Will be raised if the format is unknown or can not be guessed
+
+        Returns:
+            dict -- See {stats()}
+        """
+
+        if not format:
+            name = output if isinstance(output, str) else getattr(
+                output, "name", "")
+            format = path.splitext(str(name))[1][1:].lower()
+
+        if format not in self.FORMATS:
+            raise ValueError(
+                f"Unknown report format {format!r}, use one of {', '.join(self.FORMATS)}")
+
+        with _open(output, "w", newline="") as f:
+            if format == self.CSV:
+                writer = csv.DictWriter(f, ["id", "title", "artist", "best", "qualities"] +
+                                        [f"size_{quality.lower()}" for quality in self.qualities] + ["source", "error"])
+                writer.writeheader()
+
+            for i, result in enumerate(self.scan(tracks), 1):
+                if format == self.CSV:
+                    writer.writerow(dict({key: result[key] for key in ("id", "title", "artist", "best", "source", "error")},
+                                         qualities=" ".join(result["qualities"]),
+                                         **{f"size_{quality.lower()}": result["sizes"].get(quality)
+                                            for quality in self.qualities}))
+                else:
+                    f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+                # Readable while the scan goes on, e.g. with tail -f
+                if i % self.RESOLVE_BATCH == 0:
+                    f.flush()
+
+        return self.stats()
+
+    def stats(self):
+        """Gets the counters of the scanned tracks
+
+        Returns:
+            dict -- Number of tracks, of tracks per best quality, of unavailable tracks, of tracks that could not be checked,
+                    of tracks taken from the cache, of probed tracks and of probe requests
+        """
+
+        with self._lock:
+            return dict(self._stats, best=dict(self._stats["best"]))
+
+    def _scan_batch(self, batch, executor):
+        track_ids = [_track_id(track) for track in batch]
+        results = {}
+
+        if self.cache:
+            for track_id, entry in self.cache.get_many(track_ids).items():
+                if not self.verify or entry["source"] == self.PROBE:
+                    results[track_id] = self._result(entry, entry["sizes"], self.CACHE)
+
+        pending = [track for track, track_id in zip(batch, track_ids) if track_id not in results]
+        probes = {}
+
+        for track in util.resolve_tracks(self.deezer, pending):
+            if not isinstance(track, dict):
+                results[str(track)] = self._result(
+                    {"id": str(track)}, {}, None, error="The track could not be found.")
+                continue
+
+            entry = {"id": str(track["SNG_ID"]), "title": track.get("SNG_TITLE"), "artist": track.get("ART_NAME")}
+            sizes = self._file_sizes(track)
+
+            if sizes is None or self.verify:
+                probes[entry["id"]] = (entry, executor.submit(self._probe, track))
+            else:
+                results[entry["id"]] = self._result(entry, sizes, self.FILESIZE)
+
+        for track_id, (entry, future) in probes.items():
+            try:
+                results[track_id] = self._result(entry, future.result(), self.PROBE)
+            except Exception as e:
+                results[track_id] = self._result(entry, {}, None, error=str(e) or type(e).__name__)
+
+        if self.cache:
+            self.cache.put_many([result for result in results.values()
+                                 if result["source"] in (self.FILESIZE, self.PROBE)])
+
+        for track_id in track_ids:
+            result = results[track_id]
+            self._count(result)
+
+            yield result
+
+    def _file_sizes(self, track):
+        # None if the track data has no file sizes at all, e.g. a dictionary of the official api
+        if not any(f"FILESIZE_{quality}" in track for quality in self.qualities):
+            return None
+
+        sizes = {}
+
+        for quality in self.qualities:
+            try:
+                sizes[quality] = int(track.get(f"FILESIZE_{quality}") or 0)
+            except (TypeError, ValueError):
+                sizes[quality] = 0
+
+        return sizes
+
+    def _probe(self, track):
+        info = util.map_gw_track(track)
+        sizes = {}
+
+        with util.client(self.deezer) as deezer:
+            for quality in self.qualities:
+                sizes[quality] = deezer.check_track_quality(info, quality)
+
+        with self._lock:
+            self._stats["requests"] += len(self.qualities)
+
+        return sizes
+
+    def _result(self, entry, sizes, source, error=None):
+        qualities = [quality for quality in self.qualities if sizes.get(quality)]
+
+        return {
+            "id": str(entry["id"]),
+            "title": entry.get("title"),
+            "artist": entry.get("artist"),
+            "qualities": qualities,
+            "best": qualities[-1] if qualities else None,
+            "sizes": {quality: sizes.get(quality, 0) for quality in self.qualities} if not error else {},
+            "source": source,
+            "error": error
+        }
+
+    def _count(self, result):
+        with self._lock:
+            stats = self._stats
+            stats["tracks"] += 1
+
+            if result["error"]:
+                stats["errors"] += 1
+            elif result["best"]:
+                stats["best"][result["best"]] = stats["best"].get(result["best"], 0) + 1
+            else:
+                stats["unavailable"] += 1
+
+            if result["source"] == self.CACHE:
+                stats["cached"] += 1
+            elif result["source"] == self.PROBE:
+                stats["probed"] += 1
+
+
+def _track_id(track):
+    return str(track["SNG_ID"] if isinstance(track, dict) else track)
@@ -0,0 +1,194 @@
+from contextlib import contextmanager
+import threading
+import time
+
+_KEEP = object()
+
+
+class _Bucket:
+    def __init__(self, rate, burst):
+        self.rate = None
+        self.burst = 0
+        self.tokens = 0
+        self.updated = time.monotonic()
+
+        self.configure(rate, burst)
+
+    def configure(self, rate, burst):
+        self.refill(time.monotonic())
+        self.rate = rate
+        self.burst = max(rate * burst, 64 * 1024) if rate else 0
+        self.tokens = min(self.tokens, self.burst)
+
+    def refill(self, now):
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens +
+                              (now - self.updated) * self.rate)
+
+        self.updated = now
+
+    def wait_time(self, size):
+        if not self.rate:
+            return 0
+
+        # A chunk bigger than the bucket only has to wait for a full bucket
+        deficit = min(size, self.burst) - self.tokens
+
+        return deficit / self.rate if deficit > 0 else 0
+
+    def take(self, size):
+        if self.rate:
+            self.tokens -= size
+
+
+class Transfer:
+    def __init__(self, limiter, bucket):
+        """Throttled transfer handed out by {BandwidthLimiter.transfer()}"""
+
+        self.limiter = limiter
+        self.bucket = bucket
+        self.transferred = 0
+
+    def consume(self, size):
+        """Blocks until {size} bytes are allowed through both the global and the per download limits
+
+        Arguments:
+            size {int} -- Number of bytes
+        """
+
+        self.limiter._consume(self, size)
+
+
+class BandwidthLimiter:
+    def __init__(self, rate=None, per_download=None, fair=True, burst=0.25):
+        """Hierarchical token bucket shared by every transfer, e.g. every {Downloader} worker.
+        A global bucket caps the total bandwidth and each transfer has its own bucket below it.
+
+        Keyword Arguments:
+            rate {float} -- Total bytes per second, unlimited if None (default: {None})
+            per_download {float} -- Bytes per second of a single transfer, unlimited if None (default: {None})
+            fair {bool} -- Caps every active transfer to an equal share of {rate} so a fast connection
+                           can not starve the others (default: {True})
+            burst {float} -- Seconds of traffic a bucket can save up while idle (default: {0.25})
+        """
+
+        self.rate = rate
+        self.per_download = per_download
+        self.fair = fair
+        self.burst = burst
+
+        self._global = _Bucket(rate, burst)
+        self._transfers = []
+        self._lock = threading.Condition()
+
+    def __reduce__(self):
+        # Sent to the {Downloader} child processes without the lock and the active transfers
+        return type(self), (self.rate, self.per_download, self.fair, self.burst)
+
+    def split(self, count):
+        """Gets a limiter with an equal part of the global cap, e.g. for each of {count} processes
+
+        Arguments:
+            count {int} -- Number of parts
+
+        Returns:
+            BandwidthLimiter -- New limiter, later changes of this one are not applied to it
+        """
+
+        return type(self)(self.rate / count if self.rate else None, self.per_download, self.fair, self.burst)
+
+    def set_limits(self, rate=_KEEP, per_download=_KEEP, fair=_KEEP):
+        """Changes the limits while transfers are running, the arguments that are not given are kept
+
+        Keyword Arguments:
+            rate {float} -- Total bytes per second, unlimited if None
+            per_download {float} -- Bytes per second of a single transfer, unlimited if None
+            fair {bool} -- Shares {rate} equally between the active transfers
+        """
+
+        with self._lock:
+            if rate is not _KEEP:
+                self.rate = rate
+                self._global.configure(rate, self.burst)
+
+            if per_download is not _KEEP:
+                self.per_download = per_download
+
+            if fair is not _KEEP:
+                self.fair = fair
+
+            self._rebalance()
+            self._lock.notify_all()
+
+    @contextmanager
+    def transfer(self):
+        """Registers a transfer for the duration of the block
+
+        Yields:
+            Transfer -- Call its {consume()} before handling each received chunk
+        """
+
+        with self._lock:
+            transfer = Transfer(self, _Bucket(None, self.burst))
+            self._transfers.append(transfer)
+            self._rebalance()
+
+        try:
+            yield transfer
+        finally:
+            with self._lock:
+                self._transfers.remove(transfer)
+                self._rebalance()
+                self._lock.notify_all()
+
+    def stats(self):
+        """Gets the current limits
+
+        Returns:
+            dict -- Limits and number of active transfers
+        """
+
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "per_download": self.per_download,
+                "fair": self.fair,
+                "active": len(self._transfers),
+                "share": self._share()
+            }
+
+    def _share(self):
+        rates = [self.per_download]
+
+        if self.fair and self.rate and self._transfers:
+            rates.append(self.rate / len(self._transfers))
+
+        rates = [rate for rate in rates if rate]
+
+        return min(rates) if rates else None
+
+    def _rebalance(self):
+        share = self._share()
+
+        for transfer in self._transfers:
+            if transfer.bucket.rate != share:
+                transfer.bucket.configure(share, self.burst)
+
+    def _consume(self, transfer, size):
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self._global.refill(now)
+                transfer.bucket.refill(now)
+
+                wait = max(self._global.wait_time(size),
+                           transfer.bucket.wait_time(size))
+
+                if wait <= 0:
+                    self._global.take(size)
+                    transfer.bucket.take(size)
+                    transfer.transferred += size
+                    return
+
+                # Woken up early when the limits change
+                self._lock.wait(wait)
@@ -0,0 +1,171 @@
+import threading
+import time
+
+
+class _Circuit:
+    def __init__(self):
+        self.state = CircuitBreaker.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+        self.calls = 0
+        self.total_failures = 0
+        self.short_circuited = 0
+
+    def to_dict(self, cooldown):
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "open_until": self.opened_at + cooldown if self.state == CircuitBreaker.OPEN else None,
+            "calls": self.calls,
+            "total_failures": self.total_failures,
+            "short_circuited": self.short_circuited
+        }
+
+
+class CircuitBreaker:
+    # States
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold=5, cooldown=30):
+        """Tracks the health of each backend (gw or the official api) per endpoint.
+        After {threshold} failures in a row the circuit opens and the calls go straight to the other backend.
+        Once {cooldown} seconds passed a single probe call is let through, its success closes the circuit.
+
+        Keyword Arguments:
+            threshold {int} -- Failures in a row opening a circuit (default: {5})
+            cooldown {int} -- Seconds a circuit stays open before a probe call (default: {30})
+        """
+
+        self.threshold = threshold
+        self.cooldown = cooldown
+
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def allow(self, backend, endpoint):
+        """Tells whether a call to a backend can go through, taking the single probe slot of a half open circuit.
+        Only call it right before the call, see {is_open()} to check a circuit without taking its slot
+
+        Arguments:
+            backend {str} -- e.g. "gw" or "api"
+            endpoint {str} -- e.g. "get_track"
+
+        Returns:
+            bool -- False while the circuit is open, True for the single probe call once the cooldown is over
+        """
+
+        with self._lock:
+            circuit = self._circuit(backend, endpoint)
+
+            if circuit.state == self.OPEN and time.time() - circuit.opened_at >= self.cooldown:
+                circuit.state = self.HALF_OPEN
+                circuit.probing = False
+
+            if circuit.state == self.CLOSED:
+                return True
+
+            if circuit.state == self.HALF_OPEN and not circuit.probing:
+                circuit.probing = True
+                return True
+
+            return False
+
+    def record_success(self, backend, endpoint):
+        with self._lock:
+            circuit = self._circuit(backend, endpoint)
+            circuit.calls += 1
+            circuit.failures = 0
+            circuit.state = self.CLOSED
+            circuit.probing = False
+
+    def record_failure(self, backend, endpoint):
+        with self._lock:
+            circuit = self._circuit(backend, endpoint)
+            circuit.calls += 1
+            circuit.total_failures += 1
+            circuit.failures += 1
+
+            # A failed probe opens the circuit again for a whole cooldown
+            if circuit.state == self.HALF_OPEN or circuit.failures >= self.threshold:
+                circuit.state = self.OPEN
+                circuit.opened_at = time.time()
+                circuit.probing = False
+
+    def record_short_circuit(self, backend, endpoint):
+        # A call that went to the other backend first because this circuit was open
+        with self._lock:
+            self._circuit(backend, endpoint).short_circuited += 1
+
+    def release(self, backend, endpoint):
+        """Gives back the probe slot taken by {allow()} when the call neither succeeded nor failed on the backend,
+        e.g. it raised an unrelated error. The circuit stays half open for the next probe"""
+
+        with self._lock:
+            self._circuit(backend, endpoint).probing = False
+
+    def state(self, backend, endpoint):
+        """Gets the state of a circuit without changing it, unlike {allow()}
+
+        Arguments:
+            backend {str} -- e.g. "gw" or "api"
+            endpoint {str} -- e.g. "get_track"
+
+        Returns:
+            str -- {CircuitBreaker.HALF_OPEN} once the cooldown of an open circuit is over
+        """
+
+        with self._lock:
+            circuit = self._circuits.get((backend, endpoint))
+
+            if circuit is None:
+                return self.CLOSED
+
+            if circuit.state == self.OPEN and time.time() - circuit.opened_at >= self.cooldown:
+                return self.HALF_OPEN
+
+            return circuit.state
+
+    def is_open(self, backend, endpoint):
+        """Tells whether a backend should be asked after the other one, without taking the probe slot of {allow()}
+
+        Arguments:
+            backend {str} -- e.g. "gw" or "api"
+            endpoint {str} -- e.g. "get_track"
+
+        Returns:
+            bool -- True while the circuit is open, or half open with its probe call running
+        """
+
+        with self._lock:
+            circuit = self._circuits.get((backend, endpoint))
+
+            if circuit is None:
+                return False
+
+            if circuit.state == self.OPEN:
+                return time.time() - circuit.opened_at < self.cooldown
+
+            return circuit.state == self.HALF_OPEN and circuit.probing
+
+    def stats(self):
+        """Gets the state of every circuit
+
+        Returns:
+            dict -- State, failures in a row, open until, calls, failures and short circuited calls keyed by "backend.endpoint"
+        """
+
+        with self._lock:
+            return {f"{backend}.{endpoint}": circuit.to_dict(self.cooldown)
+                    for (backend, endpoint), circuit in self._circuits.items()}
+
+    def _circuit(self, backend, endpoint):
+        circuit = self._circuits.get((backend, endpoint))
+
+        if circuit is None:
+            circuit = self._circuits[(backend, endpoint)] = _Circuit()
+
+        return circuit
@@ -0,0 +1,115 @@
+import http.client
+import json
+import socket
+from urllib.parse import urlsplit, urlencode
+
+from pydeezer.exceptions import APIRequestError
+
+
+class Client:
+    def __init__(self, url="http://127.0.0.1:8765", socket_path=None, timeout=30):
+        """Client of a running {Server}, only uses the standard library so it starts in milliseconds
+
+        Keyword Arguments:
+            url {str} -- Address of the server (default: {"http://127.0.0.1:8765"})
+            socket_path {str} -- Connects to this Unix socket instead of {url} (default: {None})
+            timeout {float} -- Seconds to wait for a response (default: {30})
+        """
+
+        self.url = url
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+        self._connection = None
+
+    def submit(self, links, priority=0, default_type="track", artist_tracks="top"):
+        """Queues tracks, albums, playlists and artists
+
+        Arguments:
+            links {list} -- Deezer ids, "type:id" strings or deezer.com urls
+
+        Keyword Arguments:
+            priority {int} -- Higher priorities go first (default: {0})
+            default_type {str} -- Media type of the bare ids (default: {"track"})
+            artist_tracks {str} -- "top" or "discography" (default: {"top"})
+
+        Returns:
+            dict -- Ids of the queued tracks and the links being expanded
+        """
+
+        return self._request("POST", "/jobs", {
+            "links": list(links),
+            "priority": priority,
+            "type": default_type,
+            "artist_tracks": artist_tracks
+        })
+
+    def jobs(self, state=None):
+        return self._request("GET", "/jobs" + (f"?{urlencode({'state': state})}" if state else ""))
+
+    def status(self, track_id):
+        return self._request("GET", f"/jobs/{track_id}")
+
+    def cancel(self, track_id):
+        return self._request("DELETE", f"/jobs/{track_id}")
+
+    def metrics(self):
+        return self._request("GET", "/metrics")
+
+    def set_limits(self, **limits):
+        return self._request("PUT", "/limits", limits)
+
+    def shutdown(self):
+        return self._request("POST", "/shutdown")
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _connect(self):
+        if self.socket_path:
+            return _UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+
+        url = urlsplit(self.url)
+
+        return http.client.HTTPConnection(url.hostname, url.port or 80, timeout=self.timeout)
+
+    def _request(self, method, path, data=None):
+        body = json.dumps(data).encode("utf-8") if data is not None else None
+        headers = {"Content-Type": "application/json"} if body else {}
+
+        # The connection is kept alive between the requests, a closed one is reopened once
+        for attempt in range(2):
+            if self._connection is None:
+                self._connection = self._connect()
+
+            try:
+                self._connection.request(method, path, body=body, headers=headers)
+                res = self._connection.getresponse()
+                content = res.read()
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self.close()
+
+                if attempt:
+                    raise
+
+        data = json.loads(content) if content else None
+
+        if res.status >= 400:
+            raise APIRequestError(
+                data.get("error") if isinstance(data, dict) else f"{res.status} {res.reason}")
+
+        return data
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
@@ -0,0 +1,292 @@
+from contextlib import contextmanager
+import os
+from os import path
+import shutil
+import sqlite3
+import threading
+import time
+
+
+class DedupIndex:
+    # Ways of reusing a file
+    HARDLINK = "hardlink"
+    REFLINK = "reflink"
+    COPY = "copy"
+    EXISTING = "existing"
+
+    LINK_MODES = [HARDLINK, REFLINK, COPY]
+
+    # Requests spared by a reused file, its download url and the file itself
+    SAVED_REQUESTS = 2
+
+    def __init__(self, db_path, link_modes=None):
+        """Index of the downloaded files keyed by ISRC and quality, with the track id as a fallback.
+        A track whose recording is already on disk, e.g. in the folder of another playlist or under another
+        track id, is linked to the existing file instead of being downloaded again.
+        Backed by SQLite, safe to share between processes on the same host.
+
+        Arguments:
+            db_path {str} -- Path of the SQLite database, created if it does not exist
+
+        Keyword Arguments:
+            link_modes {list} -- Ways of reusing a file, tried in order. {DedupIndex.HARDLINK} shares the file and
+                                 its tags, {DedupIndex.REFLINK} shares the data until one copy is modified (Btrfs, XFS),
+                                 {DedupIndex.COPY} always works (default: {[HARDLINK, REFLINK, COPY]})
+
+        Raises:
+            ValueError: Will be raised if a link mode is unknown
+        """
+
+        link_modes = list(link_modes or self.LINK_MODES)
+
+        for mode in link_modes:
+            if mode not in self.LINK_MODES:
+                raise ValueError(f"Unknown link mode {mode}")
+
+        self.db_path = db_path
+        self.link_modes = link_modes
+
+        self.hits = 0
+        self.saved_bytes = 0
+        self.saved_requests = 0
+        self.modes = {}
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    key TEXT NOT NULL,
+                    quality TEXT NOT NULL,
+                    track_id TEXT,
+                    isrc TEXT,
+                    path TEXT NOT NULL,
+                    size INTEGER,
+                    created_at REAL,
+                    PRIMARY KEY (key, quality)
+                )
+            """)
+
+    def __reduce__(self):
+        # Sent to the {Downloader} child processes without the connections and the counters
+        return type(self), (self.db_path, self.link_modes)
+
+    @property
+    def _conn(self):
+        # sqlite3 connections can not be shared between threads
+        conn = getattr(self._local, "conn", None)
+
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path, timeout=60, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def add(self, track_id, isrc, quality, file_path, requested_quality=None):
+        """Indexes a downloaded file
+
+        Arguments:
+            track_id {str} -- Track Id
+            isrc {str} -- ISRC of the recording, can be None
+            quality {str} -- Quality of the file, use values from {constants.track_formats}
+            file_path {str} -- Path of the file
+
+        Keyword Arguments:
+            requested_quality {str} -- Quality that was requested when the file is a fallback quality,
+                                       the next requests of that quality reuse the file too (default: {None})
+        """
+
+        size = path.getsize(file_path)
+        file_path = path.abspath(file_path)
+        now = time.time()
+
+        qualities = {quality, requested_quality or quality}
+
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO files (key, quality, track_id, isrc, path, size, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(key, q, str(track_id), isrc, file_path, size, now)
+                 for key in _keys(track_id, isrc) for q in qualities])
+
+    def find(self, track_id, isrc, quality):
+        """Looks for a file of the same recording, first by ISRC then by track id.
+        Entries whose file was removed or modified are dropped.
+
+        Arguments:
+            track_id {str} -- Track Id
+            isrc {str} -- ISRC of the recording, can be None
+            quality {str} -- Requested quality, use values from {constants.track_formats}
+
+        Returns:
+            dict -- Entry with the {path}, {size}, {quality}, {track_id} and {isrc} of the file, None if there is none
+        """
+
+        for key in _keys(track_id, isrc):
+            row = self._conn.execute(
+                "SELECT * FROM files WHERE key = ? AND quality = ?", (key, quality)).fetchone()
+
+            if not row:
+                continue
+
+            try:
+                valid = path.getsize(row["path"]) == row["size"]
+            except OSError:
+                valid = False
+
+            if not valid:
+                with self._transaction() as conn:
+                    conn.execute(
+                        "DELETE FROM files WHERE path = ?", (row["path"],))
+                continue
+
+            return {
+                "path": row["path"],
+                "size": row["size"],
+                "quality": row["quality"],
+                "track_id": row["track_id"],
+                "isrc": row["isrc"]
+            }
+
+        return None
+
+    def reuse(self, entry, target_path, saved_requests=SAVED_REQUESTS, hardlink=True):
+        """Links {target_path} to the file of an entry returned by {find()} and records what was saved
+
+        Arguments:
+            entry {dict} -- Entry returned by {find()}
+            target_path {str} -- Path of the new file, replaced if it exists
+
+        Keyword Arguments:
+            saved_requests {int} -- Requests that were not needed (default: {SAVED_REQUESTS})
+            hardlink {bool} -- See {link()} (default: {True})
+
+        Returns:
+            str -- The mode that worked, or {DedupIndex.EXISTING} if {target_path} already is the file
+        """
+
+        mode = self.link(entry["path"], target_path, hardlink=hardlink)
+
+        with self._lock:
+            self.hits += 1
+            self.saved_bytes += entry["size"]
+            self.saved_requests += saved_requests
+            self.modes[mode] = self.modes.get(mode, 0) + 1
+
+        return mode
+
+    def link(self, source, target_path, hardlink=True):
+        """Creates {target_path} from {source} using the first link mode that works
+
+        Arguments:
+            source {str} -- Path of the existing file
+            target_path {str} -- Path of the new file, replaced if it exists
+
+        Keyword Arguments:
+            hardlink {bool} -- Allows a hard link. Turn it off when the new file gets other tags than {source},
+                               e.g. another track of the same recording, as tagging a hard link rewrites both files.
+                               A copy is made if no other link mode is allowed (default: {True})
+
+        Raises:
+            OSError: Will be raised if none of the link modes worked
+
+        Returns:
+            str -- The mode that worked, or {DedupIndex.EXISTING} if {target_path} already is {source}
+        """
+
+        link_modes = self.link_modes
+
+        if not hardlink:
+            link_modes = [mode for mode in link_modes if mode != self.HARDLINK] or [self.COPY]
+
+        # A hard link made before is replaced by a copy when it is not allowed anymore
+        if path.exists(target_path) and path.samefile(source, target_path) and \
+                (hardlink or path.abspath(source) == path.abspath(target_path)):
+            return self.EXISTING
+
+        # Linked next to the target first so an interrupted link never leaves a partial file under its name
+        temp_path = target_path + ".link"
+        error = None
+
+        for mode in link_modes:
+            try:
+                if path.lexists(temp_path):
+                    os.remove(temp_path)
+
+                if mode == self.HARDLINK:
+                    os.link(source, temp_path)
+                elif mode == self.REFLINK:
+                    _reflink(source, temp_path)
+                else:
+                    shutil.copyfile(source, temp_path)
+
+                os.replace(temp_path, target_path)
+
+                return mode
+            except OSError as e:
+                # e.g. another filesystem, or no reflink support
+                error = e
+
+        if path.lexists(temp_path):
+            os.remove(temp_path)
+
+        raise error
+
+    def stats(self):
+        """Gets what this instance saved
+
+        Returns:
+            dict -- Number of reused files, saved bytes and requests, and the number of files per link mode
+        """
+
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "saved_bytes": self.saved_bytes,
+                "saved_requests": self.saved_requests,
+                "modes": dict(self.modes)
+            }
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+# linux/fs.h
+_FICLONE = 0x40049409
+
+
+def _keys(track_id, isrc):
+    keys = [f"isrc:{isrc.upper()}"] if isrc else []
+
+    return keys + [f"id:{track_id}"]
+
+
+def _reflink(source, target_path):
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("Reflinks are not supported on this platform")
+
+    with open(source, "rb") as src, open(target_path, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
@@ -1,4 +1,5 @@
-from functools import partial
+from contextlib import nullcontext
+from functools import partial, wraps
 import hashlib
 from os import path
 
@@ -7,38 +8,84 @@ from deezer.gw import APIError as GWAPIError
 from deezer.api import APIError as APIError
 
 import requests
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-import mutagen
-from mutagen import File
-from mutagen.id3 import ID3, APIC
-from mutagen.easyid3 import EasyID3
-from mutagen.mp3 import MP3
 
 
 from .ProgressHandler import BaseProgressHandler, DefaultProgressHandler
+from .OutputWriter import OutputWriter
+from .TrackStream import TrackStream
+from .CircuitBreaker import CircuitBreaker
+from .SingleFlight import SingleFlight
 
-from .constants import track_formats
+from .constants import track_formats, error_types
 
 from .exceptions import LoginError
 from .exceptions import APIRequestError
 from .exceptions import DownloadLinkDecryptionError
+from .exceptions import TrackTokenExpiredError, QualityUnavailableError, ServerError, RateLimitError, \
+    JobCancelledError
 
 from . import util
 
 
+def _coalesced(method):
+    # Concurrent calls with the same arguments share a single request, see {SingleFlight}
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, frozenset(kwargs.items()))
+
+        try:
+            hash(key)
+        except TypeError:
+            return method(self, *args, **kwargs)
+
+        return self.single_flight.do(key, method, self, *args, **kwargs)
+
+    return wrapper
+
+
 class Deezer(DeezerPy):
-    def __init__(self, arl=None):
+    def __init__(self, arl=None, session_store=None, circuit_breaker=None, transport=None):
         """Instantiates a Deezer object
 
         Keyword Arguments:
             arl {str} -- Login using the given arl (default: {None})
+            session_store {SessionStore} -- Reuses the session saved for the given arl instead of logging in,
+                                            the login only happens once a request fails with an auth error (default: {None})
+            circuit_breaker {CircuitBreaker} -- Health of the gw and official api backends, calls to a failing backend
+                                                go straight to the other one. Can be shared by several instances (default: {None})
+            transport {requests.adapters.BaseAdapter} -- Sends the requests of the session instead of the default
+                                                         requests adapter, e.g. {HTTP2Adapter} (default: {None})
         """
         super().__init__()
 
+        self.arl = arl
+        self.session_store = session_store
+        self.api_token = None
+        self.license_token = None
+        self.output_writer = OutputWriter()
+        self.bandwidth_limiter = None
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        # e.g. the workers starting the tracks of the same album at once share its album and cover requests
+        self.single_flight = SingleFlight()
+        self.transport = transport
+
+        if transport is not None:
+            # Covers the gw and official api, the media api and the e-cdns-images/e-cdns-proxy hosts
+            self.session.mount("https://", transport)
+            self.session.mount("http://", transport)
+
+        # The gw token is cached instead of being fetched before every gw call
+        self._gw_api_call = self.gw.api_call
+        self.gw.api_call = self._api_call_gw
+        self.gw._get_token = self._get_api_token
+
         if arl:
-            self.arl = arl
-            self.login_via_arl(arl)
+            session = session_store.load(arl) if session_store else None
+
+            if session:
+                self.set_session_data(session)
+            else:
+                self.login_via_arl(arl)
 
     def login_via_arl(self, arl, child=0):
         """Logs in to Deezer using the given
@@ -50,12 +97,84 @@ class Deezer(DeezerPy):
             dict -- User data given by the Deezer API
         """
         super().login_via_arl(arl, child=child)
+        self.arl = arl
+
+        if self.session_store and self.logged_in:
+            self.session_store.save(arl, self.get_session_data())
+
         return self.current_user
 
+    def get_session_data(self):
+        """Gets the data needed to restore this session without logging in again
+
+        Returns:
+            dict -- Cookies, user data, gw api token and media license token of the session
+        """
+
+        return {
+            "cookies": [{
+                "name": cookie.name,
+                "value": cookie.value,
+                "domain": cookie.domain,
+                "path": cookie.path,
+                "expires": cookie.expires,
+                "secure": cookie.secure
+            } for cookie in self.session.cookies],
+            "current_user": self.current_user,
+            "childs": self.childs,
+            "selected_account": self.selected_account,
+            "api_token": self.api_token,
+            "license_token": self.license_token
+        }
+
+    def set_session_data(self, data):
+        """Restores a session saved with {get_session_data()}, without any request
+
+        Arguments:
+            data {dict} -- Session data
+        """
+
+        for cookie in data["cookies"]:
+            self.session.cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"],
+                                     path=cookie["path"], expires=cookie["expires"], secure=cookie["secure"])
+
+        self.current_user = data["current_user"]
+        self.childs = data["childs"]
+        self.selected_account = data["selected_account"]
+        self.api_token = data["api_token"]
+        self.license_token = data.get("license_token")
+        self.logged_in = True
+
     @property
     def user(self):
         return self.current_user
 
+    def get_allowed_qualities(self):
+        """Gets the qualities the logged in account is allowed to stream
+
+        Returns:
+            list -- List of keys from the {track_formats.TRACK_FORMAT_MAP}
+        """
+
+        if "can_stream_lossless" in self.current_user:
+            lossless = self.current_user["can_stream_lossless"]
+            hq = self.current_user["can_stream_hq"]
+        else:
+            options = self.gw.get_user_data()["USER"].get("OPTIONS", {})
+            lossless = options.get("web_lossless") or options.get(
+                "mobile_lossless")
+            hq = options.get("web_hq") or options.get("mobile_hq")
+
+        qualities = [track_formats.MP3_128]
+
+        if hq:
+            qualities += [track_formats.MP3_256, track_formats.MP3_320]
+
+        if lossless:
+            qualities.append(track_formats.FLAC)
+
+        return qualities
+
     def get_track(self, track_id, **kwargs):
         """Gets the track info using the Deezer API
 
@@ -66,13 +185,7 @@ class Deezer(DeezerPy):
             dict -- Dictionary that contains the {info}, {download} partial function, {tags}, and {get_tag} partial function.
         """
 
-        data, m = self._api_fallback(
-            partial(self.gw.get_track, track_id), partial(self.api.get_track, track_id), **kwargs)
-
-        if m == "gw":
-            data = util.map_gw_track(data)
-        else:
-            data = util.map_api_track(data)
+        data = self.get_track_info(track_id, **kwargs)
 
         return {
             "info": data,
@@ -81,6 +194,25 @@ class Deezer(DeezerPy):
             "get_tag": partial(self.get_track_tags, data)
         }
 
+    @_coalesced
+    def get_track_info(self, track_id, **kwargs):
+        """Gets only the mapped track info, without fetching the album data and cover needed by the tags
+
+        Arguments:
+            track_id {str} -- Track Id
+
+        Returns:
+            dict -- Track data, same as the {info} value returned by {get_track()}
+        """
+
+        data, m = self._api_fallback(
+            partial(self.gw.get_track, track_id), partial(self.api.get_track, track_id), **kwargs)
+
+        if m == "gw":
+            return util.map_gw_track(data)
+
+        return util.map_api_track(data)
+
     def get_track_valid_quality(self, track):
         """Gets the valid download qualities of the given track
 
@@ -95,13 +227,7 @@ class Deezer(DeezerPy):
 
         # Fixes issue #4
         for key in [track_formats.MP3_128, track_formats.MP3_320, track_formats.FLAC]:
-            download_url = self.get_track_download_url(
-                track, quality=key, fallback=False)
-
-            res = self.session.get(
-                download_url, stream=True)
-
-            if res.status_code == 200 and int(res.headers["Content-length"]) > 0:
+            if self.check_track_quality(track, key):
                 qualities.append(key)
 
         # Gonna comment these out in case Deezer decides to fix it themselves.
@@ -113,6 +239,39 @@ class Deezer(DeezerPy):
 
         return qualities
 
+    def check_track_quality(self, track, quality):
+        """Checks whether the CDN has a file of the given track in the given quality, with a HEAD request
+        instead of downloading it
+
+        Arguments:
+            track {dict} -- Track dictionary, similar to the {info} value that is returned {using get_track()}
+            quality {str} -- Use values from {constants.track_formats}
+
+        Raises:
+            DownloadLinkDecryptionError: Will be raised if the track dictionary does not have an MD5
+
+        Returns:
+            int -- Size of the file in bytes, 0 if the CDN has no file for the quality
+        """
+
+        url = self._decrypt_url(track, quality)
+        res = self.session.head(url, allow_redirects=True)
+
+        if res.status_code == 405:
+            # A CDN node refusing HEAD requests sends the first byte and the size of the file instead
+            res = self.session.get(url, headers={"Range": "bytes=0-0"}, stream=True)
+            res.close()
+
+            # e.g. "bytes 0-0/8388608"
+            total = res.headers.get("Content-Range", "").rsplit("/", 1)[-1]
+
+            return int(total) if res.status_code == 206 and total.isdigit() else 0
+
+        if res.status_code != 200:
+            return 0
+
+        return int(res.headers.get("Content-Length", 0))
+
     def get_track_tags(self, track, separator=", "):
         """Gets the possible ID3 tags of the track.
 
@@ -208,57 +367,21 @@ class Deezer(DeezerPy):
         Raises:
             DownloadLinkDecryptionError: Will be raised if the track dictionary does not have an MD5
             ValueError: Will be raised if valid track argument was given
+            QualityUnavailableError: Will be raised if neither the quality nor the fallback qualities are available
 
         Returns:
             str -- Download url
         """
 
-        # Decryption algo got from: https://git.fuwafuwa.moe/toad/ayeBot/src/branch/master/bot.py;
-        # and https://notabug.org/deezpy-dev/Deezpy/src/master/deezpy.py
-        # Huge thanks!
-
         if renew:
-            track = self.get_track(track["id"])["info"]
+            track = self.get_track_info(track["id"])
 
         if not quality:
             quality = track_formats.MP3_128
             fallback = True
 
-        try:
-            if not "md5_origin" in track:
-                raise DownloadLinkDecryptionError(
-                    "MD5 is needed to decrypt the download link.")
-
-            md5_origin = track["md5_origin"]
-            track_id = track["id"]
-            media_version = track["media_version"]
-        except ValueError:
-            raise ValueError(
-                "You have passed an invalid argument.")
-
-        def decrypt_url(quality_code):
-            magic_char = "¤"
-            step1 = magic_char.join((md5_origin,
-                                     str(quality_code),
-                                     track_id,
-                                     media_version))
-            m = hashlib.md5()
-            m.update(bytes([ord(x) for x in step1]))
-
-            step2 = m.hexdigest() + magic_char + step1 + magic_char
-            step2 = step2.ljust(80, " ")
-
-            cipher = Cipher(algorithms.AES(bytes('jo6aey6haid2Teih', 'ascii')),
-                            modes.ECB(), default_backend())
-
-            encryptor = cipher.encryptor()
-            step3 = encryptor.update(bytes([ord(x) for x in step2])).hex()
-
-            cdn = track["md5_origin"][0]
-
-            return f'https://e-cdns-proxy-{cdn}.dzcdn.net/mobile/1/{step3}'
-
-        url = decrypt_url(track_formats.TRACK_FORMAT_MAP[quality]["code"])
+        url = self._decrypt_url(track, quality)
+        track_id = track["id"]
         res = self.session.get(url, stream=True)
 
         if not fallback or (res.status_code == 200 and int(res.headers["Content-length"]) > 0):
@@ -271,8 +394,7 @@ class Deezer(DeezerPy):
                 fallback_qualities = track_formats.FALLBACK_QUALITIES
 
             for key in fallback_qualities:
-                url = decrypt_url(
-                    track_formats.TRACK_FORMAT_MAP[key]["code"])
+                url = self._decrypt_url(track, key)
 
                 res = self.session.get(
                     url, stream=True)
@@ -281,9 +403,68 @@ class Deezer(DeezerPy):
                     res.close()
                     return (url, key)
 
+                res.close()
+
+            raise QualityUnavailableError(
+                f"Track {track_id} is not available in {quality} nor in the fallback qualities.")
+
+    def get_media_urls(self, tracks, quality=None, fallback=True):
+        """Gets the download urls of many tracks with a single request to the media api, using their track tokens.
+        Can be given as the resolver of a {TokenManager}.
+
+        Arguments:
+            tracks {list} -- gw track dictionaries or mapped tracks, with their track token
+
+        Keyword Arguments:
+            quality {str} -- Use values from {constants.track_formats}, MP3_128 if None (default: {None})
+            fallback {bool} -- Falls back to the other qualities when the given one is not available (default: {True})
+
+        Raises:
+            APIRequestError: Will be raised if the media api refused the request, e.g. an expired license token
+
+        Returns:
+            dict -- (url, quality) tuples keyed by track id, the tracks without an available quality are left out
+        """
+
+        quality = quality or track_formats.MP3_128
+        formats = [quality]
+
+        if fallback:
+            formats += [q for q in track_formats.FALLBACK_QUALITIES if q != quality]
+
+        track_ids = [str(track.get("SNG_ID") or track.get("id")) for track in tracks]
+
+        res = self.session.post("https://media.deezer.com/v1/get_url", json={
+            "license_token": self._get_license_token(),
+            "media": [{
+                "type": "FULL",
+                "formats": [{"cipher": "BF_CBC_STRIPE", "format": f} for f in formats]
+            }],
+            "track_tokens": [track.get("TRACK_TOKEN") or track.get("token") for track in tracks]
+        })
+        data = res.json()
+
+        if "data" not in data:
+            self.license_token = None
+            raise APIRequestError(
+                f"The media api refused the request: {data.get('errors')}")
+
+        urls = {}
+
+        # The items are in the order of the tokens, an item without media has an error instead
+        for track_id, item in zip(track_ids, data["data"]):
+            for media in item.get("media") or []:
+                if media.get("sources"):
+                    urls[track_id] = (media["sources"][0]["url"], media["format"])
+                    break
+
+        return urls
+
     def download_track(self, track, download_dir, quality=None, fallback=True, filename=None, renew=False,
                        with_metadata=True, with_lyrics=True, tag_separator=", ", show_messages=True,
-                       progress_handler: BaseProgressHandler = None, **kwargs):
+                       progress_handler: BaseProgressHandler = None, tags=None, download_url=None, resume=False,
+                       sanitize=True, output_writer=None, bandwidth_limiter=None, dedup_index=None,
+                       cancel_event=None, **kwargs):
         """Downloads the given track
 
         Arguments:
@@ -297,6 +478,24 @@ class Deezer(DeezerPy):
             with_metadata {bool} -- If true, will write id3 tags into the file. (default: {True})
             with_lyrics {bool} -- If true, will find and save lyrics of the given track. (default: {True})
             tag_separator {str} -- Separator to separate multiple artists (default: {", "})
+            tags {dict} -- Already fetched tags, skips {get_track_tags()} when given (default: {None})
+            download_url {tuple} -- Already resolved (url, quality) returned by {get_track_download_url()} (default: {None})
+            resume {bool} -- If true, continues a previously interrupted download from its .part file (default: {False})
+            sanitize {bool} -- If false, {filename} is used as is, e.g. when built by a {PathTemplate} (default: {True})
+            output_writer {OutputWriter} -- Buffering, preallocation and fsync policy of the file, uses {self.output_writer} if None (default: {None})
+            bandwidth_limiter {BandwidthLimiter} -- Throttles the transfer, uses {self.bandwidth_limiter} if None (default: {None})
+            dedup_index {DedupIndex} -- Links the file to an already downloaded copy of the same recording instead of
+                                        downloading it, and indexes the downloaded file (default: {None})
+            cancel_event {threading.Event} -- Stops the transfer once set, the .part file is kept (default: {None})
+
+        Raises:
+            TrackTokenExpiredError: Will be raised if the CDN refused the download url
+            QualityUnavailableError: Will be raised if the CDN has no file for the resolved quality
+            ServerError: Will be raised if the CDN responded with a 5xx status
+            JobCancelledError: Will be raised if {cancel_event} was set during the transfer
+
+        Returns:
+            str -- Path of the downloaded file
         """
 
         if with_lyrics:
@@ -306,10 +505,23 @@ class Deezer(DeezerPy):
             except Exception:
                 with_lyrics = False
 
-        tags = self.get_track_tags(track, separator=tag_separator)
+        if not tags:
+            tags = self.get_track_tags(track, separator=tag_separator)
+
+        duplicate = None
+        requested_quality = quality or track_formats.MP3_128
 
-        url, quality_key = self.get_track_download_url(
-            track, quality, fallback=fallback, renew=renew, **kwargs)
+        if dedup_index and not download_url:
+            duplicate = dedup_index.find(
+                track["id"], track.get("isrc"), requested_quality)
+
+        if duplicate:
+            download_url = (None, duplicate["quality"])
+        elif not download_url:
+            download_url = self.get_track_download_url(
+                track, quality, fallback=fallback, renew=renew, **kwargs)
+
+        url, quality_key = download_url
         blowfish_key = util.get_blowfish_key(track["id"])
 
         # quality = self._select_valid_quality(track, quality)
@@ -325,20 +537,43 @@ class Deezer(DeezerPy):
         if not str(filename).endswith(ext):
             filename += ext
 
-        filename = util.clean_filename(filename)
+        if sanitize:
+            filename = util.clean_filename(filename)
 
         download_dir = path.normpath(download_dir)
         download_path = path.join(download_dir, filename)
 
         util.create_folders(download_dir)
 
+        if duplicate:
+            return self._reuse_track(track, dedup_index, duplicate, download_path, with_metadata=with_metadata,
+                                     tags=tags, lyrics=lyrics_data if with_lyrics else None, show_messages=show_messages,
+                                     sanitize=sanitize)
+
         if show_messages:
             print("Starting download of:", title)
 
-        res = self.session.get(url, stream=True)
-        chunk_size = 2048
-        total_filesize = int(res.headers["Content-Length"])
-        i = 0
+        chunk_size = util.CHUNK_SIZE
+        output_writer = output_writer or self.output_writer
+        bandwidth_limiter = bandwidth_limiter or self.bandwidth_limiter
+        offset = 0
+
+        if resume:
+            # Only every third chunk is encrypted, resume on a stride boundary so the chunk count stays aligned
+            stride = chunk_size * 3
+            offset = output_writer.resume_offset(
+                download_path) // stride * stride
+
+        headers = {"Range": f"bytes={offset}-"} if offset else None
+
+        res = self.session.get(url, stream=True, headers=headers)
+        self._check_download_response(res)
+
+        if offset and res.status_code != 206:
+            offset = 0
+
+        total_filesize = offset + int(res.headers["Content-Length"])
+        i = offset // chunk_size
 
         data_iter = res.iter_content(chunk_size)
 
@@ -348,31 +583,32 @@ class Deezer(DeezerPy):
         progress_handler.initialize(data_iter, title, quality_key, total_filesize,
                                     chunk_size, track_id=track["id"])
 
-        with open(download_path, "wb") as f:
-            f.seek(0)
+        if offset:
+            progress_handler.update(
+                track_id=track["id"], current_chunk_size=offset)
+
+        transfer = bandwidth_limiter.transfer() if bandwidth_limiter else nullcontext()
 
+        # Closing the response gives its connection back to the pool even if the transfer fails,
+        # the file is only renamed to {download_path} once complete
+        with res, transfer as throttle, output_writer.open(download_path, total_filesize, offset) as f:
             for chunk in data_iter:
                 current_chunk_size = len(chunk)
 
-                if i % 3 > 0:
-                    f.write(chunk)
-                elif len(chunk) < chunk_size:
-                    f.write(chunk)
+                if throttle:
+                    # Not reading the socket meanwhile lets TCP slow the sender down
+                    throttle.consume(current_chunk_size)
+
+                if cancel_event is not None and cancel_event.is_set():
+                    raise JobCancelledError(
+                        f"The download of track {track['id']} was cancelled.")
+
+                f.write(util.decrypt_chunk(blowfish_key, i, chunk))
+
+                if i % 3 == 0 and len(chunk) < chunk_size:
                     progress_handler.update(
                         track_id=track["id"], current_chunk_size=current_chunk_size)
                     break
-                else:
-                    cipher = Cipher(algorithms.Blowfish(blowfish_key),
-                                    modes.CBC(
-                                        bytes([i for i in range(8)])),
-                                    default_backend())
-
-                    decryptor = cipher.decryptor()
-                    dec_data = decryptor.update(
-                        chunk) + decryptor.finalize()
-                    f.write(dec_data)
-
-                    current_chunk_size = len(dec_data)
 
                 i += 1
 
@@ -380,14 +616,16 @@ class Deezer(DeezerPy):
                     track_id=track["id"], current_chunk_size=current_chunk_size)
 
         if with_metadata:
-            if ext.lower() == ".flac":
-                self._write_flac_tags(download_path, track, tags=tags)
-            else:
-                self._write_mp3_tags(download_path, track, tags=tags)
+            self.write_track_tags(download_path, track, tags=tags)
 
         if with_lyrics:
+            # Named like the track file, a name built by a {PathTemplate} is already valid
             lyrics_path = path.join(download_dir, filename[:-len(ext)])
-            self.save_lyrics(lyrics_data, lyrics_path)
+            self.save_lyrics(lyrics_data, lyrics_path, sanitize=util.clean_filename if sanitize else None)
+
+        if dedup_index:
+            dedup_index.add(track["id"], track.get("isrc"), quality_key, download_path,
+                            requested_quality=requested_quality)
 
         if show_messages:
             print("Track downloaded to:", download_path)
@@ -395,6 +633,105 @@ class Deezer(DeezerPy):
         progress_handler.close(
             track_id=track["id"], total_filesize=total_filesize)
 
+        return download_path
+
+    def _reuse_track(self, track, dedup_index, duplicate, download_path, with_metadata=True, tags=None, lyrics=None,
+                     show_messages=True, sanitize=True):
+        # Another track of the same recording gets its own tags, tagging a hard link would rewrite the other file
+        mode = dedup_index.reuse(duplicate, download_path,
+                                 hardlink=str(duplicate["track_id"]) == str(track["id"]))
+
+        # A hard link shares the file and its tags with the same track, a copy gets the tags of this one
+        if with_metadata and mode in (dedup_index.COPY, dedup_index.REFLINK):
+            self.write_track_tags(download_path, track, tags=tags)
+
+        if lyrics:
+            self.save_lyrics(lyrics, path.splitext(download_path)[0],
+                             sanitize=util.clean_filename if sanitize else None)
+
+        if show_messages:
+            print(f"Track reused ({mode}) at:", download_path)
+
+        return download_path
+
+    def open_track_stream(self, track, quality=None, seekable=False, fallback=True, download_url=None,
+                          bandwidth_limiter=None, **kwargs):
+        """Streams the decrypted audio of the given track without writing it to the disk, the audio has no tags
+
+        Arguments:
+            track {dict} -- Track dictionary, similar to the {info} value that is returned {using get_track()}
+
+        Keyword Arguments:
+            quality {str} -- Use values from {constants.track_formats}, will get the default quality if None or an invalid is given. (default: {None})
+            seekable {bool} -- If true, returns a seekable file instead of an iterator (default: {False})
+            fallback {bool} -- Use the fallback qualities when the given quality is not available (default: {True})
+            download_url {tuple} -- Already resolved (url, quality) returned by {get_track_download_url()} (default: {None})
+            bandwidth_limiter {BandwidthLimiter} -- Throttles the stream, uses {self.bandwidth_limiter} if None (default: {None})
+
+        Raises:
+            TrackTokenExpiredError: Will be raised if the CDN refused the download url
+            QualityUnavailableError: Will be raised if the CDN has no file for the resolved quality
+
+        Returns:
+            generator|TrackStream -- Generator of decrypted chunks, the first one is sent as soon as it is received.
+                                     A {TrackStream} if {seekable}, its reads and seeks only fetch the chunks they need.
+        """
+
+        if not download_url:
+            download_url = self.get_track_download_url(
+                track, quality, fallback=fallback, **kwargs)
+
+        url, quality_key = download_url
+        bandwidth_limiter = bandwidth_limiter or self.bandwidth_limiter
+
+        if seekable:
+            stream = TrackStream(
+                self, url, track["id"], quality=quality_key, bandwidth_limiter=bandwidth_limiter)
+            # Reads the size, the request errors are raised here and not on the first read
+            stream.size
+
+            return stream
+
+        # Sent now so the request errors are raised here and not on the first iteration
+        res = self.session.get(url, stream=True)
+        self._check_download_response(res)
+
+        return self._iter_track_stream(res, track["id"], bandwidth_limiter)
+
+    def _iter_track_stream(self, res, track_id, bandwidth_limiter):
+        blowfish_key = util.get_blowfish_key(str(track_id))
+        transfer = bandwidth_limiter.transfer() if bandwidth_limiter else nullcontext()
+
+        with res, transfer as throttle:
+            for i, chunk in enumerate(res.iter_content(util.CHUNK_SIZE)):
+                if throttle:
+                    throttle.consume(len(chunk))
+
+                yield util.decrypt_chunk(blowfish_key, i, chunk)
+
+    def write_track_tags(self, download_path, track, tags=None):
+        """Writes the tags into an already downloaded track
+
+        Arguments:
+            download_path {str} -- Path of the downloaded file
+            track {dict} -- Track dictionary, similar to the {info} value that is returned {using get_track()}
+
+        Keyword Arguments:
+            tags {dict} -- Tags to be written, fetched using {get_track_tags()} if None (default: {None})
+
+        Returns:
+            bool -- Operation success
+        """
+
+        if tags:
+            # The writers pop the album art out of the tags
+            tags = dict(tags)
+
+        if download_path.lower().endswith(".flac"):
+            return self._write_flac_tags(download_path, track, tags=tags)
+
+        return self._write_mp3_tags(download_path, track, tags=tags)
+
     def get_tracks(self, track_ids):
         """Gets the list of the tracks that corresponds with the given {track_ids}
 
@@ -406,6 +743,7 @@ class Deezer(DeezerPy):
         """
         return self.gw.get_tracks_gw(track_ids)
 
+    @_coalesced
     def get_track_lyrics(self, track_id):
         """Gets the lyrics data of the given {track_id}
 
@@ -423,20 +761,23 @@ class Deezer(DeezerPy):
             "save": partial(self.save_lyrics, data)
         }
 
-    def save_lyrics(self, lyric_data, save_path):
+    def save_lyrics(self, lyric_data, save_path, sanitize=util.clean_filename):
         """Saves the {lyric_data} into a .lrc file.
 
         Arguments:
             lyric_data {dict} -- The 'info' value returned from {get_track_lyrics()}
             save_path {str} -- Full path on where the file is to be saved
 
+        Keyword Arguments:
+            sanitize {callable} -- Cleans the filename, e.g. {PathTemplate.sanitize}, None keeps it as is (default: {util.clean_filename})
+
         Returns:
             bool -- Operation success
         """
 
-        filename = path.basename(save_path)
-        filename = util.clean_filename(filename)
-        save_path = path.join(path.dirname(save_path), filename)
+        if sanitize:
+            filename = sanitize(path.basename(save_path))
+            save_path = path.join(path.dirname(save_path), filename)
 
         if not str(save_path).endswith(".lrc"):
             save_path += ".lrc"
@@ -457,6 +798,7 @@ class Deezer(DeezerPy):
 
         return True
 
+    @_coalesced
     def get_album(self, album_id):
         """Gets the album data of the given {album_id}
 
@@ -507,6 +849,21 @@ class Deezer(DeezerPy):
 
         return self.gw.get_album_tracks(album_id)
 
+    def iter_album_tracks(self, album_id, page_size=100):
+        """Lazily gets the tracks of the given {album_id}, one page at a time
+
+        Arguments:
+            album_id {str} -- Album Id
+
+        Keyword Arguments:
+            page_size {int} -- Number of tracks fetched per request (default: {100})
+
+        Returns:
+            generator -- Generator of tracks
+        """
+
+        return self._iter_gw_pages("song.getListByAlbum", {"alb_id": album_id}, page_size)
+
     def get_artist(self, artist_id):
         """Gets the artist data from the given {artist_id}
 
@@ -549,6 +906,28 @@ class Deezer(DeezerPy):
         """
         return self.gw.get_artist_discography(artist_id, **kwargs)
 
+    def iter_artist_discography(self, artist_id, page_size=25):
+        """Lazily gets the tracks of every album of the given artist, one page at a time
+
+        Arguments:
+            artist_id {str} -- Artist Id
+
+        Keyword Arguments:
+            page_size {int} -- Number of albums, and of tracks of an album, fetched per request (default: {25})
+
+        Returns:
+            generator -- Generator of tracks
+        """
+
+        albums = self._iter_gw_pages("album.getDiscography", {
+            "art_id": artist_id,
+            "discography_mode": "all",
+            "nb_songs": 0
+        }, page_size)
+
+        for album in albums:
+            yield from self.iter_album_tracks(album["ALB_ID"], page_size=page_size)
+
     def get_artist_top_tracks(self, artist_id, **kwargs):
         """Gets the top tracks of the given artist
 
@@ -560,6 +939,22 @@ class Deezer(DeezerPy):
         """
         return self.gw.get_artist_top_tracks(artist_id, **kwargs)
 
+    def iter_artist_top_tracks(self, artist_id, limit=100, page_size=25):
+        """Lazily gets the top tracks of the given artist, one page at a time
+
+        Arguments:
+            artist_id {str} -- Artist Id
+
+        Keyword Arguments:
+            limit {int} -- Maximum number of tracks (default: {100})
+            page_size {int} -- Number of tracks fetched per request (default: {25})
+
+        Returns:
+            generator -- Generator of tracks
+        """
+
+        return self._iter_gw_pages("artist.getTopTrack", {"art_id": artist_id}, page_size, limit=limit)
+
     def get_playlist(self, playlist_id):
         """Gets the playlist data from the given playlist_id
 
@@ -588,6 +983,22 @@ class Deezer(DeezerPy):
         """
         return self.gw.get_playlist_tracks(playlist_id)
 
+    def iter_playlist_tracks(self, playlist_id, page_size=100):
+        """Lazily gets the tracks inside the playlist, one page at a time.
+        The next page is fetched while the current one is being consumed.
+
+        Arguments:
+            playlist_id {str} -- Playlist Id
+
+        Keyword Arguments:
+            page_size {int} -- Number of tracks fetched per request (default: {100})
+
+        Returns:
+            generator -- Generator of tracks
+        """
+
+        return self._iter_gw_pages("playlist.getSongs", {"playlist_id": playlist_id}, page_size)
+
     def get_suggested_queries(self, query):
         """Gets suggestion based on the given {query}
 
@@ -671,6 +1082,7 @@ class Deezer(DeezerPy):
 
         return self.api.search_playlist(query, **kwargs)
 
+    @_coalesced
     def _get_poster(self, poster_id, size=500, ext="jpg"):
         ext = ext.lower()
         if ext != "jpg" and ext != "png":
@@ -685,7 +1097,113 @@ class Deezer(DeezerPy):
             "mime_type": "image/jpeg" if ext == "jpg" else "image/png"
         }
 
+    def _iter_gw_pages(self, method, args, page_size, limit=None):
+        from concurrent.futures import ThreadPoolExecutor
+
+        def fetch(start):
+            nb = page_size if limit is None else min(page_size, limit - start)
+            return self.gw.api_call(method, dict(args, start=start, nb=nb))
+
+        # A single background thread prefetches the next page while the current one is consumed
+        executor = ThreadPoolExecutor(max_workers=1)
+        position = 0
+
+        try:
+            page = executor.submit(fetch, 0)
+
+            while True:
+                data = page.result().get("data") or []
+                total = page.result().get("total")
+                start = position + len(data)
+
+                if limit is not None:
+                    total = limit if total is None else min(total, limit)
+
+                has_more = data and (start < total if total is not None else len(data) >= page_size)
+
+                if has_more:
+                    page = executor.submit(fetch, start)
+
+                for item in data:
+                    item["POSITION"] = position
+                    position += 1
+
+                    yield item
+
+                if not has_more:
+                    return
+        finally:
+            # The generator may be closed before the last page, a pending prefetch is left to finish alone
+            executor.shutdown(wait=False)
+
+    def _decrypt_url(self, track, quality):
+        # Decryption algo got from: https://git.fuwafuwa.moe/toad/ayeBot/src/branch/master/bot.py;
+        # and https://notabug.org/deezpy-dev/Deezpy/src/master/deezpy.py
+        # Huge thanks!
+
+        try:
+            if not "md5_origin" in track:
+                raise DownloadLinkDecryptionError(
+                    "MD5 is needed to decrypt the download link.")
+
+            md5_origin = track["md5_origin"]
+            track_id = track["id"]
+            media_version = track["media_version"]
+        except ValueError:
+            raise ValueError(
+                "You have passed an invalid argument.")
+
+        # cryptography is only imported when needed to keep the package import fast
+        from cryptography.hazmat.backends import default_backend
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+        magic_char = "¤"
+        step1 = magic_char.join((md5_origin,
+                                 str(track_formats.TRACK_FORMAT_MAP[quality]["code"]),
+                                 track_id,
+                                 media_version))
+        m = hashlib.md5()
+        m.update(bytes([ord(x) for x in step1]))
+
+        step2 = m.hexdigest() + magic_char + step1 + magic_char
+        step2 = step2.ljust(80, " ")
+
+        cipher = Cipher(algorithms.AES(bytes('jo6aey6haid2Teih', 'ascii')),
+                        modes.ECB(), default_backend())
+
+        encryptor = cipher.encryptor()
+        step3 = encryptor.update(bytes([ord(x) for x in step2])).hex()
+
+        cdn = md5_origin[0]
+
+        return f'https://e-cdns-proxy-{cdn}.dzcdn.net/mobile/1/{step3}'
+
+    def _check_download_response(self, res):
+        if res.status_code in (200, 206) and int(res.headers.get("Content-Length", 0)) > 0:
+            return
+
+        res.close()
+
+        if res.status_code == 429:
+            raise RateLimitError(
+                "The CDN is rate limiting this account.")
+
+        if res.status_code == 403:
+            raise TrackTokenExpiredError(
+                "The CDN refused the download url, the track token has probably expired.")
+
+        if res.status_code >= 500:
+            raise ServerError(
+                f"The CDN responded with status {res.status_code}.")
+
+        raise QualityUnavailableError(
+            "The CDN has no file for the requested quality.")
+
     def _write_mp3_tags(self, path, track, tags=None):
+        from mutagen.id3 import ID3, APIC
+        from mutagen.easyid3 import EasyID3
+        from mutagen.mp3 import MP3
+
         track = track["DATA"] if "DATA" in track else track
 
         if not tags:
@@ -715,6 +1233,9 @@ class Deezer(DeezerPy):
         return True
 
     def _write_flac_tags(self, path, track, tags=None):
+        from mutagen import File
+        from mutagen.flac import Picture
+
         track = track["DATA"] if "DATA" in track else track
 
         if not tags:
@@ -727,7 +1248,7 @@ class Deezer(DeezerPy):
         del tags["_albumart"]
 
         if cover:
-            pic = mutagen.flac.Picture()
+            pic = Picture()
             pic.data = cover["image"]
 
             audio.clear_pictures()
@@ -757,15 +1278,72 @@ class Deezer(DeezerPy):
 
         return quality
 
-    def _api_fallback(self, gw_f, api_f, gw_priority=True, *args, **kwargs):
+    def _get_license_token(self):
+        if not self.license_token:
+            self.license_token = self.gw.get_user_data()[
+                "USER"]["OPTIONS"]["license_token"]
+
+        return self.license_token
+
+    def _get_api_token(self):
+        if not self.api_token:
+            self.api_token = self.gw.get_user_data()["checkForm"]
+
+        return self.api_token
+
+    def _api_call_gw(self, method, args=None, params=None):
         try:
-            if gw_priority:
-                return gw_f(*args, **kwargs), "gw"
+            result = self._gw_api_call(method, args, params)
+        except GWAPIError as e:
+            error_type = util.classify_error(e)
+
+            if error_type == error_types.TOKEN_EXPIRED:
+                self.api_token = None
+            elif error_type == error_types.AUTH and self.arl and method != "deezer.getUserData":
+                # The restored session is no longer valid
+                self.login_via_arl(self.arl, child=self.selected_account)
+            else:
+                raise
+
+            result = self._gw_api_call(method, args, params)
+
+        if method == "deezer.getUserData" and result.get("checkForm"):
+            self.api_token = result["checkForm"]
+            self.license_token = result.get("USER", {}).get(
+                "OPTIONS", {}).get("license_token") or self.license_token
+
+        return result
+
+    def _api_fallback(self, gw_f, api_f, gw_priority=True, *args, **kwargs):
+        backends = [("gw", gw_f, GWAPIError), ("api", api_f, APIError)]
+
+        if not gw_priority:
+            backends.reverse()
+
+        # e.g. "get_track", both backends share the name of their method
+        endpoint = getattr(gw_f, "func", gw_f).__name__
+
+        # A backend whose circuit is open is only tried once the other one failed
+        if self.circuit_breaker.is_open(backends[0][0], endpoint) and \
+                not self.circuit_breaker.is_open(backends[1][0], endpoint):
+            self.circuit_breaker.record_short_circuit(backends[0][0], endpoint)
+            backends.reverse()
+
+        for i, (name, f, error) in enumerate(backends):
+            # Takes the single probe slot of a half open circuit
+            self.circuit_breaker.allow(name, endpoint)
+
+            try:
+                result = f(*args, **kwargs)
+            except (error, requests.RequestException):
+                self.circuit_breaker.record_failure(name, endpoint)
+
+                if i == len(backends) - 1:
+                    raise
             else:
-                return api_f(*args, **kwargs), "api"
-        except APIError:
-            print("API error, falling back to GW.")
-            return gw_f(*args, **kwargs), "gw"
-        except GWAPIError:
-            print("GW API error, falling back to official API.")
-            return api_f(*args, **kwargs), "api"
+                self.circuit_breaker.record_success(name, endpoint)
+
+                return result, name
+            finally:
+                # Any other error leaves the health of the backend unknown, the probe slot is given back
+                self.circuit_breaker.release(name, endpoint)
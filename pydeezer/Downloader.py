@@ -1,23 +1,243 @@
 from typing import Type
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from os import path
+import itertools
+import multiprocessing
+import queue as queue_module
+import threading
+import time
+import traceback
 
-import rich
-from rich.progress import (
-    BarColumn,
-    DownloadColumn,
-    TextColumn,
-    TransferSpeedColumn,
-    TimeRemainingColumn,
-    Progress
-)
+from pydeezer.ProgressHandler import BaseProgressHandler, DefaultProgressHandler, QueueProgressHandler
+from pydeezer.constants import track_formats, job_states, error_types
+from pydeezer import util
+from pydeezer.AccountPool import AccountPool
+from pydeezer.PathTemplate import PathTemplate
+from pydeezer.Scheduler import Scheduler
+from pydeezer.DedupIndex import DedupIndex
+from pydeezer.exceptions import JobCancelledError
 
-from pydeezer.ProgressHandler import BaseProgressHandler, DefaultProgressHandler
-from pydeezer.constants import track_formats
+
+class Job:
+    def __init__(self, track_id, quality):
+        """A single track going through the {Downloader}
+
+        Arguments:
+            track_id {str} -- Track Id
+            quality {str} -- Requested quality, use values from {constants.track_formats}
+        """
+
+        self.id = str(track_id)
+        self.title = None
+        self.quality = quality
+        self.state = job_states.QUEUED
+        self.attempts = 0
+        self.errors = []
+        self.unavailable_qualities = []
+
+        # Pieces resolved before the transfer, kept between retries so a retry only renews what is stale
+        self.info = None
+        self.tags = None
+        self.download_url = None
+
+        self.path = None
+        self.size = 0
+        # Link mode of a track reusing an already downloaded file, see {DedupIndex}
+        self.deduplicated = None
+        # Set when an earlier run already downloaded the file of the track
+        self.skipped = False
+        self.timings = {}
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = None
+
+    @property
+    def elapsed(self):
+        if not self.started_at:
+            return 0
+
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def throughput(self):
+        transfer_time = self.timings.get(job_states.TRANSFERRING, 0)
+
+        if not transfer_time:
+            return 0
+
+        return self.size / transfer_time
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuilds a finished job from its {to_dict()} representation, e.g. one sent by a child process"""
+
+        job = cls(data["id"], data["quality"])
+        job.state = data["state"]
+        job.title = data["title"]
+        job.path = data["path"]
+        job.size = data["size"]
+        job.deduplicated = data["deduplicated"]
+        job.skipped = data["skipped"]
+        job.attempts = data["attempts"]
+        job.errors = data["errors"]
+        job.timings = data["timings"]
+        job.finished_at = time.time()
+        job.started_at = job.finished_at - data["elapsed"]
+
+        return job
+
+    def compact(self):
+        """Drops the resolved pieces of a finished job (track info, tags with the cover, download url),
+        only keeping what {to_dict()} needs"""
+
+        if self.info:
+            self.title = self.info.get("title")
+
+        if self.download_url:
+            self.quality = self.download_url[1]
+
+        self.info = None
+        self.tags = None
+        self.download_url = None
+        self.cancel_event = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "title": self.info.get("title") if self.info else self.title,
+            "state": self.state,
+            "quality": self.download_url[1] if self.download_url else self.quality,
+            "path": self.path,
+            "size": self.size,
+            "deduplicated": self.deduplicated,
+            "skipped": self.skipped,
+            "attempts": self.attempts,
+            "errors": self.errors,
+            "timings": dict(self.timings),
+            "elapsed": self.elapsed,
+            "throughput": self.throughput
+        }
+
+
+class DownloadResult:
+    def __init__(self, record_jobs=True):
+        """Summary of a {Downloader.start()} run
+
+        Keyword Arguments:
+            record_jobs {bool} -- Keeps every finished job, only the failed ones and the counters are kept otherwise (default: {True})
+        """
+
+        self.record_jobs = record_jobs
+        self.jobs = []
+        self.total = 0
+        self.done_count = 0
+        self.failed_count = 0
+        self.cancelled_count = 0
+        self.skipped_count = 0
+        self.total_size = 0
+        self.deduplicated_count = 0
+        self.saved_bytes = 0
+        self.saved_requests = 0
+        self.started_at = time.time()
+        self.finished_at = None
+
+        # The workers add their jobs from several threads while others read it, e.g. the handlers of a {Server}.
+        # Reentrant so a subclass can extend {add()} under the same lock
+        self._lock = threading.RLock()
+
+    def add(self, job):
+        with self._lock:
+            self.total += 1
+
+            if job.deduplicated:
+                # A reused file that failed afterwards, e.g. while tagging, saved nothing
+                if job.state == job_states.DONE:
+                    self.deduplicated_count += 1
+                    self.saved_bytes += job.size
+                    self.saved_requests += DedupIndex.SAVED_REQUESTS
+            elif job.skipped:
+                self.skipped_count += 1
+            else:
+                self.total_size += job.size
+
+            if job.state == job_states.DONE:
+                self.done_count += 1
+            elif job.state == job_states.CANCELLED:
+                self.cancelled_count += 1
+            else:
+                self.failed_count += 1
+
+            if self.record_jobs or job.state == job_states.FAILED:
+                self.jobs.append(job)
+
+    def finish(self):
+        self.finished_at = time.time()
+
+    @property
+    def done(self):
+        with self._lock:
+            return [job for job in self.jobs if job.state == job_states.DONE]
+
+    @property
+    def failed(self):
+        with self._lock:
+            return [job for job in self.jobs if job.state == job_states.FAILED]
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def throughput(self):
+        if not self.elapsed:
+            return 0
+
+        return self.total_size / self.elapsed
+
+    def counters(self):
+        """Gets a consistent snapshot of the counters, safe to call while jobs are being added
+
+        Returns:
+            dict -- Number of jobs, of done, failed, cancelled, skipped and deduplicated jobs, downloaded and saved bytes,
+                    saved requests, elapsed seconds and throughput
+        """
+
+        with self._lock:
+            return {
+                "total": self.total,
+                "done": self.done_count,
+                "failed": self.failed_count,
+                "cancelled": self.cancelled_count,
+                "skipped": self.skipped_count,
+                "total_size": self.total_size,
+                "deduplicated": self.deduplicated_count,
+                "saved_bytes": self.saved_bytes,
+                "saved_requests": self.saved_requests,
+                "elapsed": self.elapsed,
+                "throughput": self.throughput
+            }
+
+    def to_dict(self):
+        with self._lock:
+            return dict(self.counters(), jobs=[job.to_dict() for job in self.jobs])
 
 
 class Downloader:
+    # Track ids resolved by a single request when scheduling by size
+    RESOLVE_BATCH = 100
+
     class ProgressHandler(BaseProgressHandler):
         def __init__(self):
+            from rich.progress import (
+                BarColumn,
+                DownloadColumn,
+                TextColumn,
+                TransferSpeedColumn,
+                TimeRemainingColumn,
+                Progress
+            )
+
             self.tracks = {}
             self.progress = Progress(
                 TextColumn("[bold blue]{task.fields[title]}", justify="left"),
@@ -41,9 +261,9 @@ class Downloader:
             self.progress.console.print(
                 f"[bold red]{track_title}[/] has started downloading.")
 
+            # Only the live tracks are kept, the entry is dropped once the track is closed or failed
             self.tracks[track_id] = {
                 "id": track_id,
-                "iterable": iterable,
                 "title": track_title,
                 "quality": track_quality,
                 "total_size": total_size,
@@ -64,37 +284,792 @@ class Downloader:
                                  advance=track["current_chunk_size"])
 
         def close(self, *args, **kwargs):
-            track = self.tracks[kwargs["track_id"]]
+            track = self.tracks.pop(kwargs["track_id"])
             track_title = track["title"]
+            self.progress.remove_task(track["task"])
             self.progress.print(
                 f"[bold red]{track_title}[/] is done downloading.")
 
+        def fail(self, *args, **kwargs):
+            track = self.tracks.pop(kwargs["track_id"], None)
+
+            if track:
+                self.progress.remove_task(track["task"])
+                self.progress.print(
+                    f"[bold red]{track['title']}[/] failed downloading, {kwargs.get('error')}")
+
         def close_progress(self):
             self.progress.refresh()
             self.progress.stop()
 
     def __init__(self, deezer, track_ids_to_download, download_dir, quality=track_formats.MP3_320,
-                 concurrent_downloads=4, progress_handler: Type[BaseProgressHandler] = None):
+                 concurrent_downloads=4, progress_handler: Type[BaseProgressHandler] = None, retry_policy=None,
+                 queue=None, processes=1, output_template=None, record_jobs=True, output_writer=None,
+                 bandwidth_limiter=None, scheduling=Scheduler.FIFO, priorities=None, dedup_index=None,
+                 keep_running=False, token_manager=None, quality_plan=None, overwrite=False):
+        """Downloads the given tracks concurrently, retrying failed jobs depending on the error
+
+        Arguments:
+            deezer {Deezer} -- Logged in Deezer instance, or an {AccountPool} to spread the jobs over several accounts
+            track_ids_to_download {iterable} -- Track ids or gw track dictionaries, e.g. {Deezer.iter_playlist_tracks()}.
+                                                An iterator is consumed while downloading so the first transfer starts
+                                                with its first item. Can be None when only working on an existing {queue}
+            download_dir {str} -- Directory where the tracks are to be saved
+
+        Keyword Arguments:
+            quality {str} -- Use values from {constants.track_formats} (default: {track_formats.MP3_320})
+            concurrent_downloads {int} -- Number of tracks downloaded at the same time (default: {4})
+            progress_handler {BaseProgressHandler} -- Progress handler shared by all the downloads (default: {None})
+            retry_policy {dict} -- Overrides of {constants.error_types.RETRY_POLICY}, keyed by error type (default: {None})
+            queue {JobQueue} -- Persists the jobs so an interrupted run can be picked up by a restarted process,
+                                several processes can work on the same queue (default: {None})
+            processes {int} -- Number of child processes, each one logs in with the arl of {deezer} and runs
+                               its own pool of {concurrent_downloads} threads (default: {1})
+            output_template {str} -- Path of the files relative to {download_dir} without the extension, either a template
+                                     string e.g. "{albumartist}/{album}/{tracknumber:02} {title}" or a {PathTemplate}.
+                                     Tracks whose path is already taken get a numbered suffix. (default: {"{title}"})
+            record_jobs {bool} -- Keeps every finished job in the result. Only the failed jobs and the counters
+                                  are kept otherwise, so the memory stays flat on very large runs (default: {True})
+            output_writer {OutputWriter} -- Buffering, preallocation and fsync policy of the files,
+                                            uses the one of the Deezer instance if None (default: {None})
+            bandwidth_limiter {BandwidthLimiter} -- Caps the bandwidth of all the transfers, the limits can be changed
+                                                    while running. Each child process gets an equal part of the cap (default: {None})
+            scheduling {str} -- Order in which the tracks are resolved and transferred, a {Scheduler} policy or a {Scheduler}.
+                                The size policies resolve the bare track ids in bulk to know their file sizes (default: {Scheduler.FIFO})
+            priorities {dict} -- Priority keyed by track id, higher priorities go first whatever the policy.
+                                 Only the tracks within the lookahead of the scheduler are compared (default: {None})
+            dedup_index {DedupIndex} -- Links the tracks whose recording was already downloaded, e.g. into the folder of another
+                                        playlist or under another track id, to the existing file instead of downloading them (default: {None})
+            keep_running {bool} -- Keeps the workers waiting for the tracks given to {add()} until {stop()} is called,
+                                   e.g. in a long running service. Not supported with {processes} nor a {queue} (default: {False})
+            token_manager {TokenManager} -- Renews the expiring track tokens in bulk before the tracks are handed to the workers,
+                                            and resolves their download urls in bulk if it has a resolver.
+                                            The child processes only get the renewed tracks (default: {None})
+            quality_plan {QualityPlan} -- Quality of each track picked by a {QualityPlanner}, the tracks missing from it
+                                          get {quality}. A planned track only falls back to the qualities between its
+                                          planned one and the min quality of the plan (default: {None})
+            overwrite {bool} -- Downloads again the tracks whose file an earlier run already saved under their path,
+                                they are skipped otherwise, e.g. when re-running a batch (default: {False})
+
+        Raises:
+            ValueError: Will be raised if {keep_running} is combined with {processes} or a {queue}
+        """
+
+        if keep_running and (processes > 1 or queue):
+            raise ValueError(
+                "keep_running is only supported by a single process without a queue")
+
         self.deezer = deezer
         self.track_ids = track_ids_to_download
         self.download_dir = download_dir
         self.workers = concurrent_downloads
         self.quality = quality
 
+        self.retry_policy = dict(error_types.RETRY_POLICY)
+        if retry_policy:
+            self.retry_policy.update(retry_policy)
+
         if not progress_handler:
             progress_handler = self.ProgressHandler()
 
         self.progress_handler = progress_handler
+        self.queue = queue
+        self.processes = processes
+        if not isinstance(output_template, PathTemplate):
+            output_template = PathTemplate(output_template or "{title}")
+
+        self.output_template = output_template
+        self.record_jobs = record_jobs
+        self.output_writer = output_writer
+        self.bandwidth_limiter = bandwidth_limiter
+        self.dedup_index = dedup_index
+        self.token_manager = token_manager
+        self.quality_plan = quality_plan
+        self.overwrite = overwrite
+
+        if not isinstance(scheduling, Scheduler):
+            scheduling = Scheduler(scheduling, quality=quality)
+
+        self.scheduler = scheduling
+        self.priorities = {str(track_id): priority for track_id,
+                           priority in (priorities or {}).items()}
+        self.result = None
+
+        # Tracks read ahead to be ordered by the scheduler, a plain FIFO keeps the iterable lazy
+        self.lookahead = scheduling.lookahead if scheduling.needs_sizes or self.priorities else 1
+
+        if token_manager:
+            # The tracks renewed together have to be waiting in the scheduler
+            self.lookahead = max(self.lookahead, token_manager.batch_size)
+
+        # Tracks sent ahead of the free workers of the child processes
+        self.window = concurrent_downloads * 2
+
+        self._tracks = iter(
+            track_ids_to_download) if track_ids_to_download is not None else None
+
+        self.keep_running = keep_running
+        # Set whenever a job finishes or a track is added
+        self._wakeup = threading.Event()
+
+        # Jobs being processed and ids of the tracks cancelled before they were started
+        self._running = {}
+        self._cancelled = set()
 
     def start(self):
-        with ThreadPoolExecutor(max_workers=self.workers) as pool:
-            pool.map(self._download, self.track_ids)
+        """Starts downloading the tracks and blocks until every job is either done or failed
+
+        Returns:
+            DownloadResult -- State, timings and throughput of every job
+        """
+
+        self.result = DownloadResult(record_jobs=self.record_jobs)
+        # Placeholders of a crashed run would push the new downloads to suffixed paths
+        self.output_template.remove_stale(self.download_dir)
+
+        if self.processes > 1:
+            self._start_processes()
+        else:
+            self._run()
+
+        self.result.finish()
+
+        import rich
 
         rich.print(
-            f"[bold green]Done downloading all {len(self.progress_handler.tracks)} tracks.")
+            f"[bold green]Done downloading {self.result.done_count} of {self.result.total} tracks.")
+
+        if self.result.skipped_count:
+            rich.print(f"[bold green]Skipped {self.result.skipped_count} already downloaded tracks.")
+
+        if self.result.deduplicated_count:
+            rich.print(f"[bold green]Reused {self.result.deduplicated_count} already downloaded tracks, "
+                       f"saving {self.result.saved_bytes / 1024 / 1024:.1f} MB and {self.result.saved_requests} requests.")
+
+        if self.result.cancelled_count:
+            rich.print(
+                f"[bold yellow]{self.result.cancelled_count} tracks were cancelled.")
+
+        if self.result.failed_count:
+            rich.print(
+                f"[bold red]{self.result.failed_count} tracks failed: " + ", ".join(job.id for job in self.result.failed))
+
         self.progress_handler.close_progress()
 
-    def _download(self, track_id):
-        track = self.deezer.get_track(track_id)
-        track["download"](self.download_dir, quality=self.quality, show_messages=False,
-                          progress_handler=self.progress_handler)
+        return self.result
+
+    def add(self, track, priority=0):
+        """Adds a track while the tracks are being downloaded, e.g. an interactive request jumping the queue
+        with a higher priority. Tracks added once every other track is done are not downloaded unless {keep_running}.
+
+        Arguments:
+            track {str|dict} -- Track id or gw track dictionary
+
+        Keyword Arguments:
+            priority {int} -- Higher priorities go first whatever the scheduling policy (default: {0})
+        """
+
+        track_id = str(track["SNG_ID"] if isinstance(track, dict) else track)
+        self.scheduler.push(track, priority, quality=self._quality_of(track_id))
+        self._wakeup.set()
+
+    def cancel(self, track_id):
+        """Cancels a track, a running transfer stops at its next chunk and keeps its .part file
+
+        Arguments:
+            track_id {str} -- Track Id
+
+        Returns:
+            bool -- True if the track was running, a waiting track is cancelled once it comes up
+        """
+
+        track_id = str(track_id)
+        self._cancelled.add(track_id)
+
+        # Checked after marking the id, a job starting meanwhile sees either the mark or its event set
+        job = self._running.get(track_id)
+
+        if job is not None and job.cancel_event is not None:
+            self._cancelled.discard(track_id)
+            job.cancel_event.set()
+            return True
+
+        return False
+
+    def stop(self):
+        """Lets a {keep_running} downloader return once the running jobs are done"""
+
+        self.keep_running = False
+        self._wakeup.set()
+
+    @property
+    def running_jobs(self):
+        return list(self._running.values())
+
+    def _run(self):
+        try:
+            self._run_jobs()
+        finally:
+            # Syncs the files left by the batch fsync policy
+            if self.output_writer:
+                self.output_writer.flush()
+
+    def _run_jobs(self):
+        if self.queue:
+            self._start_queue()
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                pending = set()
+
+                while True:
+                    self._wakeup.clear()
+                    pending = self._collect(pending)
+
+                    # A job is only submitted once a worker is free so the scheduler decides which one runs next
+                    if len(pending) >= self.workers:
+                        self._wakeup.wait()
+                        continue
+
+                    track = self._next_track()
+
+                    if track is None:
+                        if not pending and not self.keep_running:
+                            break
+
+                        # Running jobs may still be followed by added ones
+                        self._wakeup.wait()
+                        continue
+
+                    future = pool.submit(self._run_job, self._new_job(track))
+                    future.add_done_callback(lambda _: self._wakeup.set())
+                    pending.add(future)
+
+    def _collect(self, pending):
+        done = {future for future in pending if future.done()}
+
+        for future in done:
+            self.result.add(future.result())
+
+        return pending - done
+
+    def _next_track(self):
+        # The scheduler is topped up one batch at a time, the first tracks start before the whole lookahead is read
+        if self._tracks is not None and len(self.scheduler) < self.lookahead:
+            batch = list(itertools.islice(
+                self._tracks, min(self.lookahead, self.RESOLVE_BATCH)))
+
+            if not batch:
+                self._tracks = None
+            elif self.scheduler.needs_sizes:
+                # The ids that could not be resolved are scheduled with an unknown size,
+                # the resolved tracks also spare the jobs their own track info request
+                batch = util.resolve_tracks(self.deezer, batch)
+
+            # The sizes are expected in the planned quality of each track
+            for track in batch:
+                track_id = str(track["SNG_ID"] if isinstance(track, dict) else track)
+                self.scheduler.push(track, self.priorities.get(track_id, 0), quality=self._quality_of(track_id))
+
+        track = self.scheduler.pop()
+
+        if track is not None and self.token_manager:
+            track = self._prepare(track)
+
+        return track
+
+    def _prepare(self, track):
+        if not self.token_manager.is_prepared(track):
+            # The tracks waiting behind it are renewed by the same requests, the next ones are then already prepared.
+            # The urls of the child processes would not be taken, only their tracks are renewed
+            waiting = self.scheduler.peek(self.token_manager.batch_size - 1)
+            groups = {}
+
+            # The urls are resolved in the planned quality of each track
+            for waiting_track in [track] + waiting:
+                groups.setdefault(self._quality_of(self.token_manager.track_id(waiting_track)), []).append(waiting_track)
+
+            for quality, tracks in groups.items():
+                self.token_manager.prepare(tracks, quality, resolve_urls=self.processes == 1)
+
+        return self.token_manager.take(track)
+
+    def _start_processes(self):
+        # spawn instead of fork, forking a process that already runs threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        channel = context.Queue()
+
+        if self.queue:
+            # The children lease from the shared queue
+            if self.track_ids:
+                self._enqueue()
+
+            tasks = None
+        else:
+            # The children pull the tracks from a bounded queue fed while they download
+            tasks = context.Queue(maxsize=self.window * self.processes)
+            tasks.cancel_join_thread()
+
+            threading.Thread(target=self._feed, args=(
+                tasks,), daemon=True).start()
+
+        options = {
+            "download_dir": self.download_dir,
+            "quality": self.quality,
+            "concurrent_downloads": self.workers,
+            "output_template": self.output_template,
+            "output_writer": self.output_writer,
+            "bandwidth_limiter": self.bandwidth_limiter.split(self.processes) if self.bandwidth_limiter else None,
+            "dedup_index": self.dedup_index,
+            "retry_policy": self.retry_policy,
+            "queue_path": self.queue.db_path if self.queue else None,
+            "lease_duration": self.queue.lease_duration if self.queue else None,
+            "quality_plan": self.quality_plan,
+            "overwrite": self.overwrite,
+            "session_store": None
+        }
+
+        session_store = getattr(self.deezer, "session_store", None)
+
+        if session_store:
+            # The children reuse the saved session instead of logging in again
+            options["session_store"] = (session_store.path, session_store.ttl)
+
+        credentials = self.deezer.arls if isinstance(
+            self.deezer, AccountPool) else self.deezer.arl
+
+        # The children mount their own copy of the transport, e.g. an {HTTP2Adapter} without its connections
+        client = self.deezer.accounts[0].client if isinstance(self.deezer, AccountPool) else self.deezer
+        options["transport"] = getattr(client, "transport", None)
+
+        children = [context.Process(target=_process_main, args=(credentials, tasks, options, channel),
+                                    daemon=True) for _ in range(self.processes)]
+
+        for child in children:
+            child.start()
+
+        running = len(children)
+
+        while running:
+            try:
+                event = channel.get(timeout=1)
+            except queue_module.Empty:
+                if not any(child.is_alive() for child in children):
+                    break
+                continue
+
+            running -= self._handle_event(event)
+
+        for child in children:
+            child.join()
+
+    def _feed(self, tasks):
+        while True:
+            track = self._next_track()
+
+            if track is None:
+                break
+
+            tasks.put(track)
+
+        # One end marker per child
+        for _ in range(self.processes):
+            tasks.put(None)
+
+    def _handle_event(self, event):
+        kind = event[0]
+
+        if kind == "initialize":
+            self.progress_handler.initialize(
+                None, *event[2:], track_id=event[1])
+        elif kind == "update":
+            self.progress_handler.update(
+                track_id=event[1], current_chunk_size=event[2])
+        elif kind == "close":
+            self.progress_handler.close(track_id=event[1])
+        elif kind == "fail":
+            self.progress_handler.fail(track_id=event[1], error=event[2])
+        elif kind == "job":
+            self.result.add(Job.from_dict(event[1]))
+        elif kind == "error":
+            import rich
+
+            rich.print(f"[bold red]A worker process crashed:[/]\n{event[1]}")
+        elif kind == "exit":
+            return 1
+
+        return 0
+
+    def _start_queue(self):
+        if self.track_ids:
+            self._enqueue()
+
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._renew_leases, args=(stop_heartbeat,), daemon=True)
+        heartbeat.start()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(self._queue_worker)
+                           for _ in range(self.workers)]
+
+                for future in as_completed(futures):
+                    future.result()
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+
+    def _queue_worker(self):
+        while True:
+            leased = self.queue.lease()
+
+            if not leased:
+                break
+
+            leased = leased[0]
+
+            job = Job(leased["id"], leased["quality"] or self._quality_of(leased["id"]))
+            job.info = leased["metadata"]
+
+            self._run_job(job)
+
+            self.queue.finish(job.id, job.state, path=job.path,
+                              size=job.size, errors=job.errors)
+            self.result.add(job)
+
+    def _renew_leases(self, stop):
+        while not stop.wait(self.queue.lease_duration / 3):
+            if self._running:
+                self.queue.renew(list(self._running))
+
+    def _new_job(self, track):
+        if not isinstance(track, dict):
+            job = Job(track, self._quality_of(track))
+        else:
+            # gw track dictionaries already hold the track info, the job skips its request
+            job = Job(track["SNG_ID"], self._quality_of(track["SNG_ID"]))
+            job.info = util.map_gw_track(track)
+
+        if self.token_manager:
+            job.download_url = self.token_manager.take_url(job.id)
+
+            # The bulk resolver may have fallen back to a quality the plan does not allow
+            if job.download_url and self.quality_plan is not None and \
+                    job.download_url[1] not in [job.quality] + self._fallback_qualities(job):
+                job.download_url = None
+
+        return job
+
+    def _quality_of(self, track_id):
+        if self.quality_plan is None:
+            return self.quality
+
+        return self.quality_plan.quality_of(track_id, self.quality)
+
+    def _fallback_qualities(self, job):
+        planned = self.quality_plan.quality_of(job.id) if self.quality_plan is not None else None
+
+        if planned:
+            qualities = self.quality_plan.fallback_qualities(planned)
+        else:
+            qualities = track_formats.FALLBACK_QUALITIES
+
+        return [q for q in qualities if q not in job.unavailable_qualities]
+
+    def _enqueue(self):
+        if self.quality_plan is None:
+            self.queue.enqueue(self._iter_track_ids(), quality=self.quality)
+            return
+
+        # The jobs keep their planned quality in the queue
+        groups = {}
+
+        for track_id in self._iter_track_ids():
+            groups.setdefault(self._quality_of(track_id), []).append(track_id)
+
+        for quality, track_ids in groups.items():
+            self.queue.enqueue(track_ids, quality=quality)
+
+    def _iter_track_ids(self):
+        for track in self.track_ids:
+            yield track["SNG_ID"] if isinstance(track, dict) else track
+
+    def _run_job(self, job):
+        job.started_at = time.time()
+        job.cancel_event = threading.Event()
+        self._running[job.id] = job
+
+        if job.id in self._cancelled:
+            self._cancelled.discard(job.id)
+            job.cancel_event.set()
+
+        try:
+            self._retry_job(job)
+        finally:
+            self._running.pop(job.id, None)
+
+        job.finished_at = time.time()
+        job.compact()
+
+        return job
+
+    def _retry_job(self, job):
+        while True:
+            job.attempts += 1
+
+            try:
+                if job.cancel_event.is_set():
+                    raise JobCancelledError(f"Track {job.id} was cancelled.")
+
+                self._process(job)
+                job.state = job_states.DONE
+                break
+            except Exception as e:
+                error_type = util.classify_error(e)
+                job.errors.append({
+                    "type": error_type,
+                    "state": job.state,
+                    "message": str(e)
+                })
+
+                if job.state == job_states.TRANSFERRING:
+                    self.progress_handler.fail(track_id=job.id, error=error_type)
+
+                self._release_path(job)
+
+                if error_type == error_types.CANCELLED:
+                    job.state = job_states.CANCELLED
+                    break
+
+                delay = self._retry_delay(job, error_type)
+
+                if delay is None:
+                    job.state = job_states.FAILED
+                    break
+
+                self._invalidate(job, error_type)
+                # A cancel interrupts the backoff
+                job.cancel_event.wait(delay)
+
+    def _process(self, job):
+        with self._client(job) as deezer:
+            with self._stage(job, job_states.RESOLVING):
+                if not job.info:
+                    job.info = deezer.get_track_info(job.id)
+
+                if not job.tags:
+                    job.tags = deezer.get_track_tags(job.info)
+
+                if self._skip_existing(job, job.quality):
+                    return
+
+                duplicate = self._find_duplicate(job)
+
+                if not duplicate and not job.download_url:
+                    fallback_qualities = self._fallback_qualities(job)
+
+                    job.download_url = deezer.get_track_download_url(
+                        job.info, job.quality, fallback=True, fallback_qualities=fallback_qualities)
+
+            if duplicate:
+                return self._reuse(job, deezer, duplicate)
+
+            with self._stage(job, job_states.TRANSFERRING):
+                # The url may have fallen back to a quality with another extension
+                if self._skip_existing(job, job.download_url[1]):
+                    return
+
+                download_dir, filename = self._output_path(job)
+                job.path = path.join(download_dir, filename)
+                job.path = deezer.download_track(job.info, download_dir, filename=filename, sanitize=False,
+                                                 tags=job.tags, download_url=job.download_url, with_metadata=False,
+                                                 with_lyrics=False, show_messages=False, progress_handler=self.progress_handler,
+                                                 resume=bool(self.queue), output_writer=self.output_writer,
+                                                 bandwidth_limiter=self.bandwidth_limiter, cancel_event=job.cancel_event)
+                job.size = path.getsize(job.path)
+
+            with self._stage(job, job_states.TAGGING):
+                deezer.write_track_tags(job.path, job.info, tags=job.tags)
+
+            self._save_lyrics(job, deezer)
+            self.output_template.set_owner(job.path, job.id)
+
+            if self.dedup_index:
+                self.dedup_index.add(job.id, job.info.get("isrc"), job.download_url[1], job.path,
+                                     requested_quality=job.quality)
+
+    def _find_duplicate(self, job):
+        # A retry already holding its download url is past the lookup
+        if not self.dedup_index or job.download_url:
+            return None
+
+        return self.dedup_index.find(job.id, job.info.get("isrc"), job.quality)
+
+    def _reuse(self, job, deezer, duplicate):
+        with self._stage(job, job_states.TRANSFERRING):
+            download_dir, filename = self._output_path(
+                job, duplicate["quality"])
+
+            job.path = path.join(download_dir, filename)
+            # Another track of the same recording gets its own tags, tagging a hard link would rewrite the other file
+            job.deduplicated = self.dedup_index.reuse(duplicate, job.path,
+                                                      hardlink=str(duplicate["track_id"]) == str(job.id))
+            job.size = duplicate["size"]
+
+        # A hard link shares the file and its tags with the same track, a copy gets the tags of this one
+        if job.deduplicated in (DedupIndex.COPY, DedupIndex.REFLINK):
+            with self._stage(job, job_states.TAGGING):
+                deezer.write_track_tags(job.path, job.info, tags=job.tags)
+
+        self._save_lyrics(job, deezer)
+        self.output_template.set_owner(job.path, job.id)
+
+    def _save_lyrics(self, job, deezer):
+        # Saved next to the file and named by the template like it, the lyrics are optional
+        try:
+            lyrics = job.info.get("lyrics") or deezer.get_track_lyrics(job.id)["info"]
+        except Exception:
+            return
+
+        if lyrics:
+            deezer.save_lyrics(lyrics, path.splitext(job.path)[0], sanitize=self.output_template.sanitize)
+
+    def _skip_existing(self, job, quality):
+        # Keeps the file an earlier run downloaded for the track, e.g. a re-run batch, a resumed queue or a watch poll.
+        # A retry already holding its path is past the check
+        if self.overwrite or job.path:
+            return False
+
+        fields = PathTemplate.fields(job.id, job.info, job.tags, quality)
+        existing = self.output_template.existing(self.download_dir, fields, PathTemplate.extension(quality),
+                                                 owner=job.id)
+
+        if not existing:
+            return False
+
+        job.path = existing
+        job.size = path.getsize(existing)
+        job.skipped = True
+
+        return True
+
+    def _output_path(self, job, quality=None):
+        quality = quality or job.download_url[1]
+        ext = PathTemplate.extension(quality)
+
+        # A retry keeps the file an earlier attempt already downloaded, e.g. when its tagging failed
+        if job.path and job.path.endswith(ext):
+            return path.split(job.path)
+
+        fields = PathTemplate.fields(job.id, job.info, job.tags, quality)
+
+        return self.output_template.resolve(self.download_dir, fields, ext, owner=job.id)
+
+    def _release_path(self, job):
+        # Gives back the placeholder of a failed attempt, the next attempt claims its path again.
+        # A file the attempt already downloaded keeps its path
+        if job.path and self.output_template.release(job.path, job.id):
+            job.path = None
+
+    @contextmanager
+    def _client(self, job):
+        if not isinstance(self.deezer, AccountPool):
+            yield self.deezer
+            return
+
+        account = self.deezer.acquire(job.quality)
+        start = time.time()
+
+        try:
+            yield account.client
+        except Exception as e:
+            self.deezer.release(account, error=e, elapsed=time.time() - start)
+            raise
+        else:
+            self.deezer.release(account, size=job.size,
+                                elapsed=time.time() - start)
+
+    def _invalidate(self, job, error_type):
+        # Only drop the pieces that the error made stale, the tags (album and cover) are kept
+        if error_type == error_types.TOKEN_EXPIRED:
+            job.info = None
+            job.download_url = None
+        elif error_type == error_types.QUALITY_UNAVAILABLE and job.download_url:
+            job.unavailable_qualities.append(job.download_url[1])
+            job.download_url = None
+
+            # {_retry_delay()} fails the job when no fallback quality is left, a None quality would fall back to MP3_128
+            if job.quality in job.unavailable_qualities:
+                job.quality = self._fallback_qualities(job)[0]
+
+    def _retry_delay(self, job, error_type):
+        policy = self.retry_policy.get(error_type)
+        retries = len([e for e in job.errors if e["type"] == error_type])
+
+        if not policy or retries > policy["retries"]:
+            return None
+
+        if error_type == error_types.QUALITY_UNAVAILABLE:
+            # Every fallback quality was already probed while resolving,
+            # or the one that failed was the last one allowed, e.g. by the min quality of the plan
+            if not job.download_url or not [q for q in self._fallback_qualities(job) if q != job.download_url[1]]:
+                return None
+
+        delay = policy["backoff"] * policy["factor"] ** (retries - 1)
+
+        return min(delay, policy["max_backoff"])
+
+    @contextmanager
+    def _stage(self, job, state):
+        job.state = state
+        start = time.time()
+
+        if self.queue:
+            self.queue.update(job.id, state, metadata=job.info)
+
+        try:
+            yield
+        finally:
+            job.timings[state] = job.timings.get(state, 0) + time.time() - start
+
+
+class _ChannelResult(DownloadResult):
+    # Sends every finished job of a child process to its parent instead of keeping it
+    def __init__(self, channel):
+        super().__init__(record_jobs=False)
+        self.channel = channel
+
+    def add(self, job):
+        self.channel.put(("job", job.to_dict()))
+
+
+def _process_main(credentials, tasks, options, channel):
+    # Entry point of the child processes of {Downloader(processes=N)}, {credentials} is either an arl or a list of arls
+    # and {tasks} the queue of tracks to download, None when leasing from a {JobQueue}
+    from pydeezer import Deezer, JobQueue, SessionStore
+
+    try:
+        queue_path = options.pop("queue_path")
+        lease_duration = options.pop("lease_duration")
+        queue = JobQueue(queue_path, lease_duration=lease_duration) if queue_path else None
+
+        session_store = options.pop("session_store")
+        session_store = SessionStore(*session_store) if session_store else None
+        transport = options.pop("transport")
+
+        if isinstance(credentials, list):
+            deezer = AccountPool([Deezer(arl=arl, session_store=session_store, transport=transport)
+                                  for arl in credentials])
+        else:
+            deezer = Deezer(arl=credentials, session_store=session_store, transport=transport)
+
+        track_ids = iter(tasks.get, None) if tasks else None
+
+        downloader = Downloader(deezer, track_ids, queue=queue,
+                                progress_handler=QueueProgressHandler(channel), **options)
+        downloader.result = _ChannelResult(channel)
+        downloader._run()
+    except Exception:
+        channel.put(("error", traceback.format_exc()))
+    finally:
+        channel.put(("exit",))
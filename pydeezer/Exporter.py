@@ -0,0 +1,220 @@
+import csv
+import json
+from os import path
+
+from pydeezer.constants import track_formats
+from pydeezer import util
+
+
+class Exporter:
+    CSV = "csv"
+    JSONL = "jsonl"
+    PARQUET = "parquet"
+
+    FORMATS = [CSV, JSONL, PARQUET]
+
+    # Flat columns of an exported track with their type
+    COLUMNS = [
+        ("id", "string"),
+        ("title", "string"),
+        ("version", "string"),
+        ("isrc", "string"),
+        ("duration", "int"),
+        ("gain", "float"),
+        ("rank", "int"),
+        ("track_number", "int"),
+        ("disk_number", "int"),
+        ("release_date", "string"),
+        ("explicit_lyrics", "bool"),
+        ("album_id", "string"),
+        ("album_title", "string"),
+        ("artist_id", "string"),
+        ("artist_name", "string"),
+        ("contributors", "string"),
+        ("media_version", "string"),
+        *[(f"filesize_{quality.lower()}", "int") for quality in track_formats.TRACK_FORMAT_MAP]
+    ]
+
+    def __init__(self, deezer, batch_size=500):
+        """Exports the metadata of tracks into CSV, JSON lines or Parquet files.
+        The tracks are mapped and written in batches so only one batch is held in memory at a time.
+
+        Arguments:
+            deezer {Deezer} -- Deezer instance, only used to fetch the tracks given as ids
+
+        Keyword Arguments:
+            batch_size {int} -- Number of tracks written at once, a Parquet batch is one row group (default: {500})
+        """
+
+        self.deezer = deezer
+        self.batch_size = batch_size
+
+    def export(self, tracks, output, format=None):
+        """Writes the metadata of the given tracks
+
+        Arguments:
+            tracks {iterable} -- gw track dictionaries, e.g. {Deezer.iter_playlist_tracks()}, or track ids.
+                                 Only the ids cost an extra request.
+            output {str} -- Path of the output file, or an opened file
+
+        Keyword Arguments:
+            format {str} -- Either {Exporter.CSV}, {Exporter.JSONL} or {Exporter.PARQUET},
+                            guessed from the extension of {output} if None (default: {None})
+
+        Raises:
+            ValueError: Will be raised if the format is unknown or can not be guessed
+            ImportError: Will be raised if exporting to Parquet without pyarrow installed
+
+        Returns:
+            int -- Number of exported tracks
+        """
+
+        if not format:
+            name = output if isinstance(output, str) else getattr(
+                output, "name", "")
+            format = path.splitext(str(name))[1][1:].lower()
+
+        if format not in self.FORMATS:
+            raise ValueError(
+                f"Unknown export format {format!r}, use one of {', '.join(self.FORMATS)}")
+
+        writer = getattr(self, f"_write_{format}")
+
+        return writer(self._iter_batches(tracks), output)
+
+    def iter_rows(self, tracks):
+        """Flattens the given tracks into export rows
+
+        Arguments:
+            tracks {iterable} -- gw track dictionaries or track ids
+
+        Returns:
+            generator -- Generator of rows, dictionaries keyed by the {COLUMNS} names
+        """
+
+        for track in tracks:
+            if not isinstance(track, dict):
+                track = self.deezer.gw.get_track(track)
+
+            yield self._to_row(track)
+
+    def _iter_batches(self, tracks):
+        batch = []
+
+        for row in self.iter_rows(tracks):
+            batch.append(row)
+
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+    def _to_row(self, track):
+        info = util.map_gw_track(track, compact=True)
+
+        row = {
+            "id": info["id"],
+            "title": info["title"],
+            "version": info["version"],
+            "isrc": info["isrc"],
+            "duration": info["duration"],
+            "gain": info["gain"],
+            "rank": info["rank"],
+            "track_number": info["track_number"],
+            "disk_number": info["disk_number"],
+            "release_date": info["release_date"],
+            "explicit_lyrics": info["explicit_lyrics"],
+            "album_id": info["album"]["id"],
+            "album_title": info["album"]["title"],
+            "artist_id": info["artist"]["id"],
+            "artist_name": info["artist"]["name"],
+            "contributors": "; ".join(f"{contributor['name']} ({contributor['role']})"
+                                      for contributor in info["contributors"]),
+            "media_version": info["media_version"]
+        }
+
+        # The file sizes are only in the raw gw data
+        for quality in track_formats.TRACK_FORMAT_MAP:
+            row[f"filesize_{quality.lower()}"] = track.get(f"FILESIZE_{quality}")
+
+        return {name: _convert(row[name], kind) for name, kind in self.COLUMNS}
+
+    def _write_csv(self, batches, output):
+        with _open(output, "w", newline="") as f:
+            writer = csv.DictWriter(f, [name for name, _ in self.COLUMNS])
+            writer.writeheader()
+
+            return _write_batches(batches, writer.writerows)
+
+    def _write_jsonl(self, batches, output):
+        with _open(output, "w") as f:
+            return _write_batches(batches, lambda batch: f.writelines(
+                json.dumps(row, ensure_ascii=False) + "\n" for row in batch))
+
+    def _write_parquet(self, batches, output):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError(
+                "Exporting to Parquet needs pyarrow, install it with: pip install pyarrow") from e
+
+        types = {
+            "string": pyarrow.string(),
+            "int": pyarrow.int64(),
+            "float": pyarrow.float64(),
+            "bool": pyarrow.bool_()
+        }
+        schema = pyarrow.schema([(name, types[kind])
+                                 for name, kind in self.COLUMNS])
+
+        with pyarrow.parquet.ParquetWriter(output, schema) as writer:
+            return _write_batches(batches, lambda batch: writer.write_table(
+                pyarrow.Table.from_pylist(batch, schema=schema)))
+
+
+def _write_batches(batches, write):
+    count = 0
+
+    for batch in batches:
+        write(batch)
+        count += len(batch)
+
+    return count
+
+
+class _open:
+    # Opens a path, or passes an already opened file through without closing it
+    def __init__(self, output, mode, **kwargs):
+        self.output = output
+        self.file = open(output, mode, encoding="utf-8", **
+                         kwargs) if isinstance(output, str) else None
+
+    def __enter__(self):
+        return self.file or self.output
+
+    def __exit__(self, *args):
+        if self.file:
+            self.file.close()
+
+
+def _convert(value, kind):
+    # gw values are mostly strings, empty ones are exported as nulls
+    if value is None or value == "":
+        return None
+
+    try:
+        if kind == "int":
+            return int(value)
+
+        if kind == "float":
+            return float(value)
+
+        if kind == "bool":
+            return bool(value)
+    except (TypeError, ValueError):
+        return None
+
+    return str(value)
@@ -0,0 +1,205 @@
+from contextlib import contextmanager
+import http.client
+import threading
+from types import SimpleNamespace
+
+from requests import exceptions
+from requests.adapters import BaseAdapter
+from requests.cookies import extract_cookies_to_jar
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers, select_proxy
+
+
+class HTTP2Adapter(BaseAdapter):
+    def __init__(self, max_connections=20, http1=True):
+        """Transport adapter sending the requests of a {requests.Session} with httpx, over HTTP/2 when the server
+        supports it. The requests to a host are multiplexed over a single connection instead of taking one connection
+        each, the session, its cookies and the responses stay the ones of requests. Mount it with {Deezer(transport=...)}.
+        Needs httpx with HTTP/2 support: pip install httpx[http2]
+
+        Keyword Arguments:
+            max_connections {int} -- Connections kept open over all the hosts (default: {20})
+            http1 {bool} -- Set to False to only speak HTTP/2, plain http urls then use HTTP/2 with prior knowledge (default: {True})
+        """
+
+        super().__init__()
+
+        try:
+            import httpx
+            import h2  # noqa: F401
+        except ImportError as e:
+            raise ImportError(
+                "The HTTP/2 transport needs httpx, install it with: pip install httpx[http2]") from e
+
+        self.max_connections = max_connections
+        self.http1 = http1
+
+        self._httpx = httpx
+        # A transport per (verify, cert, proxy), most sessions only ever use one
+        self._transports = {}
+        self._lock = threading.Lock()
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        httpx = self._httpx
+
+        body = request.body.encode("utf-8") if isinstance(request.body, str) else request.body
+        # Connection headers are not allowed over HTTP/2, httpx handles the connections itself
+        headers = [(name, value) for name, value in request.headers.items()
+                   if name.lower() not in ("connection", "keep-alive", "transfer-encoding")]
+
+        httpx_request = httpx.Request(request.method, request.url, headers=headers, content=body,
+                                      extensions={"timeout": _timeouts(timeout)})
+        transport = self._transport(verify, cert, select_proxy(request.url, proxies or {}))
+
+        with _translate(request):
+            res = transport.handle_request(httpx_request)
+
+        response = self.build_response(request, res)
+
+        if not stream:
+            # Reads the whole body now so the stream is given back to the connection
+            response.content
+
+        return response
+
+    def build_response(self, request, res):
+        response = Response()
+        response.status_code = res.status_code
+        response.reason = res.reason_phrase
+        response.url = request.url
+        response.request = request
+        response.connection = self
+
+        response.headers = CaseInsensitiveDict()
+
+        for name, value in res.headers.multi_items():
+            # Joined the way urllib3 joins the repeated headers
+            response.headers[name] = f"{response.headers[name]}, {value}" if name in response.headers else value
+
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = _RawResponse(request, res)
+
+        extract_cookies_to_jar(response.cookies, request, response.raw)
+
+        return response
+
+    def close(self):
+        with self._lock:
+            transports = list(self._transports.values())
+            self._transports.clear()
+
+        for transport in transports:
+            transport.close()
+
+    def __getstate__(self):
+        # Sent to the child processes without its connections, they open their own
+        return {"max_connections": self.max_connections, "http1": self.http1}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _transport(self, verify, cert, proxy):
+        key = (verify, cert if not isinstance(cert, list) else tuple(cert), proxy)
+
+        with self._lock:
+            transport = self._transports.get(key)
+
+            if transport is None:
+                httpx = self._httpx
+                transport = self._transports[key] = httpx.HTTPTransport(
+                    verify=verify, cert=cert, proxy=proxy, http1=self.http1, http2=True,
+                    limits=httpx.Limits(max_connections=self.max_connections,
+                                        max_keepalive_connections=self.max_connections))
+
+            return transport
+
+
+class _RawResponse:
+    # Stands for the urllib3 response requests reads the body and the cookies from
+
+    def __init__(self, request, res):
+        self._request = request
+        self._response = res
+        self._chunks = None
+        self._buffer = b""
+
+        self.status = res.status_code
+        self.version = 20 if res.http_version == "HTTP/2" else 11
+
+        message = http.client.HTTPMessage()
+
+        for name, value in res.headers.multi_items():
+            message[name] = value
+
+        self._original_response = SimpleNamespace(msg=message)
+        self.headers = message
+
+    def stream(self, chunk_size, decode_content=True):
+        with _translate(self._request, reading=True):
+            try:
+                chunks = self._response.iter_bytes(chunk_size) if decode_content \
+                    else self._response.iter_raw(chunk_size)
+
+                yield from chunks
+            finally:
+                self._response.close()
+
+    def read(self, amt=None, decode_content=True, **kwargs):
+        if self._chunks is None:
+            self._chunks = self.stream(amt or 65536, decode_content=decode_content)
+
+        while amt is None or len(self._buffer) < amt:
+            chunk = next(self._chunks, None)
+
+            if chunk is None:
+                break
+
+            self._buffer += chunk
+
+        if amt is None:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+
+        return data
+
+    def close(self):
+        self._response.close()
+
+    def release_conn(self):
+        self._response.close()
+
+
+def _timeouts(timeout):
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+    else:
+        connect = read = timeout
+
+    return {"connect": connect, "read": read, "write": read, "pool": connect}
+
+
+@contextmanager
+def _translate(request, reading=False):
+    # Raises the errors requests would raise so the callers catching them keep working
+    import httpx
+
+    try:
+        yield
+    except httpx.ConnectTimeout as e:
+        raise exceptions.ConnectTimeout(e, request=request)
+    except httpx.TimeoutException as e:
+        # requests raises a ConnectionError once the body is being read
+        raise (exceptions.ConnectionError if reading else exceptions.ReadTimeout)(e, request=request)
+    except httpx.ProxyError as e:
+        raise exceptions.ProxyError(e, request=request)
+    except httpx.RemoteProtocolError as e:
+        if not reading:
+            raise exceptions.ConnectionError(e, request=request)
+
+        raise exceptions.ChunkedEncodingError(e, request=request)
+    except httpx.DecodingError as e:
+        raise exceptions.ContentDecodingError(e, request=request)
+    except httpx.TransportError as e:
+        raise exceptions.ConnectionError(e, request=request)
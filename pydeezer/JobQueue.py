@@ -0,0 +1,254 @@
+from contextlib import contextmanager
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from pydeezer.constants import job_states
+
+
+class JobQueue:
+    def __init__(self, db_path, lease_duration=900, owner=None):
+        """Persistent job queue backed by SQLite, safe to share between processes on the same host
+
+        Arguments:
+            db_path {str} -- Path of the SQLite database, created if it does not exist
+
+        Keyword Arguments:
+            lease_duration {int} -- Seconds a leased job stays reserved without a renewal, an in-flight job
+                                    whose lease expired (e.g. its process crashed) is handed out again (default: {900})
+            owner {str} -- Identifier of this worker, a unique one is generated if None (default: {None})
+        """
+
+        self.db_path = db_path
+        self.lease_duration = lease_duration
+        self.owner = owner or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+        self._local = threading.local()
+
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    track_id TEXT PRIMARY KEY,
+                    quality TEXT,
+                    status TEXT NOT NULL,
+                    metadata TEXT,
+                    path TEXT,
+                    size INTEGER DEFAULT 0,
+                    attempts INTEGER DEFAULT 0,
+                    errors TEXT,
+                    lease_owner TEXT,
+                    lease_expires REAL DEFAULT 0,
+                    created_at REAL,
+                    updated_at REAL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires)")
+
+    @property
+    def _conn(self):
+        # sqlite3 connections can not be shared between threads
+        conn = getattr(self._local, "conn", None)
+
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path, timeout=60, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn
+        # IMMEDIATE takes the write lock up front so two workers can never lease the same job
+        conn.execute("BEGIN IMMEDIATE")
+
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def enqueue(self, track_ids, quality=None):
+        """Adds the given tracks to the queue, tracks that are already queued are left untouched
+
+        Arguments:
+            track_ids {list} -- List of track id
+
+        Keyword Arguments:
+            quality {str} -- Use values from {constants.track_formats} (default: {None})
+
+        Returns:
+            int -- Number of newly added jobs
+        """
+
+        now = time.time()
+
+        with self._transaction() as conn:
+            cursor = conn.executemany(
+                "INSERT OR IGNORE INTO jobs (track_id, quality, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(str(track_id), quality, job_states.QUEUED, now, now) for track_id in track_ids])
+
+            return cursor.rowcount
+
+    def lease(self, limit=1):
+        """Reserves the next queued jobs, and in-flight jobs whose lease has expired, for this worker
+
+        Keyword Arguments:
+            limit {int} -- Maximum number of jobs to lease (default: {1})
+
+        Returns:
+            list -- List of job dictionaries containing the {id}, {quality}, {status}, {metadata} and {attempts}
+        """
+
+        now = time.time()
+        in_flight = [job_states.RESOLVING,
+                     job_states.TRANSFERRING, job_states.TAGGING]
+
+        with self._transaction() as conn:
+            rows = conn.execute(
+                f"""SELECT * FROM jobs
+                    WHERE (status = ? AND lease_expires < ?)
+                       OR (status IN ({",".join("?" * len(in_flight))}) AND lease_expires < ?)
+                    ORDER BY created_at, rowid LIMIT ?""",
+                [job_states.QUEUED, now, *in_flight, now, limit]).fetchall()
+
+            conn.executemany(
+                "UPDATE jobs SET lease_owner = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ? WHERE track_id = ?",
+                [(self.owner, now + self.lease_duration, now, row["track_id"]) for row in rows])
+
+        # The rows were read before their lease was counted
+        return [dict(self._row_to_job(row), attempts=row["attempts"] + 1) for row in rows]
+
+    def renew(self, track_ids):
+        """Extends the lease of jobs held by this worker
+
+        Arguments:
+            track_ids {list} -- List of track id
+        """
+
+        expires = time.time() + self.lease_duration
+
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE jobs SET lease_expires = ? WHERE track_id = ? AND lease_owner = ?",
+                [(expires, str(track_id), self.owner) for track_id in track_ids])
+
+    def update(self, track_id, status, metadata=None):
+        """Persists the state of a leased job, renewing its lease
+
+        Arguments:
+            track_id {str} -- Track Id
+            status {str} -- Use values from {constants.job_states}
+
+        Keyword Arguments:
+            metadata {dict} -- Resolved track info, kept so a restarted job skips the resolution (default: {None})
+        """
+
+        now = time.time()
+
+        with self._transaction() as conn:
+            conn.execute(
+                """UPDATE jobs SET status = ?, metadata = COALESCE(?, metadata), lease_expires = ?, updated_at = ?
+                   WHERE track_id = ? AND lease_owner = ?""",
+                (status, json.dumps(metadata) if metadata else None, now + self.lease_duration, now,
+                 str(track_id), self.owner))
+
+    def finish(self, track_id, status, path=None, size=0, errors=None):
+        """Marks a leased job as done or failed and releases its lease
+
+        Arguments:
+            track_id {str} -- Track Id
+            status {str} -- Either {job_states.DONE} or {job_states.FAILED}
+
+        Keyword Arguments:
+            path {str} -- Path of the downloaded file (default: {None})
+            size {int} -- Size of the downloaded file (default: {0})
+            errors {list} -- Errors raised by the job (default: {None})
+        """
+
+        with self._transaction() as conn:
+            conn.execute(
+                """UPDATE jobs SET status = ?, path = ?, size = ?, errors = ?, lease_owner = NULL, lease_expires = 0,
+                   updated_at = ? WHERE track_id = ? AND lease_owner = ?""",
+                (status, path, size, json.dumps(errors or []), time.time(), str(track_id), self.owner))
+
+    def release(self, track_id):
+        """Puts a leased job back in the queue without counting it as done or failed
+
+        Arguments:
+            track_id {str} -- Track Id
+        """
+
+        with self._transaction() as conn:
+            conn.execute(
+                """UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires = 0, updated_at = ?
+                   WHERE track_id = ? AND lease_owner = ?""",
+                (job_states.QUEUED, time.time(), str(track_id), self.owner))
+
+    def retry_failed(self):
+        """Puts every failed job back in the queue
+
+        Returns:
+            int -- Number of requeued jobs
+        """
+
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ?",
+                (job_states.QUEUED, time.time(), job_states.FAILED)).rowcount
+
+    def get(self, track_id):
+        """Gets a job from the queue
+
+        Arguments:
+            track_id {str} -- Track Id
+
+        Returns:
+            dict -- Job dictionary, None if the track was never enqueued
+        """
+
+        row = self._conn.execute(
+            "SELECT * FROM jobs WHERE track_id = ?", (str(track_id),)).fetchone()
+
+        return self._row_to_job(row) if row else None
+
+    def counts(self):
+        """Counts the jobs of each state
+
+        Returns:
+            dict -- Number of jobs keyed by state
+        """
+
+        rows = self._conn.execute(
+            "SELECT status, COUNT(*) AS total FROM jobs GROUP BY status").fetchall()
+
+        return {row["status"]: row["total"] for row in rows}
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _row_to_job(self, row):
+        return {
+            "id": row["track_id"],
+            "quality": row["quality"],
+            "status": row["status"],
+            "metadata": json.loads(row["metadata"]) if row["metadata"] else None,
+            "path": row["path"],
+            "size": row["size"],
+            "attempts": row["attempts"],
+            "errors": json.loads(row["errors"]) if row["errors"] else []
+        }
@@ -0,0 +1,275 @@
+import mmap
+import os
+from os import path
+import threading
+
+
+class OutputWriter:
+    # fsync policies
+    NONE = "none"
+    FILE = "file"
+    BATCH = "batch"
+
+    FSYNC_POLICIES = [NONE, FILE, BATCH]
+
+    TEMP_SUFFIX = ".part"
+    POSITION_SUFFIX = ".pos"
+
+    def __init__(self, buffer_size=1024 * 1024, preallocate=True, use_mmap=False, fsync=NONE, fsync_batch=32):
+        """Writes the downloaded files into a temporary file renamed once complete, so a crash never leaves
+        a half-written file under the final name. One writer can be shared by every download.
+
+        Keyword Arguments:
+            buffer_size {int} -- Bytes gathered before each write to the disk (default: {1048576})
+            preallocate {bool} -- Reserves the whole file up front with posix_fallocate where available,
+                                  which avoids the fragmentation of many small appends (default: {True})
+            use_mmap {bool} -- Copies the data into a memory map of the preallocated file instead of writing it (default: {False})
+            fsync {str} -- {OutputWriter.NONE} leaves the flushing to the OS, {OutputWriter.FILE} syncs every file
+                           before it is renamed, {OutputWriter.BATCH} syncs the files every {fsync_batch} files
+                           and on {flush()} (default: {NONE})
+            fsync_batch {int} -- Number of files synced together with the batch policy (default: {32})
+        """
+
+        if fsync not in self.FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync}")
+
+        self.buffer_size = buffer_size
+        self.preallocate = preallocate
+        self.use_mmap = use_mmap
+        self.fsync = fsync
+        self.fsync_batch = fsync_batch
+
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        # Sent to the {Downloader} child processes without the lock and the pending files
+        return type(self), (self.buffer_size, self.preallocate, self.use_mmap, self.fsync, self.fsync_batch)
+
+    @classmethod
+    def temp_path(cls, file_path):
+        return file_path + cls.TEMP_SUFFIX
+
+    def resume_offset(self, file_path):
+        """Gets the number of bytes of {file_path} already written by an interrupted download
+
+        Arguments:
+            file_path {str} -- Final path of the file
+
+        Returns:
+            int -- Size of the valid data inside the temporary file, 0 if there is none
+        """
+
+        temp_path = self.temp_path(file_path)
+
+        if not path.exists(temp_path):
+            return 0
+
+        # A preallocated file is full size from the start, its valid size is checkpointed next to it
+        try:
+            with open(temp_path + self.POSITION_SUFFIX, "r") as f:
+                return min(int(f.read() or 0), path.getsize(temp_path))
+        except (OSError, ValueError):
+            return path.getsize(temp_path)
+
+    def open(self, file_path, total_size, offset=0):
+        """Opens the temporary file of {file_path}, use it as a context manager.
+        The file is renamed to {file_path} when the block exits without an error.
+
+        Arguments:
+            file_path {str} -- Final path of the file
+            total_size {int} -- Expected size of the file
+
+        Keyword Arguments:
+            offset {int} -- Keeps the first {offset} bytes of an interrupted download (default: {0})
+
+        Returns:
+            OutputFile -- File with a write() method
+        """
+
+        return OutputFile(self, file_path, total_size, offset)
+
+    def flush(self):
+        """Syncs the files waiting for the batch fsync"""
+
+        with self._lock:
+            pending, self._pending = self._pending, []
+
+        directories = set()
+
+        for file_path in pending:
+            try:
+                fd = os.open(file_path, os.O_RDONLY)
+            except OSError:
+                # e.g. already moved or removed by the caller
+                continue
+
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+            directories.add(path.dirname(file_path))
+
+        for directory in directories:
+            _fsync_directory(directory)
+
+    def _committed(self, file_path):
+        if self.fsync == self.FILE:
+            _fsync_directory(path.dirname(file_path))
+        elif self.fsync == self.BATCH:
+            with self._lock:
+                self._pending.append(file_path)
+                flush = len(self._pending) >= self.fsync_batch
+
+            if flush:
+                self.flush()
+
+
+class OutputFile:
+    def __init__(self, writer, file_path, total_size, offset=0):
+        """Temporary file opened by {OutputWriter.open()}"""
+
+        self.writer = writer
+        self.path = file_path
+        self.temp_path = writer.temp_path(file_path)
+        self.total_size = total_size
+        self.position = offset
+
+        self._buffer = bytearray()
+        self._checkpoint = None
+        self._map = None
+
+        self._fd = os.open(self.temp_path, os.O_RDWR | os.O_CREAT, 0o644)
+
+        try:
+            os.ftruncate(self._fd, offset)
+
+            if writer.preallocate or writer.use_mmap:
+                self._preallocate()
+                self._checkpoint = self.temp_path + writer.POSITION_SUFFIX
+
+            if writer.use_mmap and total_size > 0:
+                self._map = mmap.mmap(self._fd, total_size)
+            else:
+                os.lseek(self._fd, offset, os.SEEK_SET)
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        if error_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+    def write(self, data):
+        self._buffer += data
+
+        if len(self._buffer) >= self.writer.buffer_size:
+            self._flush_buffer()
+
+    def commit(self):
+        """Writes what is left, syncs depending on the fsync policy and renames the file to its final path"""
+
+        self._flush_buffer()
+        self._close(sync=self.writer.fsync == OutputWriter.FILE)
+
+        os.replace(self.temp_path, self.path)
+        self._remove_checkpoint()
+
+        self.writer._committed(self.path)
+
+    def abort(self):
+        """Keeps the written data in the temporary file so the download can be resumed"""
+
+        try:
+            self._flush_buffer()
+        finally:
+            self._close()
+            self._remove_checkpoint()
+
+    def _flush_buffer(self):
+        if not self._buffer:
+            return
+
+        if self._map is not None and self.position + len(self._buffer) > len(self._map):
+            # The server sent more than its Content-Length, the rest is written past the end of the map
+            self._map.close()
+            self._map = None
+            os.lseek(self._fd, self.position, os.SEEK_SET)
+
+        if self._map is not None:
+            self._map[self.position:self.position +
+                      len(self._buffer)] = self._buffer
+        else:
+            with memoryview(self._buffer) as view:
+                written = 0
+
+                while written < len(view):
+                    written += os.write(self._fd, view[written:])
+
+        self.position += len(self._buffer)
+        self._buffer = bytearray()
+
+        if self._checkpoint:
+            with open(self._checkpoint, "w") as f:
+                f.write(str(self.position))
+
+    def _preallocate(self):
+        size = self.total_size - self.position
+
+        if size <= 0:
+            return
+
+        try:
+            os.posix_fallocate(self._fd, self.position, size)
+        except (AttributeError, OSError):
+            # Not available on this platform or filesystem, a plain resize still allows the memory map
+            os.ftruncate(self._fd, self.total_size)
+
+    def _close(self, sync=False):
+        if self._fd is None:
+            return
+
+        try:
+            if self._map is not None:
+                if sync:
+                    self._map.flush()
+
+                self._map.close()
+                self._map = None
+
+            # The preallocated space past the written data is given back
+            os.ftruncate(self._fd, self.position)
+
+            if sync:
+                os.fsync(self._fd)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def _remove_checkpoint(self):
+        if self._checkpoint:
+            try:
+                os.remove(self._checkpoint)
+            except OSError:
+                pass
+
+
+def _fsync_directory(directory):
+    # Makes the rename itself durable, not supported on every platform
+    try:
+        fd = os.open(directory or ".", os.O_RDONLY)
+    except OSError:
+        return
+
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,452 @@
+from functools import lru_cache
+import itertools
+import os
+from os import path
+import socket
+import string
+import unicodedata
+
+from pydeezer.constants import track_formats
+
+
+class PathTemplate:
+    # Filesystem policies, which characters and names are invalid in a path component
+    PORTABLE = "portable"
+    POSIX = "posix"
+    ASCII = "ascii"
+
+    # Unicode policies
+    NFC = "nfc"
+    NFD = "nfd"
+    KEEP = "keep"
+
+    FILESYSTEMS = [PORTABLE, POSIX, ASCII]
+    UNICODE_FORMS = [NFC, NFD, KEEP]
+
+    # Start of the placeholder claiming a path until the downloaded file replaces it,
+    # followed by the claimer, the host and the process id
+    CLAIM_MARKER = b"pydeezer-claim:"
+    CLAIM_SIZE = 1024
+
+    # Extended attribute naming the track a downloaded file belongs to, where the filesystem supports it
+    OWNER_ATTRIBUTE = "user.pydeezer.owner"
+
+    FIELDS = ["id", "title", "artist", "album", "albumartist", "genre", "label", "date", "year",
+              "discnumber", "tracknumber", "isrc", "quality"]
+
+    def __init__(self, template, filesystem=PORTABLE, unicode=NFC, replacement="_", max_length=255):
+        """Path of the downloaded files relative to the download directory, without the extension.
+        The template is parsed once, e.g. "{albumartist}/{album} ({year})/{discnumber}-{tracknumber:02} {title}",
+        a "/" separates the folders and the values never create a folder of their own.
+
+        Arguments:
+            template {str} -- Template using the {PathTemplate.FIELDS} with the str.format syntax
+
+        Keyword Arguments:
+            filesystem {str} -- {PathTemplate.PORTABLE} replaces the characters invalid on Windows, macOS or Linux,
+                                {PathTemplate.POSIX} only replaces "/" and the control characters,
+                                {PathTemplate.ASCII} keeps the ascii whitelist of {util.clean_filename()} (default: {PORTABLE})
+            unicode {str} -- Normalization of the values, {PathTemplate.NFC}, {PathTemplate.NFD} (e.g. for macOS)
+                             or {PathTemplate.KEEP} (default: {NFC})
+            replacement {str} -- Replaces the invalid characters (default: {"_"})
+            max_length {int} -- Maximum length of a path component (default: {255})
+
+        Raises:
+            ValueError: Will be raised if the template uses an unknown field or a policy is unknown
+        """
+
+        if filesystem not in self.FILESYSTEMS:
+            raise ValueError(f"Unknown filesystem policy {filesystem}")
+
+        if unicode not in self.UNICODE_FORMS:
+            raise ValueError(f"Unknown unicode policy {unicode}")
+
+        self.template = template
+        self.filesystem = filesystem
+        self.unicode = unicode
+        self.replacement = replacement
+        self.max_length = max_length
+
+        self._components = [self._compile(component)
+                            for component in template.split("/") if component]
+
+        if not self._components:
+            raise ValueError("The path template is empty")
+
+    def render(self, fields):
+        """Renders the relative path of a track
+
+        Arguments:
+            fields {dict} -- Values of the {PathTemplate.FIELDS}, see {PathTemplate.fields()}
+
+        Returns:
+            list -- Sanitized path components, the last one being the filename without the extension
+        """
+
+        components = []
+
+        for segments in self._components:
+            component = "".join(literal + self._render_field(fields.get(name), spec, conversion)
+                                for literal, name, spec, conversion in segments)
+
+            components.append(self.sanitize(component) or self.replacement)
+
+        return components
+
+    def resolve(self, download_dir, fields, ext, owner=None):
+        """Renders the path of a track and claims it. A path claimed by another running track, or holding the file
+        of another track, gets a " (2)", " (3)"... suffix. A file downloaded before under the path, e.g. by an earlier
+        run, keeps it and is replaced by the new download, see {existing()} to skip it instead.
+        The claim is a placeholder file created atomically under the final name, so it holds across threads,
+        processes and runs. The downloaded file replaces it, a track that is not downloaded gives it back
+        with {release()} and the ones of a crashed run are removed by {remove_stale()}.
+
+        Arguments:
+            download_dir {str} -- Directory the path is relative to, created if it does not exist
+            fields {dict} -- Values of the {PathTemplate.FIELDS}, see {PathTemplate.fields()}
+            ext {str} -- Extension of the file, e.g. ".mp3"
+
+        Keyword Arguments:
+            owner {str} -- Identifies the claimer, a track resolving its path again keeps it (default: {fields["id"]})
+
+        Returns:
+            tuple -- (directory, filename with the extension)
+        """
+
+        owner = str(owner if owner is not None else fields.get("id"))
+        candidates = self._candidates(download_dir, fields, ext)
+        file_path = next(candidates)
+
+        os.makedirs(path.dirname(file_path), exist_ok=True)
+
+        while not self._claim(file_path, owner):
+            file_path = next(candidates)
+
+        return path.split(file_path)
+
+    def existing(self, download_dir, fields, ext, owner=None):
+        """Finds the file already downloaded for a track under its rendered path, without claiming anything.
+        The suffixed paths are followed the same way as {resolve()}. Without extended attributes on the filesystem,
+        the file of another track rendering the same path is taken for the one of this track.
+
+        Arguments:
+            download_dir {str} -- Directory the path is relative to
+            fields {dict} -- Values of the {PathTemplate.FIELDS}, see {PathTemplate.fields()}
+            ext {str} -- Extension of the file, e.g. ".mp3"
+
+        Keyword Arguments:
+            owner {str} -- Track the file belongs to (default: {fields["id"]})
+
+        Returns:
+            str -- Path of the downloaded file, None if the track has none
+        """
+
+        owner = str(owner if owner is not None else fields.get("id"))
+
+        for file_path in self._candidates(download_dir, fields, ext):
+            if not path.lexists(file_path):
+                return None
+
+            if self._belongs_to(file_path, owner):
+                return file_path if self.exists(file_path) else None
+
+    def exists(self, file_path):
+        """Tells if a path holds a downloaded file, a placeholder of {resolve()} is not one
+
+        Arguments:
+            file_path {str} -- Path of the file
+
+        Returns:
+            bool -- True if the file exists and is not a placeholder
+        """
+
+        return path.isfile(file_path) and self._read_claim(file_path) is None
+
+    def set_owner(self, file_path, owner):
+        """Records the track a downloaded file belongs to, so another track rendering the same path later
+        gets a suffix instead of replacing it. Does nothing where the filesystem has no extended attributes
+
+        Arguments:
+            file_path {str} -- Path of the downloaded file
+            owner {str} -- Claimer given to {resolve()}
+        """
+
+        try:
+            os.setxattr(file_path, self.OWNER_ATTRIBUTE, str(owner).encode())
+        except (AttributeError, OSError):
+            pass
+
+    def release(self, file_path, owner):
+        """Gives back a path claimed by {resolve()}, e.g. once its download failed.
+        Nothing is removed if the downloaded file already replaced the placeholder.
+
+        Arguments:
+            file_path {str} -- Path returned by {resolve()}
+            owner {str} -- Claimer given to {resolve()}
+
+        Returns:
+            bool -- True if the placeholder was removed, False if the path holds another file
+        """
+
+        claim = self._read_claim(file_path)
+
+        if not claim or claim[0] != str(owner):
+            return False
+
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+        return True
+
+    def remove_stale(self, download_dir):
+        """Removes the placeholders left under {download_dir} by crashed runs on this host.
+        The ones of running processes and of other hosts are kept.
+
+        Arguments:
+            download_dir {str} -- Directory searched recursively
+
+        Returns:
+            list -- Paths of the removed placeholders
+        """
+
+        host = socket.gethostname()
+        removed = []
+
+        for directory, _, filenames in os.walk(download_dir):
+            for filename in filenames:
+                file_path = path.join(directory, filename)
+
+                try:
+                    # Only the small files can be placeholders
+                    if path.getsize(file_path) > self.CLAIM_SIZE:
+                        continue
+                except OSError:
+                    continue
+
+                claim = self._read_claim(file_path)
+
+                if claim and claim[1] == host and not _is_running(claim[2]):
+                    try:
+                        os.remove(file_path)
+                        removed.append(file_path)
+                    except FileNotFoundError:
+                        pass
+
+        return removed
+
+    def sanitize(self, value):
+        """Makes a single path component valid under the policies of this template, the results are cached
+
+        Arguments:
+            value {str} -- Path component
+
+        Returns:
+            str -- Sanitized path component
+        """
+
+        value = _clean(value, self.filesystem,
+                       self.unicode, self.replacement)
+
+        return _sanitize_component(value, self.filesystem, self.replacement, self.max_length)
+
+    @staticmethod
+    def fields(track_id, info, tags, quality):
+        """Gets the template values of a track
+
+        Arguments:
+            track_id {str} -- Track Id
+            info {dict} -- Track data, see {Deezer.get_track_info()}
+            tags {dict} -- Tags of the track, see {Deezer.get_track_tags()}
+            quality {str} -- Downloaded quality, use values from {constants.track_formats}
+
+        Returns:
+            dict -- Values keyed by field name
+        """
+
+        date = str(tags.get("date") or "")
+
+        return {
+            "id": track_id,
+            "title": tags.get("title"),
+            "artist": tags.get("artist"),
+            "album": tags.get("album"),
+            "albumartist": tags.get("albumartist"),
+            "genre": tags.get("genre"),
+            "label": tags.get("label"),
+            "date": date,
+            "year": _to_int(date[:4]),
+            "discnumber": _to_int(info.get("disk_number")),
+            "tracknumber": _to_int(info.get("track_number")),
+            "isrc": tags.get("isrc"),
+            "quality": quality
+        }
+
+    @staticmethod
+    def extension(quality):
+        return track_formats.TRACK_FORMAT_MAP[quality]["ext"]
+
+    def _compile(self, component):
+        segments = []
+
+        for literal, name, spec, conversion in string.Formatter().parse(component):
+            if name is not None and name not in self.FIELDS:
+                raise ValueError(
+                    f"Unknown path template field {{{name}}}, use one of {', '.join(self.FIELDS)}")
+
+            segments.append((literal, name, spec or "", conversion))
+
+        return segments
+
+    def _render_field(self, value, spec, conversion):
+        if value is None or value == "":
+            return ""
+
+        if conversion == "r":
+            value = repr(value)
+        elif conversion == "s":
+            value = str(value)
+
+        try:
+            value = format(value, spec)
+        except (TypeError, ValueError):
+            # e.g. {tracknumber:02} on a value that is not a number
+            value = str(value)
+
+        # The values are cleaned on their own so a "/" inside a title does not create a folder
+        return _clean(value, self.filesystem, self.unicode, self.replacement)
+
+    def _candidates(self, download_dir, fields, ext):
+        components = self.render(fields)
+        directory = path.join(download_dir, *components[:-1])
+        name = components[-1][:self.max_length - len(ext)]
+
+        yield path.join(directory, name + ext)
+
+        for suffix in itertools.count(2):
+            yield path.join(directory, self.sanitize(f"{name} ({suffix})") + ext)
+
+    def _claim(self, file_path, owner):
+        try:
+            fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return self._belongs_to(file_path, owner)
+
+        try:
+            os.write(fd, self.CLAIM_MARKER +
+                     f"{owner}\n{socket.gethostname()}\n{os.getpid()}".encode())
+        finally:
+            os.close(fd)
+
+        return True
+
+    def _belongs_to(self, file_path, owner):
+        # A placeholder only belongs to the same claimer, e.g. a retry or an interrupted run. A downloaded file
+        # belongs to any track unless its owner is known. A case insensitive filesystem also refuses a name
+        # differing only by case
+        if not path.isfile(file_path):
+            return False
+
+        claim = self._read_claim(file_path)
+
+        if claim:
+            return claim[0] == owner
+
+        return _get_owner(file_path, self.OWNER_ATTRIBUTE) in (None, owner)
+
+    def _read_claim(self, file_path):
+        # Only the start of a file is read, a downloaded file never starts with the marker
+        try:
+            with open(file_path, "rb") as f:
+                data = f.read(self.CLAIM_SIZE)
+        except OSError:
+            return None
+
+        if not data.startswith(self.CLAIM_MARKER):
+            return None
+
+        owner, host, pid = (data[len(self.CLAIM_MARKER):].decode(
+            errors="replace").split("\n") + [None, None])[:3]
+
+        return owner, host, _to_int(pid)
+
+
+_ASCII_WHITELIST = "-_.() " + string.ascii_letters + \
+    string.digits + "',&#$%@`~!^&+=[]{}"
+
+_CONTROL_CHARACTERS = [chr(i) for i in range(32)] + ["\x7f"]
+
+_INVALID_CHARACTERS = {
+    PathTemplate.POSIX: ["/"] + _CONTROL_CHARACTERS,
+    PathTemplate.PORTABLE: list('/\\<>:"|?*') + _CONTROL_CHARACTERS,
+    PathTemplate.ASCII: [chr(i) for i in range(128) if chr(i) not in _ASCII_WHITELIST]
+}
+
+_WINDOWS_RESERVED_NAMES = {"CON", "PRN", "AUX", "NUL", *(f"COM{i}" for i in range(1, 10)),
+                           *(f"LPT{i}" for i in range(1, 10))}
+
+
+@lru_cache(maxsize=None)
+def _translate_table(filesystem, replacement):
+    # The legacy ascii whitelist drops the invalid characters instead of replacing them
+    if filesystem == PathTemplate.ASCII:
+        replacement = None
+
+    return str.maketrans({character: replacement for character in _INVALID_CHARACTERS[filesystem]})
+
+
+@lru_cache(maxsize=8192)
+def _clean(value, filesystem, unicode, replacement):
+    # Artist, album and genre values repeat a lot, the cache skips their normalization
+    if filesystem == PathTemplate.ASCII:
+        value = unicodedata.normalize("NFKD", value).encode(
+            "ascii", "ignore").decode()
+    elif unicode != PathTemplate.KEEP:
+        value = unicodedata.normalize(unicode.upper(), value)
+
+    return value.translate(_translate_table(filesystem, replacement))
+
+
+@lru_cache(maxsize=8192)
+def _sanitize_component(value, filesystem, replacement, max_length):
+    if filesystem == PathTemplate.PORTABLE:
+        # Windows drops the trailing dots and spaces and refuses the device names
+        value = value.rstrip(". ")
+
+        if value.split(".")[0].upper() in _WINDOWS_RESERVED_NAMES:
+            value = replacement + value
+
+    if value in (".", ".."):
+        value = value.replace(".", replacement)
+
+    return value[:max_length].strip()
+
+
+def _get_owner(file_path, attribute):
+    try:
+        return os.getxattr(file_path, attribute).decode()
+    except (AttributeError, OSError):
+        return None
+
+
+def _is_running(pid):
+    # Signal 0 only checks the process, Windows has no such check and the process is taken as running
+    if not isinstance(pid, int) or os.name == "nt":
+        return True
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+
+    return True
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
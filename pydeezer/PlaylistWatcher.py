@@ -0,0 +1,253 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import threading
+import time
+
+from pydeezer.constants import job_states
+from pydeezer import util
+
+
+class PlaylistChange:
+    def __init__(self, playlist_id, title=None, checksum=None, nb_song=None):
+        """Result of polling a playlist with a {PlaylistWatcher}
+
+        Arguments:
+            playlist_id {str} -- Playlist Id
+
+        Keyword Arguments:
+            title {str} -- Title of the playlist (default: {None})
+            checksum {str} -- Checksum of the track list given by the gw playlist data (default: {None})
+            nb_song {int} -- Number of tracks given by the gw playlist data (default: {None})
+        """
+
+        self.playlist_id = str(playlist_id)
+        self.title = title
+        self.checksum = checksum
+        self.nb_song = nb_song
+
+        # Only listed when the checksum or the number of tracks changed
+        self.changed = False
+        self.track_ids = []
+        # gw track dictionaries of the new tracks, and ids of the tracks gone from the playlist
+        self.added = []
+        self.removed = []
+        self.error = None
+
+    def to_dict(self):
+        return {
+            "id": self.playlist_id,
+            "title": self.title,
+            "changed": self.changed,
+            "added": [str(track["SNG_ID"]) for track in self.added],
+            "removed": self.removed,
+            "error": self.error
+        }
+
+
+class PlaylistWatcher:
+    def __init__(self, deezer, state_path, max_workers=8):
+        """Watches playlists for added and removed tracks, e.g. to keep a mirrored playlist current.
+        A poll only asks for the gw data of each playlist, carrying its checksum and number of tracks.
+        The tracks of a playlist are only listed once one of them differs from the saved state.
+
+        Arguments:
+            deezer {Deezer} -- Logged in Deezer instance, or an {AccountPool}
+            state_path {str} -- Path of the JSON file holding the checksum, the tracks and the downloaded files of each playlist
+
+        Keyword Arguments:
+            max_workers {int} -- Number of playlists polled at the same time (default: {8})
+        """
+
+        self.deezer = deezer
+        self.state_path = state_path
+        self.max_workers = max_workers
+
+        self._lock = threading.Lock()
+
+    def poll(self, playlist_ids):
+        """Polls the playlists concurrently and compares them with the saved state. The state is only saved
+        by {commit()}, once the changes are handled. A playlist missing from the state has all its tracks added.
+
+        Arguments:
+            playlist_ids {list} -- List of playlist id
+
+        Returns:
+            list -- {PlaylistChange} of every playlist in the given order, the failed polls have their {error} set
+        """
+
+        playlist_ids = [str(playlist_id) for playlist_id in playlist_ids]
+
+        if not playlist_ids:
+            return []
+
+        state = self._read()
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(playlist_ids))) as executor:
+            return list(executor.map(lambda playlist_id: self._check(playlist_id, state.get(playlist_id)),
+                                     playlist_ids))
+
+    def commit(self, changes, result=None, remove_deleted=False):
+        """Saves the state of the changed playlists
+
+        Arguments:
+            changes {list} -- {PlaylistChange} returned by {poll()}
+
+        Keyword Arguments:
+            result {DownloadResult} -- Result of downloading the added tracks. The paths of the downloaded tracks are kept
+                                       for {remove_deleted}, the tracks that were not downloaded are left out of the state
+                                       so they are added again on the next poll (default: {None})
+            remove_deleted {bool} -- Deletes the files of the removed tracks, unless another watched playlist
+                                     still holds them (default: {False})
+
+        Returns:
+            list -- Paths of the deleted files
+        """
+
+        paths = {}
+        failed = set()
+
+        if result is not None:
+            for job in result.jobs:
+                if job.state == job_states.DONE:
+                    paths[job.id] = job.path
+                else:
+                    failed.add(job.id)
+
+        with self._lock:
+            state = self._read()
+            deleted = []
+
+            for change in changes:
+                if change.error or not change.changed:
+                    continue
+
+                previous = state.get(change.playlist_id) or {}
+                track_ids = [track_id for track_id in change.track_ids if track_id not in failed]
+                kept = set(track_ids)
+
+                entry_paths = {track_id: file_path for track_id, file_path in previous.get("paths", {}).items()
+                               if track_id in kept}
+                entry_paths.update((track_id, paths[track_id]) for track_id in kept if track_id in paths)
+
+                state[change.playlist_id] = {
+                    "title": change.title,
+                    # A playlist with failed tracks is listed again on the next poll even if it did not change
+                    "checksum": change.checksum if len(kept) == len(change.track_ids) else None,
+                    "nb_song": change.nb_song,
+                    "tracks": track_ids,
+                    "paths": entry_paths
+                }
+
+                if remove_deleted:
+                    deleted += [previous["paths"][track_id] for track_id in change.removed
+                                if track_id in previous.get("paths", {})]
+
+            if deleted:
+                in_use = {file_path for entry in state.values()
+                          for file_path in entry.get("paths", {}).values()}
+                deleted = [file_path for file_path in dict.fromkeys(deleted) if file_path not in in_use]
+
+                for file_path in deleted:
+                    try:
+                        os.remove(file_path)
+                    except FileNotFoundError:
+                        pass
+
+            self._write(state)
+
+        return deleted
+
+    def watch(self, playlist_ids, on_change, interval=600, remove_deleted=False, stop_event=None):
+        """Polls the playlists every {interval} seconds until {stop_event} is set, at least once
+
+        Arguments:
+            playlist_ids {list} -- List of playlist id
+            on_change {function} -- Called with the changed and the failed {PlaylistChange} of a poll, e.g. downloading
+                                    the added tracks. Its return value, a {DownloadResult} or None, is given to {commit()}
+
+        Keyword Arguments:
+            interval {int} -- Seconds between the start of two polls (default: {600})
+            remove_deleted {bool} -- See {commit()} (default: {False})
+            stop_event {threading.Event} -- Stops watching once set (default: {None})
+        """
+
+        stop_event = stop_event or threading.Event()
+
+        # A stop event set beforehand polls a single time
+        while True:
+            started = time.monotonic()
+            changed = [change for change in self.poll(playlist_ids)
+                       if change.changed or change.error]
+
+            if changed:
+                result = on_change(changed)
+                deleted = self.commit(changed, result=result, remove_deleted=remove_deleted)
+
+                if deleted:
+                    import rich
+
+                    rich.print(f"[bold yellow]Deleted {len(deleted)} tracks removed from their playlist.")
+
+            if stop_event.wait(max(0, interval - (time.monotonic() - started))):
+                return
+
+    def _check(self, playlist_id, entry):
+        change = PlaylistChange(playlist_id)
+
+        try:
+            with util.client(self.deezer) as deezer:
+                data = deezer.get_playlist(playlist_id)
+
+                # The official api fallback names the fields differently
+                change.title = data.get("TITLE", data.get("title"))
+                change.checksum = data.get("CHECKSUM", data.get("checksum"))
+                change.nb_song = int(data.get("NB_SONG", data.get("nb_tracks")) or 0)
+
+                if entry and entry.get("checksum") and entry["checksum"] == change.checksum \
+                        and entry.get("nb_song") == change.nb_song:
+                    return change
+
+                tracks = list(deezer.iter_playlist_tracks(playlist_id))
+        except Exception as e:
+            change.error = str(e) or type(e).__name__
+            return change
+
+        known = set((entry or {}).get("tracks", []))
+        seen = set()
+
+        for track in tracks:
+            track_id = str(track["SNG_ID"])
+
+            # A track can be in a playlist more than once
+            if track_id in seen:
+                continue
+
+            seen.add(track_id)
+            change.track_ids.append(track_id)
+
+            if track_id not in known:
+                change.added.append(track)
+
+        change.removed = [track_id for track_id in (entry or {}).get("tracks", []) if track_id not in seen]
+        change.changed = True
+
+        return change
+
+    def _read(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, state):
+        directory = os.path.dirname(os.path.abspath(self.state_path))
+        util.create_folders(directory)
+
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+
+        os.replace(tmp_path, self.state_path)
@@ -1,11 +1,4 @@
-from rich.progress import (
-    BarColumn,
-    DownloadColumn,
-    TextColumn,
-    TransferSpeedColumn,
-    TimeRemainingColumn,
-    Progress
-)
+import time
 
 
 class BaseProgressHandler:
@@ -27,11 +20,27 @@ class BaseProgressHandler:
             self.size_downloaded += self.current_chunk_size
 
     def close(self, *args, **kwargs):
+        # The iterable holds the response and its connection
+        self.iterable = None
+
+    def fail(self, *args, **kwargs):
+        self.iterable = None
+
+    def close_progress(self):
         pass
 
 
 class DefaultProgressHandler(BaseProgressHandler):
     def __init__(self):
+        from rich.progress import (
+            BarColumn,
+            DownloadColumn,
+            TextColumn,
+            TransferSpeedColumn,
+            TimeRemainingColumn,
+            Progress
+        )
+
         self.progress = Progress(
             TextColumn("[bold blue]{task.fields[title]}", justify="right"),
             BarColumn(bar_width=None),
@@ -57,4 +66,60 @@ class DefaultProgressHandler(BaseProgressHandler):
                              advance=self.current_chunk_size)
 
     def close(self, *args, **kwargs):
+        super().close()
+        self.progress.stop()
+
+    def fail(self, *args, **kwargs):
+        super().fail()
         self.progress.stop()
+
+
+class QueueProgressHandler(BaseProgressHandler):
+    def __init__(self, queue, flush_interval=0.2):
+        """Forwards the progress events into a queue, e.g. from a child process to its parent.
+        The updates of each track are merged and sent at most once every {flush_interval} seconds.
+
+        Arguments:
+            queue {Queue} -- Any object with a put() method, like a {multiprocessing.Queue}
+
+        Keyword Arguments:
+            flush_interval {float} -- Seconds between two update events of the same track (default: {0.2})
+        """
+
+        self.queue = queue
+        self.flush_interval = flush_interval
+        self.pending = {}
+
+    def initialize(self, iterable, track_title, track_quality, total_size, chunk_size, **kwargs):
+        track_id = kwargs["track_id"]
+        self.pending[track_id] = [0, time.time()]
+
+        self.queue.put(("initialize", track_id, track_title,
+                        track_quality, total_size, chunk_size))
+
+    def update(self, *args, **kwargs):
+        track_id = kwargs["track_id"]
+        pending = self.pending.setdefault(track_id, [0, time.time()])
+        pending[0] += kwargs["current_chunk_size"]
+
+        if time.time() - pending[1] >= self.flush_interval:
+            self._flush(track_id)
+
+    def close(self, *args, **kwargs):
+        self._flush(kwargs["track_id"])
+        self.pending.pop(kwargs["track_id"], None)
+        self.queue.put(("close", kwargs["track_id"]))
+
+    def fail(self, *args, **kwargs):
+        self.pending.pop(kwargs["track_id"], None)
+        self.queue.put(("fail", kwargs["track_id"], kwargs.get("error")))
+
+    def _flush(self, track_id):
+        pending = self.pending.get(track_id)
+
+        if pending and pending[0]:
+            self.queue.put(("update", track_id, pending[0]))
+
+        if pending:
+            pending[0] = 0
+            pending[1] = time.time()
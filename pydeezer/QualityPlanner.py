@@ -0,0 +1,308 @@
+import heapq
+import itertools
+
+from pydeezer.constants import track_formats
+from pydeezer import util
+
+
+class QualityPlan:
+    def __init__(self, budget, min_quality, max_quality, tag_overhead):
+        """Quality picked for each track by a {QualityPlanner}, give it to {Downloader(quality_plan=...)} with {tracks}
+
+        Arguments:
+            budget {int} -- Bytes the tracks may take
+            min_quality {str} -- No track goes below this quality
+            max_quality {str} -- No track goes above this quality
+            tag_overhead {int} -- Bytes counted for the tags of each track on top of its audio
+        """
+
+        self.budget = budget
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.tag_overhead = tag_overhead
+
+        # Planned tracks in their input order, as gw track dictionaries
+        self.tracks = []
+        # Ids of the tracks with no known size between the min and max qualities,
+        # and of the tracks that did not fit even in their cheapest quality
+        self.unavailable = []
+        self.over_budget = []
+
+        self._qualities = {}
+        self._sizes = {}
+
+    def __len__(self):
+        return len(self.tracks)
+
+    @property
+    def fits(self):
+        return not self.over_budget
+
+    @property
+    def total_size(self):
+        return sum(self._sizes.values())
+
+    def add(self, track, quality, size):
+        track_id = str(track["SNG_ID"])
+
+        self.tracks.append(track)
+        self._qualities[track_id] = quality
+        self._sizes[track_id] = size
+
+    def quality_of(self, track_id, default=None):
+        return self._qualities.get(str(track_id), default)
+
+    def fallback_qualities(self, quality):
+        """Gets the qualities a track planned in {quality} can fall back to without going over its planned size
+        nor under {min_quality}
+
+        Arguments:
+            quality {str} -- Planned quality, use values from {constants.track_formats}
+
+        Returns:
+            list -- Qualities from the best to the worst
+        """
+
+        allowed = QualityPlanner.qualities_between(self.min_quality, quality)
+
+        return [q for q in reversed(allowed) if q != quality]
+
+    def formats(self):
+        """Gets the number of tracks and their bytes for each quality
+
+        Returns:
+            dict -- {"tracks": int, "bytes": int} keyed by quality, from the worst to the best quality
+        """
+
+        formats = {}
+
+        for quality in track_formats.FORMAT_LIST:
+            track_ids = [track_id for track_id, q in self._qualities.items() if q == quality]
+
+            if track_ids:
+                formats[quality] = {
+                    "tracks": len(track_ids),
+                    "bytes": sum(self._sizes[track_id] for track_id in track_ids)
+                }
+
+        return formats
+
+    def to_dict(self):
+        return {
+            "budget": self.budget,
+            "min_quality": self.min_quality,
+            "max_quality": self.max_quality,
+            "total_size": self.total_size,
+            "formats": self.formats(),
+            "tracks": [{"id": str(track["SNG_ID"]), "quality": self._qualities[str(track["SNG_ID"])],
+                        "size": self._sizes[str(track["SNG_ID"])]} for track in self.tracks],
+            "unavailable": self.unavailable,
+            "over_budget": self.over_budget
+        }
+
+    def print(self):
+        import rich
+
+        rich.print(f"[bold]Quality plan of {len(self.tracks)} tracks, "
+                   f"{_format_size(self.total_size)} of {_format_size(self.budget)}:")
+
+        for quality, stats in self.formats().items():
+            rich.print(f"  {quality:<8} {stats['tracks']:>6} tracks  {_format_size(stats['bytes']):>10}")
+
+        if self.unavailable:
+            rich.print(f"[bold yellow]{len(self.unavailable)} tracks are not available "
+                       f"between {self.min_quality} and {self.max_quality}.")
+
+        if self.over_budget:
+            rich.print(f"[bold red]{len(self.over_budget)} tracks do not fit in the budget "
+                       f"even in {self.min_quality}.")
+
+
+class QualityPlanner:
+    # Bytes of the 1000x1000 cover and the text tags written into every file, not part of the gw file sizes
+    TAG_OVERHEAD = 256 * 1024
+
+    # Track ids resolved by a single request
+    RESOLVE_BATCH = 100
+
+    def __init__(self, deezer, budget, min_quality=track_formats.MP3_128, max_quality=track_formats.FLAC,
+                 tag_overhead=TAG_OVERHEAD):
+        """Picks a quality for each track to get the best quality that fits into a total byte budget, e.g. syncing
+        a large playlist onto a device. The file sizes of every quality are read from the gw track data, the upgrades
+        costing the fewest bytes per quality step are made first.
+
+        Arguments:
+            deezer {Deezer} -- Logged in Deezer instance, or an {AccountPool}, resolving the bare track ids
+            budget {int} -- Bytes the tracks may take
+
+        Keyword Arguments:
+            min_quality {str} -- No track goes below this quality, use values from {constants.track_formats} (default: {MP3_128})
+            max_quality {str} -- No track goes above this quality (default: {FLAC})
+            tag_overhead {int} -- Bytes counted for the tags of each track on top of its audio (default: {TAG_OVERHEAD})
+
+        Raises:
+            ValueError: Will be raised if {min_quality} is above {max_quality}
+        """
+
+        if not self.qualities_between(min_quality, max_quality):
+            raise ValueError(
+                f"The min quality {min_quality} is above the max quality {max_quality}")
+
+        self.deezer = deezer
+        self.budget = budget
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.tag_overhead = tag_overhead
+
+    @staticmethod
+    def qualities_between(min_quality, max_quality):
+        """Gets the qualities from {min_quality} to {max_quality}, from the worst to the best"""
+
+        qualities = track_formats.FORMAT_LIST
+
+        return qualities[qualities.index(min_quality):qualities.index(max_quality) + 1]
+
+    def plan(self, tracks):
+        """Plans the quality of every track. Every track first gets its cheapest quality in the input order,
+        the tracks that do not fit into what is left even then are left out. The remaining budget is then spent on upgrades,
+        and what the upgrades along the hull could not use on the qualities they skipped.
+
+        Arguments:
+            tracks {iterable} -- Track ids or gw track dictionaries, an iterator is read entirely
+
+        Returns:
+            QualityPlan -- Planned tracks with their quality
+        """
+
+        plan = QualityPlan(self.budget, self.min_quality,
+                           self.max_quality, self.tag_overhead)
+        qualities = self.qualities_between(self.min_quality, self.max_quality)
+
+        # Known (quality, size) options of every track, their upper hull and the [track, quality, size] it stands at
+        options = []
+        hulls = []
+        planned = []
+        remaining = self.budget
+
+        for track in self._iter_resolved(tracks):
+            if not isinstance(track, dict):
+                plan.unavailable.append(str(track))
+                continue
+
+            track_options = self._options(track, qualities)
+
+            if not track_options:
+                plan.unavailable.append(str(track["SNG_ID"]))
+                continue
+
+            quality, size = track_options[0]
+            size += self.tag_overhead
+
+            if size > remaining:
+                plan.over_budget.append(str(track["SNG_ID"]))
+                continue
+
+            remaining -= size
+            planned.append([track, quality, size])
+            options.append(track_options)
+            hulls.append(self._hull(track_options))
+
+        remaining = self._upgrade(planned, hulls, remaining)
+        # A hull step that did not fit may skip a quality that still does, e.g. MP3_320 between MP3_128 and FLAC
+        self._upgrade(planned, options, remaining)
+
+        for track, quality, size in planned:
+            plan.add(track, quality, size)
+
+        return plan
+
+    def _upgrade(self, planned, steps, remaining):
+        # Cheapest upgrades first: extra bytes per quality step, ties keep the input order
+        heap = []
+
+        for index, track_steps in enumerate(steps):
+            current = [quality for quality, _ in track_steps].index(planned[index][1])
+            self._push_step(heap, index, track_steps, current + 1)
+
+        while heap:
+            _, index, step, cost = heapq.heappop(heap)
+
+            if cost > remaining:
+                # The next steps of this track build on this one
+                continue
+
+            remaining -= cost
+            quality, size = steps[index][step]
+            planned[index][1:] = [quality, size + self.tag_overhead]
+            self._push_step(heap, index, steps[index], step + 1)
+
+        return remaining
+
+    def _options(self, track, qualities):
+        # Known (quality, size) of the allowed qualities, a quality costing as much as a better one is left out
+        options = []
+
+        for quality in qualities:
+            try:
+                size = int(track.get(f"FILESIZE_{quality}") or 0)
+            except (TypeError, ValueError):
+                continue
+
+            if size <= 0:
+                continue
+
+            while options and options[-1][1] >= size:
+                options.pop()
+
+            options.append((quality, size))
+
+        return options
+
+    def _hull(self, options):
+        # Upper convex hull, each step gives fewer quality steps per byte than the previous one
+        # so taking the steps in order of their cost per quality step stays valid for every track
+        hull = []
+
+        for option in options:
+            while len(hull) >= 2 and self._slope(hull[-2], hull[-1]) <= self._slope(hull[-2], option):
+                hull.pop()
+
+            hull.append(option)
+
+        return hull
+
+    @staticmethod
+    def _slope(a, b):
+        rank = track_formats.FORMAT_LIST.index
+
+        return (rank(b[0]) - rank(a[0])) / (b[1] - a[1])
+
+    def _push_step(self, heap, index, steps, step):
+        if step >= len(steps):
+            return
+
+        cost = steps[step][1] - steps[step - 1][1]
+        gain = track_formats.FORMAT_LIST.index(steps[step][0]) - \
+            track_formats.FORMAT_LIST.index(steps[step - 1][0])
+
+        heapq.heappush(heap, (cost / gain, index, step, cost))
+
+    def _iter_resolved(self, tracks):
+        tracks = iter(tracks)
+
+        while True:
+            batch = list(itertools.islice(tracks, self.RESOLVE_BATCH))
+
+            if not batch:
+                return
+
+            # The ids that could not be resolved stay bare and are reported as unavailable
+            yield from util.resolve_tracks(self.deezer, batch)
+
+
+def _format_size(size):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+
+        size /= 1024
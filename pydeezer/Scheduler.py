@@ -0,0 +1,129 @@
+import heapq
+import itertools
+import threading
+
+from pydeezer.constants import track_formats
+
+
+class Scheduler:
+    # Policies
+    FIFO = "fifo"
+    SHORTEST_FIRST = "sjf"
+    LONGEST_FIRST = "ljf"
+
+    POLICIES = [FIFO, SHORTEST_FIRST, LONGEST_FIRST]
+
+    def __init__(self, policy=FIFO, quality=track_formats.MP3_320, lookahead=500):
+        """Orders the tracks waiting for a {Downloader} worker. Tracks with a higher priority always go first,
+        tracks of the same priority are ordered by the policy.
+
+        Keyword Arguments:
+            policy {str} -- {Scheduler.FIFO} keeps the input order, {Scheduler.SHORTEST_FIRST} starts the smallest files first
+                            to get the first tracks done sooner, {Scheduler.LONGEST_FIRST} starts the largest files first so
+                            they do not end up alone at the end of the run (default: {FIFO})
+            quality {str} -- Quality whose file size is expected, use values from {constants.track_formats} (default: {MP3_320})
+            lookahead {int} -- Number of tracks read ahead of the workers to be ordered, FIFO only reads ahead
+                               when there are priorities (default: {500})
+
+        Raises:
+            ValueError: Will be raised if the policy is unknown
+        """
+
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown scheduling policy {policy}")
+
+        self.policy = policy
+        self.quality = quality
+        self.lookahead = lookahead
+
+        self._heap = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._heap)
+
+    @property
+    def needs_sizes(self):
+        return self.policy != self.FIFO
+
+    def push(self, track, priority=0, quality=None):
+        """Adds a track to the waiting ones
+
+        Arguments:
+            track {str|dict} -- Track id or gw track dictionary, the size of an id is unknown and it goes after the known ones
+
+        Keyword Arguments:
+            priority {int} -- Higher priorities jump ahead of the lower ones whatever the policy (default: {0})
+            quality {str} -- Quality the track will be downloaded in, e.g. picked by a {QualityPlanner},
+                             uses {self.quality} if None (default: {None})
+        """
+
+        key = 0
+
+        if self.needs_sizes:
+            size = self.expected_size(track, quality or self.quality)
+
+            if size is None:
+                key = float("inf")
+            else:
+                key = size if self.policy == self.SHORTEST_FIRST else -size
+
+        with self._lock:
+            heapq.heappush(
+                self._heap, (-priority, key, next(self._order), track))
+
+    def pop(self):
+        """Takes the next track
+
+        Returns:
+            str|dict -- Track id or gw track dictionary, None if no track is waiting
+        """
+
+        with self._lock:
+            if not self._heap:
+                return None
+
+            return heapq.heappop(self._heap)[-1]
+
+    def peek(self, count):
+        """Gets the next tracks without taking them
+
+        Arguments:
+            count {int} -- Maximum number of tracks
+
+        Returns:
+            list -- Track ids or gw track dictionaries, in the order they would be taken
+        """
+
+        with self._lock:
+            return [item[-1] for item in heapq.nsmallest(count, self._heap)]
+
+    @staticmethod
+    def expected_size(track, quality):
+        """Gets the expected file size of a gw track, falling back to the qualities {Downloader} would fall back to
+
+        Arguments:
+            track {str|dict} -- Track id or gw track dictionary
+            quality {str} -- Requested quality, use values from {constants.track_formats}
+
+        Returns:
+            int -- Size in bytes, None if unknown
+        """
+
+        if not isinstance(track, dict):
+            return None
+
+        qualities = [quality] + [q for q in track_formats.FALLBACK_QUALITIES
+                                 if q != quality]
+
+        for q in qualities:
+            try:
+                size = int(track.get(f"FILESIZE_{q}") or 0)
+            except (TypeError, ValueError):
+                continue
+
+            if size > 0:
+                return size
+
+        return None
@@ -0,0 +1,515 @@
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from urllib.parse import urlsplit, parse_qs
+
+from pydeezer.AccountPool import AccountPool
+from pydeezer.BandwidthLimiter import BandwidthLimiter
+from pydeezer.Downloader import Downloader, DownloadResult
+from pydeezer.ProgressHandler import BaseProgressHandler
+from pydeezer.constants import job_states
+from pydeezer import util
+
+
+class Server:
+    # Finished jobs kept for the status requests
+    HISTORY = 1000
+
+    def __init__(self, deezer, download_dir, host="127.0.0.1", port=8765, socket_path=None, history=HISTORY,
+                 bandwidth_limiter=None, **options):
+        """Long running download service. The logged in Deezer instance, its caches and connections and the
+        {Downloader} workers stay warm between the requests, submitting a track only queues it.
+        Serves a small JSON API on a local TCP port or a Unix socket, see {Client}.
+
+            POST /jobs {"links": [...], "priority": 0}   Queues tracks, albums, playlists and artists
+            GET /jobs, GET /jobs/{id}                    State and progress of the jobs
+            DELETE /jobs/{id}                            Cancels a job
+            GET /metrics                                 Counters, throughput, bandwidth, backend and account stats
+            PUT /limits {"rate": ..., "per_download": ...}  Changes the bandwidth limits
+            POST /shutdown                               Stops the server once the running jobs are done
+
+        Arguments:
+            deezer {Deezer} -- Logged in Deezer instance, or an {AccountPool}
+            download_dir {str} -- Directory where the tracks are to be saved
+
+        Keyword Arguments:
+            host {str} -- Address the API listens on, keep it local as the API has no authentication (default: {"127.0.0.1"})
+            port {int} -- Port the API listens on, 0 picks a free one (default: {8765})
+            socket_path {str} -- Listens on this Unix socket instead of {host} and {port} (default: {None})
+            history {int} -- Number of finished jobs whose status is kept (default: {HISTORY})
+            bandwidth_limiter {BandwidthLimiter} -- Initial limits, an unlimited one is created so the limits
+                                                    can be changed later (default: {None})
+            **options -- Passed to the {Downloader}, e.g. quality, concurrent_downloads, output_template or dedup_index
+        """
+
+        self.deezer = deezer
+        self.history = history
+        self.bandwidth_limiter = bandwidth_limiter or BandwidthLimiter()
+
+        self.progress_handler = _ProgressTracker()
+        self.downloader = Downloader(deezer, None, download_dir, progress_handler=self.progress_handler,
+                                     record_jobs=False, bandwidth_limiter=self.bandwidth_limiter,
+                                     keep_running=True, **options)
+        self.downloader.result = _ServerResult(self)
+
+        # Submitted jobs not finished yet, and the last finished ones
+        self._pending = {}
+        self._finished = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.started_at = time.time()
+        self._worker = None
+
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+            self.http_server = _UnixHTTPServer(socket_path, _RequestHandler)
+        else:
+            self.http_server = ThreadingHTTPServer(
+                (host, port), _RequestHandler)
+
+        self.http_server.service = self
+        self.socket_path = socket_path
+
+    @property
+    def address(self):
+        if self.socket_path:
+            return self.socket_path
+
+        host, port = self.http_server.server_address[:2]
+
+        return f"http://{host}:{port}"
+
+    def serve_forever(self):
+        """Starts the workers and serves the API until {shutdown()} is called"""
+
+        self.start()
+
+        try:
+            self.http_server.serve_forever()
+        finally:
+            self.close()
+
+    def start(self):
+        """Starts the workers without serving the API"""
+
+        if self._worker is None:
+            # Placeholders of a crashed run would push the new downloads to suffixed paths
+            self.downloader.output_template.remove_stale(self.downloader.download_dir)
+
+            self._worker = threading.Thread(
+                target=self.downloader._run, daemon=True)
+            self._worker.start()
+
+    def shutdown(self):
+        """Stops serving the API, {serve_forever()} returns once the running jobs are done.
+        The queued jobs are cancelled."""
+
+        # Called from a request thread, serve_forever() has to return on its own thread
+        threading.Thread(target=self.http_server.shutdown, daemon=True).start()
+
+    def close(self):
+        running = {job.id for job in self.downloader.running_jobs}
+
+        with self._lock:
+            queued = [track_id for track_id in self._pending if track_id not in running]
+
+        # The queued jobs are popped and cancelled right away instead of being downloaded
+        for track_id in queued:
+            self.downloader.cancel(track_id)
+
+        self.downloader.stop()
+
+        if self._worker is not None:
+            self._worker.join()
+
+        self.http_server.server_close()
+
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def submit(self, links, priority=0, default_type="track", artist_tracks="top"):
+        """Queues tracks, the albums, playlists and artists are expanded in the background
+
+        Arguments:
+            links {list} -- Deezer ids, "type:id" strings or deezer.com urls
+
+        Keyword Arguments:
+            priority {int} -- Higher priorities go first (default: {0})
+            default_type {str} -- Media type of the bare ids (default: {"track"})
+            artist_tracks {str} -- "top" or "discography" (default: {"top"})
+
+        Raises:
+            ValueError: Will be raised if a link is not a Deezer track, album, playlist or artist
+
+        Returns:
+            dict -- Ids of the queued tracks and the links being expanded
+        """
+
+        media = [util.parse_deezer_url(str(link), default_type=default_type)
+                 for link in links]
+
+        queued = []
+        expanding = []
+
+        for media_type, media_id in media:
+            if media_type == "track":
+                if self._add(media_id, priority):
+                    queued.append(media_id)
+            else:
+                expanding.append(f"{media_type}:{media_id}")
+                threading.Thread(target=self._expand, args=(media_type, media_id, priority, artist_tracks),
+                                 daemon=True).start()
+
+        return {"queued": queued, "expanding": expanding}
+
+    def cancel(self, track_id):
+        """Cancels a queued or running job
+
+        Arguments:
+            track_id {str} -- Track Id
+
+        Returns:
+            dict -- Status of the job, None if it is neither queued nor running
+        """
+
+        track_id = str(track_id)
+
+        with self._lock:
+            record = self._pending.get(track_id)
+
+            if record is None:
+                return None
+
+            record["cancel_requested"] = True
+
+        self.downloader.cancel(track_id)
+
+        return self.status(track_id)
+
+    def status(self, track_id):
+        """Gets the state and progress of a job
+
+        Arguments:
+            track_id {str} -- Track Id
+
+        Returns:
+            dict -- Status of the job, None if it is unknown
+        """
+
+        track_id = str(track_id)
+        running = {job.id: job for job in self.downloader.running_jobs}
+
+        with self._lock:
+            if track_id in self._pending:
+                return self._status(self._pending[track_id], running)
+
+            finished = self._finished.get(track_id)
+
+            return dict(finished) if finished else None
+
+    def jobs(self, state=None):
+        """Gets the status of the pending and the last finished jobs
+
+        Keyword Arguments:
+            state {str} -- Only keeps the jobs in this state, use values from {constants.job_states} (default: {None})
+
+        Returns:
+            list -- List of job statuses
+        """
+
+        running = {job.id: job for job in self.downloader.running_jobs}
+
+        with self._lock:
+            jobs = [self._status(record, running) for record in self._pending.values()] + \
+                [dict(record) for record in self._finished.values()]
+
+        return [job for job in jobs if not state or job["state"] == state]
+
+    def metrics(self):
+        """Gets the counters of the service
+
+        Returns:
+            dict -- Job counters, bytes, throughput, bandwidth limits, backend circuits, dedup and account stats
+        """
+
+        counters = self.downloader.result.counters()
+        uptime = time.time() - self.started_at
+        running = self.downloader.running_jobs
+
+        with self._lock:
+            pending = len(self._pending)
+
+        metrics = {
+            "uptime": uptime,
+            "jobs": {
+                "queued": pending - len(running),
+                "running": len(running),
+                "done": counters["done"],
+                "failed": counters["failed"],
+                "cancelled": counters["cancelled"],
+                "skipped": counters["skipped"],
+                "deduplicated": counters["deduplicated"]
+            },
+            "bytes": counters["total_size"],
+            "throughput": counters["total_size"] / uptime if uptime else 0,
+            "transferring": self.progress_handler.transferring(),
+            "bandwidth": self.bandwidth_limiter.stats(),
+            "circuit_breakers": self.deezer.circuit_breaker.stats(),
+            "single_flight": self.deezer.single_flight.stats()
+        }
+
+        if self.downloader.dedup_index:
+            metrics["dedup"] = self.downloader.dedup_index.stats()
+
+        if isinstance(self.deezer, AccountPool):
+            metrics["accounts"] = self.deezer.stats()
+
+        return metrics
+
+    def set_limits(self, **limits):
+        """Changes the bandwidth limits, see {BandwidthLimiter.set_limits()}
+
+        Returns:
+            dict -- The new limits
+        """
+
+        self.bandwidth_limiter.set_limits(**limits)
+
+        return self.bandwidth_limiter.stats()
+
+    def _add(self, track, priority):
+        track_id = str(track["SNG_ID"] if isinstance(track, dict) else track)
+
+        with self._lock:
+            # Already queued or running
+            if track_id in self._pending:
+                return False
+
+            self._finished.pop(track_id, None)
+            self._pending[track_id] = {
+                "id": track_id,
+                "title": track.get("SNG_TITLE") if isinstance(track, dict) else None,
+                "state": job_states.QUEUED,
+                "priority": priority,
+                "submitted_at": time.time()
+            }
+
+        self.downloader.add(track, priority)
+
+        return True
+
+    def _expand(self, media_type, media_id, priority, artist_tracks):
+        if media_type == "album":
+            method = "iter_album_tracks"
+        elif media_type == "playlist":
+            method = "iter_playlist_tracks"
+        elif artist_tracks == "top":
+            method = "iter_artist_top_tracks"
+        else:
+            method = "iter_artist_discography"
+
+        try:
+            # An account pool lends one of its accounts for the whole listing,
+            # the first page is queued while the next ones are fetched
+            with util.client(self.deezer) as deezer:
+                for track in getattr(deezer, method)(media_id):
+                    self._add(track, priority)
+        except Exception as e:
+            import rich
+
+            rich.print(
+                f"[bold red]Could not expand {media_type} {media_id}:[/] {e}")
+
+    def _job_finished(self, job):
+        status = job.to_dict()
+
+        with self._lock:
+            record = self._pending.pop(job.id, {})
+            status["priority"] = record.get("priority", 0)
+            status["submitted_at"] = record.get("submitted_at")
+
+            self._finished[job.id] = status
+
+            while len(self._finished) > self.history:
+                self._finished.popitem(last=False)
+
+    def _status(self, record, running):
+        status = dict(record)
+        job = running.get(record["id"])
+
+        if job is not None:
+            status["state"] = job.state
+            status["attempts"] = job.attempts
+            status["errors"] = list(job.errors)
+            status["title"] = job.info.get(
+                "title") if job.info else status["title"]
+            status.update(self.progress_handler.progress(job.id))
+
+        return status
+
+
+class _ServerResult(DownloadResult):
+    # Only keeps the counters, the finished jobs go to the bounded history of the server
+    def __init__(self, server):
+        super().__init__(record_jobs=False)
+        self.server = server
+
+    def add(self, job):
+        with self._lock:
+            super().add(job)
+            self.jobs.clear()
+
+        self.server._job_finished(job)
+
+
+class _ProgressTracker(BaseProgressHandler):
+    # Progress of the running transfers, shared by every worker
+    def __init__(self):
+        self.tracks = {}
+        self._lock = threading.Lock()
+
+    def initialize(self, iterable, track_title, track_quality, total_size, chunk_size, **kwargs):
+        with self._lock:
+            self.tracks[str(kwargs["track_id"])] = {
+                "quality": track_quality,
+                "total_size": total_size,
+                "size_downloaded": 0
+            }
+
+    def update(self, *args, **kwargs):
+        with self._lock:
+            track = self.tracks.get(str(kwargs["track_id"]))
+
+            if track:
+                track["size_downloaded"] += kwargs["current_chunk_size"]
+
+    def close(self, *args, **kwargs):
+        with self._lock:
+            self.tracks.pop(str(kwargs["track_id"]), None)
+
+    def fail(self, *args, **kwargs):
+        self.close(*args, **kwargs)
+
+    def progress(self, track_id):
+        with self._lock:
+            return dict(self.tracks.get(track_id, {}))
+
+    def transferring(self):
+        with self._lock:
+            return len(self.tracks)
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        # The headers and the body are separate writes, Nagle would hold the body back until the
+        # delayed ACK of the client, about 40 ms per request
+        self.disable_nagle_algorithm = self.request.family != socket.AF_UNIX
+
+        super().setup()
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method):
+        service = self.server.service
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        try:
+            body = self._read_body()
+
+            if parts == ["jobs"] and method == "GET":
+                return self._reply(200, service.jobs(state=query.get("state")))
+
+            if parts == ["jobs"] and method == "POST":
+                links = body.get("links") or []
+
+                if isinstance(links, str):
+                    links = [links]
+
+                if not links:
+                    return self._reply(400, {"error": "No links were given."})
+
+                return self._reply(202, service.submit(links, priority=int(body.get("priority", 0)),
+                                                       default_type=body.get("type", "track"),
+                                                       artist_tracks=body.get("artist_tracks", "top")))
+
+            if len(parts) == 2 and parts[0] == "jobs" and method in ("GET", "DELETE"):
+                status = service.status(
+                    parts[1]) if method == "GET" else service.cancel(parts[1])
+
+                if status is None:
+                    return self._reply(404, {"error": f"Unknown job {parts[1]}."})
+
+                return self._reply(200, status)
+
+            if parts == ["metrics"] and method == "GET":
+                return self._reply(200, service.metrics())
+
+            if parts == ["limits"] and method == "PUT":
+                limits = {key: body[key] for key in ("rate", "per_download", "fair")
+                          if key in body}
+
+                return self._reply(200, service.set_limits(**limits))
+
+            if parts == ["shutdown"] and method == "POST":
+                service.shutdown()
+                return self._reply(202, {"stopping": True})
+
+            return self._reply(404, {"error": f"Unknown endpoint {method} {url.path}."})
+        except (ValueError, TypeError) as e:
+            return self._reply(400, {"error": str(e)})
+        except Exception as e:
+            return self._reply(500, {"error": str(e)})
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+
+        if not length:
+            return {}
+
+        body = json.loads(self.rfile.read(length))
+
+        if not isinstance(body, dict):
+            raise ValueError("The body must be a JSON object.")
+
+        return body
+
+    def _reply(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from pydeezer import util
+
+
+class SessionStore:
+    def __init__(self, path, ttl=86400):
+        """Saves logged in sessions into a local file so a new {Deezer} instance can skip the login round trips
+
+        Arguments:
+            path {str} -- Path of the JSON file holding the sessions, it contains cookies so it is only readable by its owner
+
+        Keyword Arguments:
+            ttl {int} -- Seconds a saved session can be reused for (default: {86400})
+        """
+
+        self.path = path
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+
+    def load(self, arl):
+        """Gets the saved session of the given arl
+
+        Arguments:
+            arl {str} -- Arl used to log in
+
+        Returns:
+            dict -- Session data, None if there is no saved session or if it has expired
+        """
+
+        session = self._read().get(self._key(arl))
+
+        if not session or session["expires"] < time.time():
+            return None
+
+        return session
+
+    def save(self, arl, session):
+        """Saves the session of the given arl
+
+        Arguments:
+            arl {str} -- Arl used to log in
+            session {dict} -- Session data, see {Deezer.get_session_data()}
+        """
+
+        with self._lock:
+            sessions = self._read()
+            now = time.time()
+
+            # Drop the expired sessions of other arls while at it
+            sessions = {key: value for key, value in sessions.items()
+                        if value["expires"] >= now}
+            sessions[self._key(arl)] = dict(session, expires=now + self.ttl)
+
+            self._write(sessions)
+
+    def clear(self, arl):
+        """Removes the saved session of the given arl
+
+        Arguments:
+            arl {str} -- Arl used to log in
+        """
+
+        with self._lock:
+            sessions = self._read()
+
+            if sessions.pop(self._key(arl), None) is not None:
+                self._write(sessions)
+
+    def _key(self, arl):
+        return hashlib.sha256(arl.strip().encode("utf-8")).hexdigest()
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, sessions):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        util.create_folders(directory)
+
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(sessions, f)
+
+        os.replace(tmp_path, self.path)
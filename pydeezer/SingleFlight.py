@@ -0,0 +1,118 @@
+import copy
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        """Coalesces concurrent identical calls: callers asking for a key while a call for it is in flight
+        wait for that call and get its result, or its exception, instead of sending the same request again.
+        Nothing is kept once the call returned, it is not a cache. The callers that waited get a deep copy
+        of the result, so a caller changing its track dictionary does not change the one of the others.
+        """
+
+        self.calls = 0
+        self.coalesced = 0
+
+        self._calls = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, *args, **kwargs):
+        """Calls {function} unless a call for {key} is already in flight
+
+        Arguments:
+            key {hashable} -- e.g. the endpoint and its arguments
+            function {callable} -- Called with {args} and {kwargs}
+
+        Returns:
+            object -- Result of the call, a copy of it for the callers that waited
+        """
+
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+
+            if call.error is not None:
+                raise call.error
+
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = function(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+            call.done.set()
+
+    async def do_async(self, key, function, *args, **kwargs):
+        """Same as {do()} for a coroutine function, the callers awaiting the same key in an event loop share one task.
+        A cancelled caller does not cancel the task of the others.
+
+        Arguments:
+            key {hashable} -- e.g. the endpoint and its arguments
+            function {callable} -- Coroutine function called with {args} and {kwargs}
+
+        Returns:
+            object -- Result of the call, a copy of it for the callers that waited
+        """
+
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        task_key = (id(loop), key)
+
+        with self._lock:
+            self.calls += 1
+            task = self._tasks.get(task_key)
+            leader = task is None
+
+            if leader:
+                task = self._tasks[task_key] = loop.create_task(
+                    function(*args, **kwargs))
+                task.add_done_callback(
+                    lambda _: self._forget(task_key))
+            else:
+                self.coalesced += 1
+
+        result = await asyncio.shield(task)
+
+        return result if leader else copy.deepcopy(result)
+
+    def stats(self):
+        """Gets the number of calls
+
+        Returns:
+            dict -- Number of calls, of calls that waited for another one and of calls in flight
+        """
+
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls) + len(self._tasks)
+            }
+
+    def _forget(self, task_key):
+        with self._lock:
+            self._tasks.pop(task_key, None)
@@ -0,0 +1,219 @@
+import threading
+import time
+
+from pydeezer import util
+
+
+class TokenManager:
+    # Tracks renewed by a single song.getListData request
+    RENEW_BATCH = 100
+
+    def __init__(self, deezer, margin=600, batch_size=RENEW_BATCH, resolver=None):
+        """Keeps the track tokens of the waiting tracks fresh. Tracks resolved long before their turn, e.g. the first
+        pages of a large playlist, are renewed in bulk right before they are handed to the workers, together with
+        the tracks waiting behind them, so a worker never stalls on a renewal of its own.
+
+        Arguments:
+            deezer {Deezer} -- Logged in Deezer instance, or an {AccountPool}
+
+        Keyword Arguments:
+            margin {int} -- Seconds before its expiry a token is renewed, a track without a token
+                            (a bare id or an official api track) is resolved too (default: {600})
+            batch_size {int} -- Tracks renewed by a single request (default: {RENEW_BATCH})
+            resolver {callable} -- Bulk media url resolver called as {resolver(deezer, tracks, quality)} with the renewed
+                                   gw tracks, returning (url, quality) tuples keyed by track id, e.g. {Deezer.get_media_urls}.
+                                   The workers then skip the url requests of these tracks (default: {None})
+        """
+
+        self.deezer = deezer
+        self.margin = margin
+        self.batch_size = batch_size
+        self.resolver = resolver
+
+        self.requests = 0
+        self.renewed = 0
+        self.resolved = 0
+
+        # Fresh gw tracks with the expiry of their token, and urls waiting to be taken, keyed by track id
+        self._tracks = {}
+        self._urls = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def track_id(track):
+        if not isinstance(track, dict):
+            return str(track)
+
+        return str(track.get("SNG_ID") or track.get("id"))
+
+    @staticmethod
+    def expires_at(track):
+        """Gets the expiry of the token of a track
+
+        Arguments:
+            track {str|dict} -- Track id, gw track dictionary or mapped track
+
+        Returns:
+            int -- Unix time, None if the track has no token
+        """
+
+        if not isinstance(track, dict):
+            return None
+
+        expire = track.get("TRACK_TOKEN_EXPIRE") or track.get("token_expire")
+
+        return int(expire) if expire else None
+
+    def is_expiring(self, track, now=None):
+        expire = self.expires_at(track)
+
+        return expire is None or expire - (now or time.time()) < self.margin
+
+    def is_prepared(self, track):
+        track_id = self.track_id(track)
+
+        with self._lock:
+            if track_id in self._tracks:
+                renewed = self._tracks[track_id][0]
+
+                # A track renewed long before its turn may be expiring again
+                return renewed is None or not self.is_expiring(renewed)
+
+            return not self.is_expiring(track) and not self.resolver
+
+    def prepare(self, tracks, quality=None, resolve_urls=True):
+        """Renews the expiring tokens of the tracks in bulk and, with a resolver, resolves their download urls.
+        Tracks a request did not return are left for the workers to resolve.
+
+        Arguments:
+            tracks {list} -- Track ids, gw track dictionaries or mapped tracks
+
+        Keyword Arguments:
+            quality {str} -- Quality of the resolved urls, use values from {constants.track_formats} (default: {None})
+            resolve_urls {bool} -- Set to False to only renew the tokens (default: {True})
+        """
+
+        now = time.time()
+
+        with self._lock:
+            self._evict(now)
+
+            expiring = list({self.track_id(track): track for track in tracks
+                             if self.track_id(track) not in self._tracks and self.is_expiring(track, now)})
+            fresh = [track for track in tracks if isinstance(track, dict) and not self.is_expiring(track, now)]
+
+        renewed = {}
+
+        for start in range(0, len(expiring), self.batch_size):
+            renewed.update(self._get_tracks(expiring[start:start + self.batch_size]))
+
+        with self._lock:
+            self.renewed += len(renewed)
+
+            # A track the request did not return is asked for again once the margin has passed
+            for track_id in expiring:
+                track = renewed.get(track_id)
+                self._tracks[track_id] = (track, self.expires_at(track) or now + self.margin)
+
+            # None marks a track that is prepared as it is, e.g. one the request did not return,
+            # it is not asked for again when it is taken
+            for track in fresh:
+                self._tracks.setdefault(self.track_id(track), (None, self.expires_at(track)))
+
+        if not self.resolver or not resolve_urls:
+            return
+
+        with self._lock:
+            unresolved = [track for track in list(renewed.values()) + fresh
+                          if self.track_id(track) not in self._urls]
+
+        for start in range(0, len(unresolved), self.batch_size):
+            batch = unresolved[start:start + self.batch_size]
+
+            try:
+                with util.client(self.deezer) as deezer:
+                    urls = self.resolver(deezer, batch, quality)
+            except Exception:
+                # The workers resolve the urls of this batch themselves
+                continue
+
+            with self._lock:
+                self.requests += 1
+                self.resolved += len(urls)
+
+                for track in batch:
+                    track_id = self.track_id(track)
+
+                    if track_id in urls:
+                        # A url lives as long as the token it was resolved with
+                        self._urls[track_id] = (urls[track_id], self.expires_at(track))
+
+    def take(self, track):
+        """Gets the renewed version of a prepared track, the track itself if it was not renewed
+
+        Arguments:
+            track {str|dict} -- Track id or gw track dictionary
+
+        Returns:
+            str|dict -- Track id or gw track dictionary
+        """
+
+        with self._lock:
+            renewed, _ = self._tracks.pop(self.track_id(track), (None, None))
+
+        return renewed or track
+
+    def take_url(self, track_id):
+        """Gets the resolved download url of a prepared track
+
+        Arguments:
+            track_id {str} -- Track Id
+
+        Returns:
+            tuple -- (url, quality), None if there is none or its token expired meanwhile
+        """
+
+        with self._lock:
+            download_url, expire = self._urls.pop(str(track_id), (None, None))
+
+        if download_url is None or (expire and expire < time.time()):
+            return None
+
+        return download_url
+
+    def stats(self):
+        """Gets what the manager did
+
+        Returns:
+            dict -- Number of requests, renewed tracks and resolved urls
+        """
+
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "renewed": self.renewed,
+                "resolved": self.resolved,
+                "waiting": len(self._tracks)
+            }
+
+    def _get_tracks(self, track_ids):
+        try:
+            tracks = util.get_tracks(self.deezer, track_ids)
+        except Exception:
+            return {}
+
+        with self._lock:
+            self.requests += 1
+
+        return tracks
+
+    def _evict(self, now):
+        # Tracks and urls never taken, e.g. of cancelled or skipped tracks. A renewed track is renewed again
+        # once expiring, the tracks prepared as they are go when their token expired
+        for track_id, (track, expire) in list(self._tracks.items()):
+            if (track is not None and self.is_expiring(track, now)) or (track is None and expire < now):
+                del self._tracks[track_id]
+
+        for track_id, (_, expire) in list(self._urls.items()):
+            if expire and expire < now:
+                del self._urls[track_id]
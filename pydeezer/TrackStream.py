@@ -0,0 +1,168 @@
+import io
+import re
+
+from pydeezer import util
+
+
+class TrackStream(io.RawIOBase):
+    # A forward seek within this many chunks keeps reading the current response instead of sending a new request
+    SKIP_CHUNKS = 32
+
+    def __init__(self, deezer, url, track_id, quality=None, size=None, bandwidth_limiter=None):
+        """Seekable read-only file of a decrypted track, returned by {Deezer.open_track_stream()}.
+        Reading starts at the first byte asked for, the chunks are only fetched and decrypted when read,
+        a seek sends a new Range request starting at the chunk holding the new position.
+
+        Arguments:
+            deezer {Deezer} -- Deezer instance whose session is used
+            url {str} -- Download url, see {Deezer.get_track_download_url()}
+            track_id {str} -- Track Id, the decryption key is derived from it
+
+        Keyword Arguments:
+            quality {str} -- Quality of the file, see {constants.track_formats} (default: {None})
+            size {int} -- Size of the file, known once the first response is received if None (default: {None})
+            bandwidth_limiter {BandwidthLimiter} -- Throttles the reads (default: {None})
+        """
+
+        self.deezer = deezer
+        self.url = url
+        self.track_id = track_id
+        self.quality = quality
+        self.blowfish_key = util.get_blowfish_key(str(track_id))
+
+        self._size = size
+        self._position = 0
+
+        # Decrypted chunk holding the position
+        self._chunk = b""
+        self._chunk_index = None
+
+        self._response = None
+        self._chunks = None
+        self._next_index = None
+
+        self._transfer = bandwidth_limiter.transfer() if bandwidth_limiter else None
+        self._throttle = self._transfer.__enter__() if self._transfer else None
+
+    @property
+    def size(self):
+        if self._size is None:
+            # The first response tells the size of the whole file
+            self._open(self._position // util.CHUNK_SIZE)
+
+        return self._size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence {whence}")
+
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+
+        self._position = position
+
+        return position
+
+    def readinto(self, buffer):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+
+        view = memoryview(buffer).cast("B")
+        read = 0
+
+        while read < len(view) and self._position < self.size:
+            index, start = divmod(self._position, util.CHUNK_SIZE)
+            chunk = self._read_chunk(index)[start:]
+
+            if not chunk:
+                break
+
+            n = min(len(view) - read, len(chunk))
+            view[read:read + n] = chunk[:n]
+            read += n
+            self._position += n
+
+        return read
+
+    def close(self):
+        if not self.closed:
+            self._close_response()
+
+            if self._transfer:
+                self._transfer.__exit__(None, None, None)
+
+        super().close()
+
+    def _read_chunk(self, index):
+        if index == self._chunk_index:
+            return self._chunk
+
+        if self._response is None or not 0 <= index - self._next_index <= self.SKIP_CHUNKS:
+            self._open(index)
+
+        # Chunks between the response position and the wanted one are skipped without being decrypted
+        while True:
+            chunk = next(self._chunks, b"")
+
+            if self._throttle:
+                self._throttle.consume(len(chunk))
+
+            current = self._next_index
+            self._next_index += 1
+
+            if current == index or not chunk:
+                break
+
+        self._chunk = util.decrypt_chunk(self.blowfish_key, index, chunk)
+        self._chunk_index = index
+
+        return self._chunk
+
+    def _open(self, index):
+        self._close_response()
+
+        offset = index * util.CHUNK_SIZE
+        headers = {"Range": f"bytes={offset}-"} if offset else None
+
+        res = self.deezer.session.get(self.url, stream=True, headers=headers)
+        self.deezer._check_download_response(res)
+
+        if res.status_code == 206:
+            # Content-Range: bytes {start}-{end}/{size}
+            match = re.search(r"/(\d+)", res.headers.get("Content-Range", ""))
+            size = int(match.group(1)) if match else offset + \
+                int(res.headers["Content-Length"])
+        else:
+            # The whole file was sent, the chunks before the wanted one are skipped
+            index = 0
+            size = int(res.headers["Content-Length"])
+
+        if self._size is None:
+            self._size = size
+
+        self._response = res
+        self._chunks = res.iter_content(util.CHUNK_SIZE)
+        self._next_index = index
+
+    def _close_response(self):
+        if self._response is not None:
+            self._response.close()
+
+        self._response = None
+        self._chunks = None
+        self._next_index = None
@@ -1,8 +1,71 @@
-from . import util
+import importlib
+import sys
+import types
+
 from . import exceptions
 from . import constants
-from . import ProgressHandler
-from .Deezer import Deezer
-from .Downloader import Downloader
 
 name = "PyDeezer"
+
+# The heavy modules (deezer-py, requests, cryptography, mutagen, rich) are only imported
+# once one of these attributes is accessed
+_lazy_attributes = {
+    "Deezer": ".Deezer",
+    "Downloader": ".Downloader",
+    "JobQueue": ".JobQueue",
+    "AccountPool": ".AccountPool",
+    "SessionStore": ".SessionStore",
+    "Exporter": ".Exporter",
+    "PathTemplate": ".PathTemplate",
+    "OutputWriter": ".OutputWriter",
+    "BandwidthLimiter": ".BandwidthLimiter",
+    "Scheduler": ".Scheduler",
+    "DedupIndex": ".DedupIndex",
+    "TrackStream": ".TrackStream",
+    "Server": ".Server",
+    "Client": ".Client",
+    "TokenManager": ".TokenManager",
+    "CircuitBreaker": ".CircuitBreaker",
+    "SingleFlight": ".SingleFlight",
+    "HTTP2Adapter": ".HTTP2Adapter",
+    "QualityPlanner": ".QualityPlanner",
+    "QualityPlan": ".QualityPlanner",
+    "PlaylistWatcher": ".PlaylistWatcher",
+    "PlaylistChange": ".PlaylistWatcher",
+    "AvailabilityScanner": ".AvailabilityScanner",
+    "AvailabilityCache": ".AvailabilityCache"
+}
+
+_lazy_modules = ["util", "ProgressHandler", "models"]
+
+
+def __getattr__(attribute):
+    if attribute in _lazy_attributes:
+        module = importlib.import_module(
+            _lazy_attributes[attribute], __name__)
+        value = getattr(module, attribute)
+    elif attribute in _lazy_modules:
+        value = importlib.import_module("." + attribute, __name__)
+    else:
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {attribute!r}")
+
+    globals()[attribute] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy_attributes) + _lazy_modules)
+
+
+class _Package(types.ModuleType):
+    def __setattr__(self, attribute, value):
+        # Importing a submodule binds it to the package, keep the class of the same name instead
+        if attribute in _lazy_attributes and isinstance(value, types.ModuleType):
+            value = getattr(value, attribute)
+
+        super().__setattr__(attribute, value)
+
+
+sys.modules[__name__].__class__ = _Package
@@ -1,12 +1,8 @@
-from os import path
-
 import click
 from click import echo, types
-from PyInquirer import prompt
 
-from . import Deezer, util
 from .exceptions import LoginError
-from .constants.track_formats import FORMAT_LIST
+from .constants.track_formats import FORMAT_LIST, MP3_320
 
 
 @click.group()
@@ -19,20 +15,44 @@ def cli():
 @click.option("--media-type", type=types.Choice(["Track", "Album", "Playlist", "Artist"], case_sensitive=False), help="Sets the media type and how it searches the api.")
 @click.option("-d", "--download-dir", type=types.Path(exists=False, file_okay=False, dir_okay=True, resolve_path=True), help="Sets the directory on where the tracks are to be saved.")
 @click.option("-q", "--quality", type=types.Choice(FORMAT_LIST, case_sensitive=False), help="Sets the quality of the tracks. if the provided quality is not supported, the default quality of the track will be used.")
-def download(arl, media_type, download_dir, quality):
+@click.option("-o", "--output-template", default="{albumartist}/{album}/{title}", show_default=True, help="Path of the files relative to the download directory, without the extension.")
+@click.option("--filesystem", type=types.Choice(["portable", "posix", "ascii"], case_sensitive=False), default="portable", show_default=True, help="Characters replaced in the paths, portable ones work on every OS, ascii keeps the old ascii-only names.")
+@click.option("--unicode", "unicode_form", type=types.Choice(["nfc", "nfd", "keep"], case_sensitive=False), default="nfc", show_default=True, help="Unicode normalization of the paths.")
+@click.option("--session-file", type=types.Path(dir_okay=False), help="Saves the login session into this file and reuses it on the next runs.")
+@click.option("--overwrite", is_flag=True, help="Downloads again the tracks whose file is already in the download directory instead of skipping them.")
+def download(arl, media_type, download_dir, quality, output_template, filesystem, unicode_form, session_file, overwrite):
     """Download tracks"""
 
-    deezer = Deezer()
+    from os import path
+
+    # Imported here so that the other commands and --help do not pay for PyInquirer and the client
+    from PyInquirer import prompt
+    from . import Deezer, SessionStore, PathTemplate
+
+    try:
+        template = PathTemplate(output_template, filesystem=filesystem.lower(),
+                                unicode=unicode_form.lower())
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--output-template")
+
+    session_store = SessionStore(session_file) if session_file else None
+    deezer = None
     user = None
 
     if arl:
         try:
-            user = deezer.login_via_arl(arl)
+            # Restores the saved session of the arl, only logs in if there is none
+            deezer = Deezer(arl=arl, session_store=session_store)
+            user = deezer.user if deezer.logged_in else None
         except LoginError:
             user = None
+
+        if not user:
             echo("The Arl you supplied is invalid. Please try again...")
 
     if not user:
+        deezer = deezer or Deezer(session_store=session_store)
+
         def validate_arl(arl):
             try:
                 deezer.login_via_arl(arl)
@@ -183,20 +203,548 @@ def download(arl, media_type, download_dir, quality):
 
     echo(f"Starting download of {len(tracks)} tracks.")
 
+    # Placeholders of a crashed run would push the new downloads to suffixed paths
+    template.remove_stale(download_dir)
+
     for track in tracks:
         t = deezer.get_track(track)
         info = t["info"]
 
-        artist_name = util.clean_filename(info["artist"]["name"])
-        album_name = util.clean_filename(info["album"]["title"])
+        download_url = deezer.get_track_download_url(info, quality)
+        fields = PathTemplate.fields(
+            info["id"], info, t["tags"], download_url[1])
+        ext = PathTemplate.extension(download_url[1])
 
-        download_path = path.join(download_dir, artist_name, album_name)
-        util.create_folders(download_path)
+        if not overwrite and template.existing(download_dir, fields, ext):
+            echo(f"Skipping {info['title']}, it is already downloaded.")
+            continue
 
-        t["download"](download_path, quality=quality)
+        directory, filename = template.resolve(download_dir, fields, ext)
+
+        try:
+            t["download"](directory, filename=filename, sanitize=False,
+                          tags=t["tags"], download_url=download_url)
+        except BaseException:
+            template.release(path.join(directory, filename), info["id"])
+            raise
+
+        template.set_owner(path.join(directory, filename), info["id"])
 
     echo("Done!")
 
 
+@cli.command()
+@click.argument("links", nargs=-1)
+@click.option("-a", "--arl", type=types.STRING, envvar="PYDEEZER_ARL", required=True, help="Used to be able to login to Deezer, can also be given with the PYDEEZER_ARL environment variable.")
+@click.option("-i", "--input", "input_file", type=types.File("r"), help="Reads the ids or urls from this file, one per line. Use - for stdin.")
+@click.option("-t", "--type", "default_type", type=types.Choice(["track", "album", "playlist", "artist"], case_sensitive=False), default="track", show_default=True, help="Media type of the bare ids.")
+@click.option("--artist-tracks", type=types.Choice(["top", "discography"], case_sensitive=False), default="top", show_default=True, help="Downloads either the top tracks or the whole discography of the artists.")
+@click.option("-d", "--download-dir", type=types.Path(file_okay=False, dir_okay=True, resolve_path=True), required=True, help="Sets the directory on where the tracks are to be saved.")
+@click.option("-q", "--quality", type=types.Choice(FORMAT_LIST, case_sensitive=False), default=MP3_320, show_default=True, help="Sets the quality of the tracks.")
+@click.option("-o", "--output-template", default="{albumartist}/{album}/{title}", show_default=True, help="Path of the files relative to the download directory, without the extension.")
+@click.option("--filesystem", type=types.Choice(["portable", "posix", "ascii"], case_sensitive=False), default="portable", show_default=True, help="Characters replaced in the paths, portable ones work on every OS, ascii keeps the old ascii-only names.")
+@click.option("--unicode", "unicode_form", type=types.Choice(["nfc", "nfd", "keep"], case_sensitive=False), default="nfc", show_default=True, help="Unicode normalization of the paths.")
+@click.option("-w", "--workers", type=types.IntRange(min=1), default=4, show_default=True, help="Number of tracks downloaded at the same time.")
+@click.option("-p", "--processes", type=types.IntRange(min=1), default=1, show_default=True, help="Number of worker processes, each one running --workers threads.")
+@click.option("--schedule", type=types.Choice(["fifo", "sjf", "ljf"], case_sensitive=False), default="fifo", show_default=True, help="Order of the downloads, fifo keeps the input order, sjf starts the smallest files first, ljf the largest ones.")
+@click.option("--queue", "queue_file", type=types.Path(dir_okay=False), help="Persists the jobs into this SQLite file so an interrupted batch can be resumed.")
+@click.option("--dedup", "dedup_file", type=types.Path(dir_okay=False), help="Indexes the downloaded files into this SQLite file, a recording already downloaded (same ISRC and quality) is hard linked, reflinked or copied instead of downloaded again.")
+@click.option("--fsync", type=types.Choice(["none", "file", "batch"], case_sensitive=False), default="none", show_default=True, help="Syncs every file to the disk before it is renamed, or several files at once, trading throughput for durability.")
+@click.option("--limit-rate", callback=lambda ctx, param, value: _parse_rate(value, param), help="Caps the total bandwidth in bytes per second, with an optional K, M or G suffix e.g. 2M.")
+@click.option("--limit-rate-per-download", callback=lambda ctx, param, value: _parse_rate(value, param), help="Caps the bandwidth of each download. The total cap is shared equally between the running downloads.")
+@click.option("--bulk-urls", is_flag=True, help="Resolves the download urls of 100 tracks per request to the media api instead of probing each track.")
+@click.option("--budget", callback=lambda ctx, param, value: _parse_size(value, param), help="Picks the quality of each track to get the best quality that fits into this many bytes, with an optional K, M or G suffix e.g. 60G. --quality is then the best quality a track may get. The plan is printed before the downloads start.")
+@click.option("--min-quality", type=types.Choice(FORMAT_LIST, case_sensitive=False), default=FORMAT_LIST[0], show_default=True, help="With --budget, no track goes below this quality.")
+@click.option("--report", type=types.File("w"), help="Writes the JSON result report into this file. Use - for stdout.")
+@click.option("--http2", is_flag=True, help="Sends the requests over HTTP/2, multiplexed over a connection per host. Needs pip install httpx[http2].")
+@click.option("--session-file", type=types.Path(dir_okay=False), help="Saves the login session into this file and reuses it on the next runs.")
+@click.option("--overwrite", is_flag=True, help="Downloads again the tracks whose file is already in the download directory instead of skipping them.")
+def batch(links, arl, input_file, default_type, artist_tracks, download_dir, quality, output_template, filesystem,
+          unicode_form, workers, processes, schedule, queue_file, dedup_file, fsync, limit_rate, limit_rate_per_download, bulk_urls,
+          budget, min_quality, report, http2, session_file, overwrite):
+    """Download tracks, albums, playlists and artists without prompts
+
+    LINKS are Deezer ids, "type:id" strings or deezer.com urls.
+    """
+
+    import json
+    from . import Deezer, Downloader, JobQueue, PathTemplate, OutputWriter, BandwidthLimiter, DedupIndex, TokenManager, \
+        QualityPlanner
+
+    try:
+        template = PathTemplate(output_template, filesystem=filesystem.lower(),
+                                unicode=unicode_form.lower())
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--output-template")
+
+    deezer = _login(arl, session_file, http2)
+    media = _parse_links(deezer, links, input_file, default_type)
+
+    # The tracks are fetched page by page while the first ones are already downloading
+    tracks = _iter_unique_tracks(deezer, media, artist_tracks)
+
+    plan = None
+
+    if budget:
+        try:
+            planner = QualityPlanner(deezer, int(budget), min_quality=min_quality.upper(), max_quality=quality.upper())
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--min-quality")
+
+        # Every track is resolved before the first download to know the sizes of all its qualities
+        plan = planner.plan(tracks)
+        plan.print()
+
+        if not plan.fits:
+            raise click.ClickException(
+                f"The tracks do not fit into the budget, even in {plan.min_quality}. Nothing was downloaded.")
+
+        tracks = plan.tracks
+
+    echo(f"Starting download of {len(media)} links.", err=True)
+
+    limiter = None
+
+    if limit_rate or limit_rate_per_download:
+        limiter = BandwidthLimiter(
+            rate=limit_rate, per_download=limit_rate_per_download)
+
+    downloader = Downloader(deezer, tracks, download_dir, quality=quality, concurrent_downloads=workers,
+                            processes=processes, output_template=template, scheduling=schedule.lower(),
+                            queue=JobQueue(queue_file) if queue_file else None, record_jobs=bool(report),
+                            output_writer=OutputWriter(fsync=fsync.lower()), bandwidth_limiter=limiter,
+                            dedup_index=DedupIndex(dedup_file) if dedup_file else None,
+                            # Tracks of large playlists are renewed in bulk if their tokens expire before their turn
+                            token_manager=TokenManager(deezer, resolver=Deezer.get_media_urls if bulk_urls else None),
+                            quality_plan=plan, overwrite=overwrite)
+    result = downloader.start()
+
+    if report:
+        json.dump(result.to_dict(), report, indent=2)
+
+    if result.failed:
+        raise SystemExit(1)
+
+
+@cli.command()
+@click.argument("links", nargs=-1)
+@click.option("-a", "--arl", type=types.STRING, envvar="PYDEEZER_ARL", required=True, help="Used to be able to login to Deezer, can also be given with the PYDEEZER_ARL environment variable.")
+@click.option("-i", "--input", "input_file", type=types.File("r"), help="Reads the ids or urls from this file, one per line. Use - for stdin.")
+@click.option("-t", "--type", "default_type", type=types.Choice(["track", "album", "playlist", "artist"], case_sensitive=False), default="track", show_default=True, help="Media type of the bare ids.")
+@click.option("--artist-tracks", type=types.Choice(["top", "discography"], case_sensitive=False), default="top", show_default=True, help="Exports either the top tracks or the whole discography of the artists.")
+@click.option("-o", "--output", type=types.Path(dir_okay=False, allow_dash=True), required=True, help="Path of the exported file. Use - for stdout (CSV and JSON lines only).")
+@click.option("-f", "--format", "export_format", type=types.Choice(["csv", "jsonl", "parquet"], case_sensitive=False), help="Format of the exported file, guessed from the extension of the output if not given.")
+@click.option("-b", "--batch-size", type=types.IntRange(min=1), default=500, show_default=True, help="Number of tracks written at once.")
+@click.option("--session-file", type=types.Path(dir_okay=False), help="Saves the login session into this file and reuses it on the next runs.")
+def export(links, arl, input_file, default_type, artist_tracks, output, export_format, batch_size, session_file):
+    """Export the metadata of tracks, albums, playlists and artists
+
+    LINKS are Deezer ids, "type:id" strings or deezer.com urls.
+    """
+
+    import sys
+    from . import Exporter
+
+    deezer = _login(arl, session_file)
+    media = _parse_links(deezer, links, input_file, default_type)
+
+    if output == "-":
+        if not export_format:
+            raise click.UsageError("--format is needed when exporting to stdout.")
+
+        output = sys.stdout
+
+    tracks = _iter_unique_tracks(deezer, media, artist_tracks)
+
+    try:
+        count = Exporter(deezer, batch_size=batch_size).export(
+            tracks, output, format=export_format and export_format.lower())
+    except (ValueError, ImportError) as e:
+        raise click.ClickException(str(e))
+
+    echo(f"Exported {count} tracks.", err=True)
+
+
+@cli.command()
+@click.argument("links", nargs=-1)
+@click.option("-a", "--arl", type=types.STRING, envvar="PYDEEZER_ARL", required=True, help="Used to be able to login to Deezer, can also be given with the PYDEEZER_ARL environment variable.")
+@click.option("-i", "--input", "input_file", type=types.File("r"), help="Reads the ids or urls from this file, one per line. Use - for stdin.")
+@click.option("-t", "--type", "default_type", type=types.Choice(["track", "album", "playlist", "artist"], case_sensitive=False), default="track", show_default=True, help="Media type of the bare ids.")
+@click.option("--artist-tracks", type=types.Choice(["top", "discography"], case_sensitive=False), default="top", show_default=True, help="Scans either the top tracks or the whole discography of the artists.")
+@click.option("-o", "--output", type=types.Path(dir_okay=False, allow_dash=True), required=True, help="Path of the report, written as the tracks are checked. Use - for stdout.")
+@click.option("-f", "--format", "report_format", type=types.Choice(["csv", "jsonl"], case_sensitive=False), help="Format of the report, guessed from the extension of the output if not given.")
+@click.option("--cache", "cache_file", type=types.Path(dir_okay=False), help="Records the availability of the tracks into this SQLite file, the tracks checked recently are not checked again.")
+@click.option("--cache-ttl", type=types.IntRange(min=0), default=7 * 86400, show_default=True, help="Seconds a cached track is trusted for.")
+@click.option("--verify", is_flag=True, help="Probes every track on the CDN with HEAD requests, even the ones whose file sizes are known.")
+@click.option("-w", "--workers", type=types.IntRange(min=1), default=8, show_default=True, help="Number of tracks probed at the same time.")
+@click.option("--session-file", type=types.Path(dir_okay=False), help="Saves the login session into this file and reuses it on the next runs.")
+def scan(links, arl, input_file, default_type, artist_tracks, output, report_format, cache_file, cache_ttl, verify,
+         workers, session_file):
+    """Check which qualities tracks are available in
+
+    LINKS are Deezer ids, "type:id" strings or deezer.com urls. Nothing is downloaded.
+    """
+
+    import sys
+    from . import AvailabilityScanner, AvailabilityCache
+
+    deezer = _login(arl, session_file)
+    media = _parse_links(deezer, links, input_file, default_type)
+
+    if output == "-":
+        if not report_format:
+            raise click.UsageError("--format is needed when writing the report to stdout.")
+
+        output = sys.stdout
+
+    scanner = AvailabilityScanner(deezer, cache=AvailabilityCache(cache_file, ttl=cache_ttl) if cache_file else None,
+                                  max_workers=workers, verify=verify)
+
+    try:
+        stats = scanner.report(_iter_unique_tracks(deezer, media, artist_tracks), output,
+                               format=report_format and report_format.lower())
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    best = ", ".join(f"{count} in {quality}" for quality, count in sorted(
+        stats["best"].items(), key=lambda item: FORMAT_LIST.index(item[0]), reverse=True))
+
+    echo(f"Scanned {stats['tracks']} tracks: {best or 'none available'}, at best. "
+         f"{stats['unavailable']} not available, {stats['errors']} could not be checked.", err=True)
+    echo(f"{stats['cached']} tracks came from the cache, {stats['probed']} were probed "
+         f"with {stats['requests']} requests.", err=True)
+
+
+@cli.command()
+@click.option("-a", "--arl", type=types.STRING, envvar="PYDEEZER_ARL", required=True, help="Used to be able to login to Deezer, can also be given with the PYDEEZER_ARL environment variable.")
+@click.option("-d", "--download-dir", type=types.Path(file_okay=False, dir_okay=True, resolve_path=True), required=True, help="Sets the directory on where the tracks are to be saved.")
+@click.option("-q", "--quality", type=types.Choice(FORMAT_LIST, case_sensitive=False), default=MP3_320, show_default=True, help="Sets the quality of the tracks.")
+@click.option("-o", "--output-template", default="{albumartist}/{album}/{title}", show_default=True, help="Path of the files relative to the download directory, without the extension.")
+@click.option("--filesystem", type=types.Choice(["portable", "posix", "ascii"], case_sensitive=False), default="portable", show_default=True, help="Characters replaced in the paths, portable ones work on every OS, ascii keeps the old ascii-only names.")
+@click.option("--unicode", "unicode_form", type=types.Choice(["nfc", "nfd", "keep"], case_sensitive=False), default="nfc", show_default=True, help="Unicode normalization of the paths.")
+@click.option("-w", "--workers", type=types.IntRange(min=1), default=4, show_default=True, help="Number of tracks downloaded at the same time.")
+@click.option("--host", default="127.0.0.1", show_default=True, help="Address the API listens on. The API has no authentication, keep it local.")
+@click.option("--port", type=types.IntRange(min=0), default=8765, show_default=True, help="Port the API listens on.")
+@click.option("--socket", "socket_path", type=types.Path(dir_okay=False), help="Listens on this Unix socket instead of --host and --port.")
+@click.option("--schedule", type=types.Choice(["fifo", "sjf", "ljf"], case_sensitive=False), default="fifo", show_default=True, help="Order of the downloads of the same priority.")
+@click.option("--dedup", "dedup_file", type=types.Path(dir_okay=False), help="Indexes the downloaded files into this SQLite file, a recording already downloaded is linked instead of downloaded again.")
+@click.option("--limit-rate", callback=lambda ctx, param, value: _parse_rate(value, param), help="Caps the total bandwidth in bytes per second, with an optional K, M or G suffix e.g. 2M.")
+@click.option("--limit-rate-per-download", callback=lambda ctx, param, value: _parse_rate(value, param), help="Caps the bandwidth of each download.")
+@click.option("--http2", is_flag=True, help="Sends the requests over HTTP/2, multiplexed over a connection per host. Needs pip install httpx[http2].")
+@click.option("--session-file", type=types.Path(dir_okay=False), help="Saves the login session into this file and reuses it on the next runs.")
+@click.option("--overwrite", is_flag=True, help="Downloads again the tracks whose file is already in the download directory instead of skipping them.")
+def serve(arl, download_dir, quality, output_template, filesystem, unicode_form, workers, host, port, socket_path,
+          schedule, dedup_file, limit_rate, limit_rate_per_download, http2, session_file, overwrite):
+    """Run a download service controlled with the client commands
+
+    The login, the caches and the workers stay warm between the submitted jobs.
+    """
+
+    from . import Server, PathTemplate, BandwidthLimiter, DedupIndex
+
+    try:
+        template = PathTemplate(output_template, filesystem=filesystem.lower(),
+                                unicode=unicode_form.lower())
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--output-template")
+
+    deezer = _login(arl, session_file, http2)
+
+    server = Server(deezer, download_dir, host=host, port=port, socket_path=socket_path,
+                    bandwidth_limiter=BandwidthLimiter(
+                        rate=limit_rate, per_download=limit_rate_per_download),
+                    quality=quality, concurrent_downloads=workers, output_template=template,
+                    scheduling=schedule.lower(), dedup_index=DedupIndex(dedup_file) if dedup_file else None,
+                    overwrite=overwrite)
+
+    echo(f"Serving on {server.address}, stop with Ctrl+C.", err=True)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        echo("Stopping once the running downloads are done.", err=True)
+
+
+@cli.command()
+@click.argument("links", nargs=-1)
+@click.option("-a", "--arl", type=types.STRING, envvar="PYDEEZER_ARL", required=True, help="Used to be able to login to Deezer, can also be given with the PYDEEZER_ARL environment variable.")
+@click.option("-i", "--input", "input_file", type=types.File("r"), help="Reads the playlist ids or urls from this file, one per line. Use - for stdin.")
+@click.option("-s", "--state", "state_file", type=types.Path(dir_okay=False), required=True, help="Keeps the checksum, the tracks and the downloaded files of each playlist in this JSON file between the polls and the runs.")
+@click.option("-d", "--download-dir", type=types.Path(file_okay=False, dir_okay=True, resolve_path=True), required=True, help="Sets the directory on where the tracks are to be saved.")
+@click.option("-q", "--quality", type=types.Choice(FORMAT_LIST, case_sensitive=False), default=MP3_320, show_default=True, help="Sets the quality of the tracks.")
+@click.option("-o", "--output-template", default="{albumartist}/{album}/{title}", show_default=True, help="Path of the files relative to the download directory, without the extension.")
+@click.option("--filesystem", type=types.Choice(["portable", "posix", "ascii"], case_sensitive=False), default="portable", show_default=True, help="Characters replaced in the paths, portable ones work on every OS, ascii keeps the old ascii-only names.")
+@click.option("--unicode", "unicode_form", type=types.Choice(["nfc", "nfd", "keep"], case_sensitive=False), default="nfc", show_default=True, help="Unicode normalization of the paths.")
+@click.option("-w", "--workers", type=types.IntRange(min=1), default=4, show_default=True, help="Number of tracks downloaded at the same time.")
+@click.option("--interval", type=types.IntRange(min=1), default=600, show_default=True, help="Seconds between two polls.")
+@click.option("--once", is_flag=True, help="Polls the playlists a single time and exits, e.g. from cron.")
+@click.option("--remove-deleted", is_flag=True, help="Deletes the files of the tracks removed from their playlist, unless another watched playlist still holds them.")
+@click.option("--dedup", "dedup_file", type=types.Path(dir_okay=False), help="Indexes the downloaded files into this SQLite file, a recording already downloaded is linked instead of downloaded again.")
+@click.option("--http2", is_flag=True, help="Sends the requests over HTTP/2, multiplexed over a connection per host. Needs pip install httpx[http2].")
+@click.option("--session-file", type=types.Path(dir_okay=False), help="Saves the login session into this file and reuses it on the next runs.")
+@click.option("--overwrite", is_flag=True, help="Downloads again the tracks whose file is already in the download directory instead of skipping them.")
+def watch(links, arl, input_file, state_file, download_dir, quality, output_template, filesystem, unicode_form, workers,
+          interval, once, remove_deleted, dedup_file, http2, session_file, overwrite):
+    """Keep playlists mirrored, downloading the tracks added to them
+
+    LINKS are Deezer playlist ids or urls. An unchanged playlist costs a single request per poll,
+    the first poll of a playlist downloads all its tracks.
+    """
+
+    import threading
+    from . import Downloader, PathTemplate, DedupIndex, TokenManager, PlaylistWatcher
+
+    try:
+        template = PathTemplate(output_template, filesystem=filesystem.lower(),
+                                unicode=unicode_form.lower())
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--output-template")
+
+    deezer = _login(arl, session_file, http2)
+    playlist_ids = []
+
+    for media_type, media_id in _parse_links(deezer, links, input_file, "playlist"):
+        if media_type != "playlist":
+            raise click.BadParameter(
+                f"{media_type}:{media_id} is not a playlist", param_hint="LINKS")
+
+        playlist_ids.append(media_id)
+
+    dedup_index = DedupIndex(dedup_file) if dedup_file else None
+
+    def on_change(changes):
+        tracks = []
+        seen = set()
+
+        for change in changes:
+            if change.error:
+                echo(f"Could not poll playlist {change.playlist_id}: {change.error}", err=True)
+                continue
+
+            echo(f"Playlist {change.title or change.playlist_id}: {len(change.added)} added, "
+                 f"{len(change.removed)} removed.", err=True)
+
+            for track in change.added:
+                # A track added to several playlists is downloaded once
+                if str(track["SNG_ID"]) not in seen:
+                    seen.add(str(track["SNG_ID"]))
+                    tracks.append(track)
+
+        if not tracks:
+            return None
+
+        # The gw track dictionaries of the listing already hold the track info, the jobs skip their request
+        return Downloader(deezer, tracks, download_dir, quality=quality, concurrent_downloads=workers,
+                          output_template=template, dedup_index=dedup_index,
+                          token_manager=TokenManager(deezer), overwrite=overwrite).start()
+
+    watcher = PlaylistWatcher(deezer, state_file)
+    stop_event = threading.Event()
+
+    if once:
+        stop_event.set()
+    else:
+        echo(f"Watching {len(playlist_ids)} playlists every {interval} seconds, stop with Ctrl+C.", err=True)
+
+    try:
+        watcher.watch(playlist_ids, on_change, interval=interval,
+                      remove_deleted=remove_deleted, stop_event=stop_event)
+    except KeyboardInterrupt:
+        echo("Stopped watching.", err=True)
+
+
+@cli.group()
+@click.option("--url", default="http://127.0.0.1:8765", show_default=True, help="Address of the server.")
+@click.option("--socket", "socket_path", type=types.Path(dir_okay=False), help="Connects to the Unix socket of the server instead of --url.")
+@click.pass_context
+def client(ctx, url, socket_path):
+    """Control a running download service"""
+
+    from .Client import Client
+
+    ctx.obj = Client(url=url, socket_path=socket_path)
+
+
+@client.command()
+@click.argument("links", nargs=-1, required=True)
+@click.option("-t", "--type", "default_type", type=types.Choice(["track", "album", "playlist", "artist"], case_sensitive=False), default="track", show_default=True, help="Media type of the bare ids.")
+@click.option("--artist-tracks", type=types.Choice(["top", "discography"], case_sensitive=False), default="top", show_default=True, help="Downloads either the top tracks or the whole discography of the artists.")
+@click.option("-p", "--priority", type=types.INT, default=0, show_default=True, help="Higher priorities are downloaded first.")
+@click.pass_obj
+def submit(client, links, default_type, artist_tracks, priority):
+    """Queue tracks, albums, playlists and artists
+
+    LINKS are Deezer ids, "type:id" strings or deezer.com urls.
+    """
+
+    _print_json(_call(client.submit, links, priority=priority,
+                      default_type=default_type.lower(), artist_tracks=artist_tracks.lower()))
+
+
+@client.command()
+@click.argument("track_id", required=False)
+@click.option("-s", "--state", help="Only lists the jobs in this state, e.g. transferring or failed.")
+@click.pass_obj
+def status(client, track_id, state):
+    """Show the state and progress of a job, or of every job"""
+
+    _print_json(_call(client.status, track_id)
+                if track_id else _call(client.jobs, state=state))
+
+
+@client.command()
+@click.argument("track_id")
+@click.pass_obj
+def cancel(client, track_id):
+    """Cancel a queued or running job"""
+
+    _print_json(_call(client.cancel, track_id))
+
+
+@client.command()
+@click.pass_obj
+def metrics(client):
+    """Show the counters of the service"""
+
+    _print_json(_call(client.metrics))
+
+
+@client.command()
+@click.option("--rate", callback=lambda ctx, param, value: 0 if value == "0" else _parse_rate(value, param), help="Total bandwidth in bytes per second, e.g. 2M. Use 0 to remove the cap.")
+@click.option("--per-download", callback=lambda ctx, param, value: 0 if value == "0" else _parse_rate(value, param), help="Bandwidth of each download, e.g. 500K. Use 0 to remove the cap.")
+@click.pass_obj
+def limit(client, rate, per_download):
+    """Change the bandwidth limits of the service"""
+
+    limits = {key: value or None for key, value in (("rate", rate), ("per_download", per_download))
+              if value is not None}
+
+    _print_json(_call(client.set_limits, **limits))
+
+
+@client.command()
+@click.pass_obj
+def stop(client):
+    """Stop the service once the running downloads are done"""
+
+    _print_json(_call(client.shutdown))
+
+
+def _call(method, *args, **kwargs):
+    from .exceptions import APIRequestError
+
+    try:
+        return method(*args, **kwargs)
+    except APIRequestError as e:
+        raise click.ClickException(str(e))
+    except OSError as e:
+        raise click.ClickException(f"Could not reach the server: {e}")
+
+
+def _print_json(data):
+    import json
+
+    echo(json.dumps(data, indent=2))
+
+
+def _login(arl, session_file, http2=False):
+    from . import Deezer, SessionStore
+
+    transport = None
+
+    if http2:
+        from . import HTTP2Adapter
+
+        try:
+            transport = HTTP2Adapter()
+        except ImportError as e:
+            raise click.ClickException(str(e))
+
+    deezer = Deezer(arl=arl, session_store=SessionStore(
+        session_file) if session_file else None, transport=transport)
+
+    if not deezer.logged_in:
+        raise click.ClickException("The Arl you supplied is invalid.")
+
+    return deezer
+
+
+def _parse_rate(value, param):
+    return _parse_size(value, param, example="a rate, e.g. 500K or 2M")
+
+
+def _parse_size(value, param, example="a size, e.g. 500M or 60G"):
+    import re
+
+    if not value:
+        return None
+
+    # e.g. 500K, 2M, 2MB, 1.5m
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([KMG]?)B?", value.strip(), re.IGNORECASE)
+
+    if not match or float(match.group(1)) <= 0:
+        raise click.BadParameter(
+            f"{value} is not {example}", param=param)
+
+    return float(match.group(1)) * 1024 ** " KMG".index(match.group(2).upper() or " ")
+
+
+def _parse_links(deezer, links, input_file, default_type):
+    from . import util
+
+    links = list(links)
+
+    if input_file:
+        links += [line.strip() for line in input_file
+                  if line.strip() and not line.startswith("#")]
+
+    if not links:
+        raise click.UsageError("No ids or urls were given.")
+
+    media = []
+
+    for link in links:
+        if "page.link" in link:
+            # Short share links redirect to the deezer.com url
+            link = deezer.session.head(link, allow_redirects=True).url
+
+        try:
+            media.append(util.parse_deezer_url(
+                link, default_type=default_type.lower()))
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="LINKS")
+
+    return media
+
+
+def _iter_unique_tracks(deezer, media, artist_tracks="top"):
+    seen = set()
+
+    for media_type, media_id in media:
+        for track in _iter_tracks(deezer, media_type, media_id, artist_tracks):
+            track_id = str(track["SNG_ID"] if isinstance(track, dict) else track)
+
+            # Keeps the first occurrence of each track
+            if track_id not in seen:
+                seen.add(track_id)
+                yield track
+
+
+def _iter_tracks(deezer, media_type, media_id, artist_tracks="top"):
+    if media_type == "track":
+        return iter([media_id])
+
+    if media_type == "album":
+        return deezer.iter_album_tracks(media_id)
+
+    if media_type == "playlist":
+        return deezer.iter_playlist_tracks(media_id)
+
+    if artist_tracks == "top":
+        return deezer.iter_artist_top_tracks(media_id)
+
+    return deezer.iter_artist_discography(media_id)
+
+
 if __name__ == "__main__":
     cli()
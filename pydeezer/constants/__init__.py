@@ -1,3 +1,5 @@
 from . import track_formats
+from . import job_states
+from . import error_types
 
 name = "PyDeezer Constants"
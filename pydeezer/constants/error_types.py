@@ -0,0 +1,57 @@
+TOKEN_EXPIRED = "token_expired"
+QUALITY_UNAVAILABLE = "quality_unavailable"
+NETWORK = "network"
+SERVER = "server"
+AUTH = "auth"
+RATE_LIMITED = "rate_limited"
+CANCELLED = "cancelled"
+UNKNOWN = "unknown"
+
+# How many times a job is retried for each class of error and how long to wait
+# before each retry: {backoff} * {factor} ** (retry - 1), capped at {max_backoff}.
+# AUTH and RATE_LIMITED errors also take the account out of an {AccountPool} for a while,
+# so their retries usually run on another account. CANCELLED jobs are never retried.
+RETRY_POLICY = {
+    TOKEN_EXPIRED: {
+        "retries": 2,
+        "backoff": 0,
+        "factor": 1,
+        "max_backoff": 0
+    },
+    QUALITY_UNAVAILABLE: {
+        "retries": 2,
+        "backoff": 0,
+        "factor": 1,
+        "max_backoff": 0
+    },
+    NETWORK: {
+        "retries": 5,
+        "backoff": 1,
+        "factor": 2,
+        "max_backoff": 30
+    },
+    SERVER: {
+        "retries": 3,
+        "backoff": 5,
+        "factor": 2,
+        "max_backoff": 60
+    },
+    AUTH: {
+        "retries": 2,
+        "backoff": 0,
+        "factor": 1,
+        "max_backoff": 0
+    },
+    RATE_LIMITED: {
+        "retries": 4,
+        "backoff": 10,
+        "factor": 2,
+        "max_backoff": 120
+    },
+    UNKNOWN: {
+        "retries": 0,
+        "backoff": 0,
+        "factor": 1,
+        "max_backoff": 0
+    }
+}
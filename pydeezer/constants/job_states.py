@@ -0,0 +1,10 @@
+QUEUED = "queued"
+RESOLVING = "resolving"
+TRANSFERRING = "transferring"
+TAGGING = "tagging"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+STATE_LIST = [QUEUED, RESOLVING, TRANSFERRING, TAGGING, DONE, FAILED, CANCELLED]
+FINAL_STATES = [DONE, FAILED, CANCELLED]
@@ -12,3 +12,31 @@ class DownloadLinkDecryptionError(Exception):
 
 class InvalidJSONError(Exception):
     pass
+
+
+class DownloadError(Exception):
+    pass
+
+
+class TrackTokenExpiredError(DownloadError):
+    pass
+
+
+class QualityUnavailableError(DownloadError):
+    pass
+
+
+class ServerError(DownloadError):
+    pass
+
+
+class RateLimitError(DownloadError):
+    pass
+
+
+class NoAccountAvailableError(Exception):
+    pass
+
+
+class JobCancelledError(DownloadError):
+    pass
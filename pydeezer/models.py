@@ -0,0 +1,256 @@
+from collections.abc import Mapping
+
+_IMAGE_URL = "https://e-cdns-images.dzcdn.net/images/{kind}/{md5}/{size}x{size}-000000-80-0-0.jpg"
+_IMAGE_SIZES = {"small": 56, "medium": 250, "big": 500, "xl": 1000}
+
+_ROLES = {
+    "0": "Main",
+    "5": "Featured"
+}
+
+
+class _Model(Mapping):
+    """Base of the slotted models, exposes the {_keys} as a read-only mapping
+    so the models can be used wherever the mapped dicts were used"""
+
+    __slots__ = ()
+    _keys = ()
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return f"{type(self).__name__}(id={self.id!r})"
+
+    def to_dict(self):
+        """Gets the same dictionary as the one built by the {util} mapping functions
+
+        Returns:
+            dict -- Mapped data
+        """
+
+        return {key: _to_dict(self[key]) for key in self._keys}
+
+
+class Album(_Model):
+    __slots__ = ("id", "md5_image", "title")
+    _keys = ("id", "md5_image", "title", "cover",
+             "cover_small", "cover_medium", "cover_big", "cover_xl")
+
+    def __init__(self, id, md5_image, title):
+        """Album of a {Track}, the cover urls are built when accessed
+
+        Arguments:
+            id {str} -- Album Id
+            md5_image {str} -- Md5 of the cover
+            title {str} -- Title of the album
+        """
+
+        self.id = id
+        self.md5_image = md5_image
+        self.title = title
+
+    @property
+    def cover(self):
+        return f"https://api.deezer.com/album/{self.id}/image"
+
+    @property
+    def cover_small(self):
+        return self.cover_url(_IMAGE_SIZES["small"])
+
+    @property
+    def cover_medium(self):
+        return self.cover_url(_IMAGE_SIZES["medium"])
+
+    @property
+    def cover_big(self):
+        return self.cover_url(_IMAGE_SIZES["big"])
+
+    @property
+    def cover_xl(self):
+        return self.cover_url(_IMAGE_SIZES["xl"])
+
+    def cover_url(self, size):
+        """Gets the url of the cover
+
+        Arguments:
+            size {int} -- Size of the image, {size}x{size}
+
+        Returns:
+            str -- Url of the image
+        """
+
+        return _IMAGE_URL.format(kind="cover", md5=self.md5_image, size=size)
+
+
+class Contributor(_Model):
+    __slots__ = ("id", "name", "role", "is_dummy", "md5_picture",
+                 "rank", "locales", "smartradio", "type")
+    _keys = ("id", "name", "role", "is_dummy", "picture", "picture_small", "picture_medium",
+             "picture_big", "picture_xl", "rank", "locales", "smartradio", "type")
+
+    def __init__(self, id, name, role, is_dummy=None, md5_picture=None, rank=None, locales=None,
+                 smartradio=None, type=None):
+        """Artist of a {Track}, the picture urls are built when accessed
+
+        Arguments:
+            id {str} -- Artist Id
+            name {str} -- Name of the artist
+            role {str} -- Either "Main", "Featured" or "Unknown"
+        """
+
+        self.id = id
+        self.name = name
+        self.role = role
+        self.is_dummy = is_dummy
+        self.md5_picture = md5_picture
+        self.rank = rank
+        self.locales = locales
+        self.smartradio = smartradio
+        self.type = type
+
+    @classmethod
+    def from_gw(cls, artist):
+        return cls(artist.get("ART_ID"), artist.get("ART_NAME"), _ROLES.get(artist.get("ROLE_ID", -1), "Unknown"),
+                   is_dummy=artist.get("ARTIST_IS_DUMMY"), md5_picture=artist.get("ART_PICTURE"),
+                   rank=artist.get("RANK"), locales=artist.get("LOCALES"), smartradio=artist.get("SMARTRADIO"),
+                   type=artist.get("__TYPE__"))
+
+    @property
+    def picture(self):
+        return f"https://api.deezer.com/artist/{self.id}/image"
+
+    @property
+    def picture_small(self):
+        return self.picture_url(_IMAGE_SIZES["small"])
+
+    @property
+    def picture_medium(self):
+        return self.picture_url(_IMAGE_SIZES["medium"])
+
+    @property
+    def picture_big(self):
+        return self.picture_url(_IMAGE_SIZES["big"])
+
+    @property
+    def picture_xl(self):
+        return self.picture_url(_IMAGE_SIZES["xl"])
+
+    def picture_url(self, size):
+        """Gets the url of the picture
+
+        Arguments:
+            size {int} -- Size of the image, {size}x{size}
+
+        Returns:
+            str -- Url of the image
+        """
+
+        return _IMAGE_URL.format(kind="artist", md5=self.md5_picture, size=size)
+
+
+class Track(_Model):
+    __slots__ = ("id", "title", "album", "contributors", "artist", "md5_origin", "user_id",
+                 "digital_release_date", "physical_release_date", "track_number", "disk_number",
+                 "duration", "explicit_lyrics", "explicit_content", "genre_id", "hierarchical_title",
+                 "isrc", "lyrics_id", "provider_id", "rank", "smartradio", "status", "version", "gain",
+                 "media_version", "token", "token_expire", "preview", "type")
+    _keys = ("id", "title", "album", "contributors", "artist", "md5_origin", "user_id",
+             "digital_release_date", "physical_release_date", "release_date", "track_number", "disk_number",
+             "duration", "explicit_lyrics", "explicit_content", "genre_id", "hierarchical_title", "isrc",
+             "lyrics_id", "provider_id", "rank", "smartradio", "status", "version", "gain", "media_version",
+             "token", "token_expire", "preview", "type")
+
+    def __init__(self, **fields):
+        """Compact track info with the same keys as {util.map_gw_track()}, see {Track.from_gw()}.
+        Missing fields are set to None."""
+
+        for key in self.__slots__:
+            setattr(self, key, fields.get(key))
+
+    @classmethod
+    def from_gw(cls, track):
+        """Maps a gw track
+
+        Arguments:
+            track {dict} -- Track data given by the gw API
+
+        Returns:
+            Track -- Mapped track
+        """
+
+        contributors = [Contributor.from_gw(artist)
+                        for artist in track.get("ARTISTS", [])]
+
+        explicit_track_content = track.get("EXPLICIT_TRACK_CONTENT")
+        explicit_content = None
+
+        if explicit_track_content:
+            explicit_content = {
+                "lyrics": explicit_track_content.get("EXPLICIT_LYRICS_STATUS"),
+                "cover": explicit_track_content.get("EXPLICIT_COVER_STATUS")
+            }
+
+        preview = None
+
+        for medium in track.get("MEDIA", []):
+            if medium.get("TYPE") == "preview":
+                preview = medium.get("HREF")
+                break
+
+        return cls(
+            id=track.get("SNG_ID"),
+            title=track.get("SNG_TITLE"),
+            album=Album(track.get("ALB_ID"), track.get(
+                "ALB_PICTURE"), track.get("ALB_TITLE")),
+            contributors=contributors,
+            artist=next(contributor for contributor in contributors
+                        if contributor.role == "Main"),
+            md5_origin=track.get("MD5_ORIGIN"),
+            user_id=track.get("USER_ID"),
+            digital_release_date=track.get("DIGITAL_RELEASE_DATE"),
+            physical_release_date=track.get("PHYSICAL_RELEASE_DATE"),
+            track_number=track.get("TRACK_NUMBER"),
+            disk_number=track.get("DISK_NUMBER"),
+            duration=track.get("DURATION"),
+            explicit_lyrics=int(track.get("EXPLICIT_LYRICS", -1)) > 0,
+            explicit_content=explicit_content,
+            genre_id=track.get("GENRE_ID"),
+            hierarchical_title=track.get("HIERARCHICAL_TITLE"),
+            isrc=track.get("ISRC"),
+            lyrics_id=track.get("LYRICS_ID"),
+            provider_id=track.get("PROVIDER_ID"),
+            rank=track.get("RANK"),
+            smartradio=track.get("SMARTRADIO"),
+            status=track.get("STATUS"),
+            version=track.get("VERSION"),
+            gain=track.get("GAIN"),
+            media_version=track.get("MEDIA_VERSION"),
+            token=track.get("TRACK_TOKEN"),
+            token_expire=track.get("TRACK_TOKEN_EXPIRE"),
+            preview=preview,
+            type=track.get("__TYPE__")
+        )
+
+    @property
+    def release_date(self):
+        return self.physical_release_date or self.digital_release_date
+
+
+def _to_dict(value):
+    if isinstance(value, _Model):
+        return value.to_dict()
+
+    if isinstance(value, list):
+        return [_to_dict(item) for item in value]
+
+    return value
@@ -1,16 +1,31 @@
 import re
 import hashlib
+from contextlib import contextmanager
+from functools import lru_cache
 import unicodedata
 import string
 from os import path
 import pathlib
 
+from requests.exceptions import HTTPError, ConnectionError as RequestsConnectionError, Timeout, \
+    ChunkedEncodingError
+from deezer.gw import APIError as GWAPIError
+from deezer.api import APIError as APIError
 from deezer.utils import map_album as d_map_album, map_artist_album, \
     map_playlist, map_user_album, \
     map_user_artist, map_user_playlist, map_user_track
 
+from .constants import error_types
+from . import models
+from .exceptions import TrackTokenExpiredError, QualityUnavailableError, ServerError, RateLimitError, LoginError, \
+    JobCancelledError
+
+
+def map_gw_track(track, compact=False):
+    if compact:
+        # Slotted objects with lazily built image urls, a fraction of the size of the dicts
+        return models.Track.from_gw(track)
 
-def map_gw_track(track):
     album_id = track.get("ALB_ID")
     album_md5_cover = track.get("ALB_PICTURE")
     album = {"id": album_id, "md5_image": album_md5_cover}
@@ -161,6 +176,35 @@ def clean_query(query):
     return query
 
 
+def parse_deezer_url(url, default_type="track"):
+    """Gets the media type and id from a deezer.com url, a "type:id" string or a bare id
+
+    Arguments:
+        url {str} -- e.g. "https://www.deezer.com/en/album/302127", "album:302127" or "302127"
+
+    Keyword Arguments:
+        default_type {str} -- Media type of bare ids (default: {"track"})
+
+    Raises:
+        ValueError: Will be raised if the url is not a track, album, playlist or artist
+
+    Returns:
+        tuple -- (media type, id)
+    """
+
+    url = url.strip()
+    match = re.search(
+        r"(?:deezer\.com/(?:[a-z]{2}(?:-[a-z]{2})?/)?|^)(track|album|playlist|artist)[/:](\d+)", url, re.IGNORECASE)
+
+    if match:
+        return match.group(1).lower(), match.group(2)
+
+    if url.isdigit():
+        return default_type, url
+
+    raise ValueError(f"{url} is not a Deezer track, album, playlist or artist.")
+
+
 def create_folders(directory):
     directory = path.normpath(directory)
 
@@ -168,28 +212,29 @@ def create_folders(directory):
     p.mkdir(parents=True, exist_ok=True)
 
 
+_FILENAME_WHITELIST = "-_.() %s%s" % (string.ascii_letters,
+                                      string.digits) + "',&#$%@`~!^&+=[]{}"
+_FILENAME_TRANSLATE_TABLE = str.maketrans(
+    {chr(i): None for i in range(128) if chr(i) not in _FILENAME_WHITELIST})
+
+
 def clean_filename(filename):
     # https://gist.github.com/wassname/1393c4a57cfcbf03641dbc31886123b8
-    whitelist = "-_.() %s%s" % (string.ascii_letters,
-                                string.digits) + "',&#$%@`~!^&+=[]{}"
     char_limit = 255
-    replace = ''
 
-    # replace spaces
-    for r in replace:
-        filename = filename.replace(r, '_')
+    cleaned_filename = _clean_filename(filename)
 
-    # keep only valid ascii chars
-    cleaned_filename = unicodedata.normalize(
-        'NFKD', filename).encode('ASCII', 'ignore').decode()
-
-    # keep only whitelisted chars
-    cleaned_filename = ''.join(c for c in cleaned_filename if c in whitelist)
     if len(cleaned_filename) > char_limit:
         print("Warning, filename truncated because it was over {}. Filenames may no longer be unique".format(char_limit))
     return cleaned_filename[:char_limit]
 
 
+@lru_cache(maxsize=8192)
+def _clean_filename(filename):
+    # keep only valid ascii chars, then only the whitelisted ones
+    return unicodedata.normalize('NFKD', filename).encode('ASCII', 'ignore').decode().translate(_FILENAME_TRANSLATE_TABLE)
+
+
 def get_text_md5(text, encoding="UTF-8"):
     return hashlib.md5(str(text).encode(encoding)).hexdigest()
 
@@ -205,3 +250,164 @@ def get_blowfish_key(track_id):
                            for i in range(16)]))
 
     return blowfish_key
+
+
+# Tracks are encrypted in chunks of this size, only every third full chunk is encrypted
+CHUNK_SIZE = 2048
+
+
+def decrypt_chunk(blowfish_key, index, chunk):
+    """Decrypts a chunk of a track
+
+    Arguments:
+        blowfish_key {bytes} -- Key of the track, see {get_blowfish_key()}
+        index {int} -- Position of the chunk in the file, counted in {CHUNK_SIZE}
+        chunk {bytes} -- Chunk read from the CDN
+
+    Returns:
+        bytes -- Decrypted chunk
+    """
+
+    if index % 3 > 0 or len(chunk) < CHUNK_SIZE:
+        return chunk
+
+    decryptor = _get_cipher(blowfish_key).decryptor()
+
+    return decryptor.update(chunk) + decryptor.finalize()
+
+
+@lru_cache(maxsize=64)
+def _get_cipher(blowfish_key):
+    # A cipher hands out a fresh decryptor per chunk, it is only built once per track
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+    return Cipher(algorithms.Blowfish(blowfish_key), modes.CBC(bytes(range(8))), default_backend())
+
+
+def classify_error(error):
+    """Classifies an exception raised while downloading a track
+
+    Arguments:
+        error {Exception} -- The raised exception
+
+    Returns:
+        str -- One of the values from {constants.error_types}
+    """
+
+    if isinstance(error, JobCancelledError):
+        return error_types.CANCELLED
+
+    if isinstance(error, TrackTokenExpiredError):
+        return error_types.TOKEN_EXPIRED
+
+    if isinstance(error, QualityUnavailableError):
+        return error_types.QUALITY_UNAVAILABLE
+
+    if isinstance(error, ServerError):
+        return error_types.SERVER
+
+    if isinstance(error, RateLimitError):
+        return error_types.RATE_LIMITED
+
+    if isinstance(error, LoginError):
+        return error_types.AUTH
+
+    if isinstance(error, HTTPError) and error.response is not None:
+        if error.response.status_code == 429:
+            return error_types.RATE_LIMITED
+
+        if error.response.status_code == 401:
+            return error_types.AUTH
+
+        if error.response.status_code >= 500:
+            return error_types.SERVER
+
+    if isinstance(error, (RequestsConnectionError, Timeout, ChunkedEncodingError, ConnectionError, TimeoutError)):
+        return error_types.NETWORK
+
+    if isinstance(error, (GWAPIError, APIError)):
+        message = str(error).upper()
+        if "QUOTA" in message or "TOO_MANY" in message or "RATE_LIMIT" in message:
+            return error_types.RATE_LIMITED
+
+        if "AUTH" in message or "LOGIN" in message:
+            return error_types.AUTH
+
+        if "TOKEN" in message:
+            return error_types.TOKEN_EXPIRED
+
+        return error_types.SERVER
+
+    return error_types.UNKNOWN
+
+
+@contextmanager
+def client(deezer):
+    """Gives a client to send a request with, use it as a context manager
+
+    Arguments:
+        deezer {Deezer} -- Logged in Deezer instance, or an {AccountPool} lending one of its accounts for the block
+
+    Returns:
+        Deezer -- {deezer} itself, or the client of the lent account
+    """
+
+    # Imported here, the account pool depends on this module
+    from .AccountPool import AccountPool
+
+    if not isinstance(deezer, AccountPool):
+        yield deezer
+        return
+
+    with deezer.session() as account:
+        yield account.client
+
+
+def get_tracks(deezer, track_ids):
+    """Gets the gw data of many tracks with a single request
+
+    Arguments:
+        deezer {Deezer} -- Logged in Deezer instance, or an {AccountPool}
+        track_ids {list} -- List of track id, up to 100 per request
+
+    Returns:
+        dict -- gw track dictionaries keyed by track id, the unavailable tracks are left out
+    """
+
+    with client(deezer) as c:
+        # song.getListData leaves the unavailable tracks out of its data instead of keeping their place
+        data = c.gw.api_call("song.getListData", {"sng_ids": [str(track_id) for track_id in track_ids]})["data"]
+
+    return {str(track["SNG_ID"]): track for track in data if track.get("SNG_ID")}
+
+
+def resolve_tracks(deezer, tracks):
+    """Replaces the track ids among {tracks} with their gw track dictionaries, see {get_tracks()}
+
+    Arguments:
+        deezer {Deezer} -- Logged in Deezer instance, or an {AccountPool}
+        tracks {list} -- Track ids or gw track dictionaries, up to 100 ids
+
+    Returns:
+        list -- {tracks} in the same order, the ids that could not be resolved stay bare
+    """
+
+    track_ids = [str(track) for track in tracks if not isinstance(track, dict)]
+
+    if not track_ids:
+        return tracks
+
+    try:
+        resolved = get_tracks(deezer, track_ids)
+    except Exception:
+        # e.g. a track id the api refuses, the ids are then resolved one by one
+        resolved = {}
+
+        for track_id in track_ids:
+            try:
+                resolved.update(get_tracks(deezer, [track_id]))
+            except Exception:
+                pass
+
+    return [track if isinstance(track, dict) else resolved.get(str(track), track) for track in tracks]
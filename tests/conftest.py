@@ -0,0 +1,94 @@
+import http.server
+import os
+import threading
+
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption("--runslow", action="store_true", default=False, help="Also runs the tests marked as slow.")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: takes minutes, only runs with --runslow")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--runslow"):
+        return
+
+    skip = pytest.mark.skip(reason="Needs --runslow")
+
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip)
+
+
+class _CDNHandler(http.server.BaseHTTPRequestHandler):
+    # Stands in for the CDN, every track is the same small file
+    data = bytes(range(256)) * 8
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.data)))
+        self.end_headers()
+        self.wfile.write(self.data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def cdn_url():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _CDNHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def stub_deezer(cdn_url):
+    """Builds Deezer clients answering the track requests locally, only the file transfer goes through {cdn_url}.
+    The titles come from the {titles} given to the factory, keyed by track id. A {flat} client keeps nothing
+    per track, neither the files nor the transferred ids, for the large runs"""
+
+    from pydeezer import Deezer
+
+    def make(titles=None, flat=False):
+        class StubDeezer(Deezer):
+            transfers = []
+
+            def get_track_info(self, track_id, **kwargs):
+                title = (titles or {}).get(str(track_id), f"Track {track_id}")
+
+                return {"id": track_id, "title": title, "track_token": "token",
+                        "md5_origin": "0" * 32, "media_version": "1"}
+
+            def get_track_tags(self, track, **kwargs):
+                return {"title": track["title"]}
+
+            def get_track_download_url(self, track, quality=None, **kwargs):
+                if not flat:
+                    self.transfers.append(str(track["id"]))
+
+                return cdn_url, quality
+
+            def get_track_lyrics(self, track_id):
+                raise Exception("No lyrics")
+
+            def write_track_tags(self, track_path, track, tags=None, **kwargs):
+                if flat:
+                    os.remove(track_path)
+
+        deezer = StubDeezer()
+        # No proxy from the environment in front of the local server
+        deezer.session.trust_env = False
+
+        return deezer
+
+    return make
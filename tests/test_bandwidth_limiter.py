@@ -0,0 +1,68 @@
+from contextlib import ExitStack
+
+from pydeezer import BandwidthLimiter
+
+
+def _rates(transfers):
+    return [transfer.bucket.rate for transfer in transfers]
+
+
+def test_rate_is_shared_equally_between_the_transfers():
+    limiter = BandwidthLimiter(rate=1200)
+
+    with ExitStack() as stack:
+        transfers = [stack.enter_context(limiter.transfer()) for _ in range(3)]
+
+        assert _rates(transfers) == [400, 400, 400]
+        assert limiter.stats()["active"] == 3
+
+        # A finished transfer gives its share back to the others
+        with limiter.transfer() as fourth:
+            assert _rates(transfers + [fourth]) == [300] * 4
+
+        assert _rates(transfers) == [400, 400, 400]
+
+    assert limiter.stats()["active"] == 0
+    assert limiter.stats()["share"] is None
+
+
+def test_per_download_cap_and_unfair_sharing():
+    limiter = BandwidthLimiter(rate=1200, per_download=500)
+
+    with limiter.transfer() as first, limiter.transfer() as second:
+        # The per download cap is below the fair share of two transfers
+        assert _rates([first, second]) == [500, 500]
+
+        with limiter.transfer() as third:
+            assert _rates([first, second, third]) == [400] * 3
+
+            limiter.set_limits(fair=False)
+
+            # Only the global bucket holds the transfers back together
+            assert _rates([first, second, third]) == [500] * 3
+
+            limiter.set_limits(per_download=None)
+
+            assert _rates([first, second, third]) == [None] * 3
+
+            limiter.set_limits(fair=True, rate=600)
+
+            assert _rates([first, second, third]) == [200] * 3
+            assert limiter.stats() == {"rate": 600, "per_download": None, "fair": True, "active": 3, "share": 200}
+
+
+def test_unlimited_transfers_do_not_wait():
+    limiter = BandwidthLimiter()
+
+    with limiter.transfer() as transfer:
+        transfer.consume(10 * 1024 * 1024)
+
+        assert transfer.transferred == 10 * 1024 * 1024
+        assert transfer.bucket.rate is None
+
+
+def test_split_between_processes():
+    limiter = BandwidthLimiter(rate=1200, per_download=500).split(4)
+
+    assert (limiter.rate, limiter.per_download, limiter.fair) == (300, 500, True)
+    assert BandwidthLimiter().split(4).rate is None
@@ -0,0 +1,149 @@
+import sys
+
+import pytest
+
+from pydeezer import CircuitBreaker
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    # The package attribute is the class, the module is only reachable through sys.modules
+    monkeypatch.setattr(sys.modules["pydeezer.CircuitBreaker"], "time", clock)
+
+    return clock
+
+
+def _open(breaker, backend="gw", endpoint="get_track"):
+    for _ in range(breaker.threshold):
+        breaker.record_failure(backend, endpoint)
+
+
+def test_circuit_opens_after_threshold(clock):
+    breaker = CircuitBreaker(threshold=3, cooldown=30)
+
+    breaker.record_failure("gw", "get_track")
+    breaker.record_failure("gw", "get_track")
+
+    assert breaker.state("gw", "get_track") == CircuitBreaker.CLOSED
+    assert not breaker.is_open("gw", "get_track")
+
+    breaker.record_failure("gw", "get_track")
+
+    assert breaker.state("gw", "get_track") == CircuitBreaker.OPEN
+    assert breaker.is_open("gw", "get_track")
+    assert not breaker.allow("gw", "get_track")
+    # Other endpoints and backends keep their own circuit
+    assert breaker.allow("gw", "get_album")
+    assert breaker.allow("api", "get_track")
+
+
+def test_half_open_circuit_lets_a_single_probe_through(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    _open(breaker)
+
+    clock.now += 30
+
+    # Checking the circuit does not take its probe slot
+    for _ in range(3):
+        assert breaker.state("gw", "get_track") == CircuitBreaker.HALF_OPEN
+        assert not breaker.is_open("gw", "get_track")
+
+    assert breaker.allow("gw", "get_track")
+    assert not breaker.allow("gw", "get_track")
+    assert breaker.is_open("gw", "get_track")
+
+
+def test_probe_success_closes_and_failure_reopens(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    _open(breaker)
+
+    clock.now += 30
+    breaker.allow("gw", "get_track")
+    breaker.record_failure("gw", "get_track")
+
+    assert breaker.state("gw", "get_track") == CircuitBreaker.OPEN
+    assert breaker.stats()["gw.get_track"]["open_until"] == clock.now + 30
+
+    clock.now += 30
+    breaker.allow("gw", "get_track")
+    breaker.record_success("gw", "get_track")
+
+    assert breaker.state("gw", "get_track") == CircuitBreaker.CLOSED
+    assert breaker.stats()["gw.get_track"]["failures"] == 0
+
+
+def test_released_probe_slot_is_given_back(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    _open(breaker)
+
+    clock.now += 30
+    breaker.allow("gw", "get_track")
+    breaker.release("gw", "get_track")
+
+    assert breaker.state("gw", "get_track") == CircuitBreaker.HALF_OPEN
+    assert breaker.allow("gw", "get_track")
+
+
+def _deezer(breaker):
+    from pydeezer import Deezer
+
+    return Deezer(circuit_breaker=breaker)
+
+
+def test_fallback_order_keeps_the_probe_of_the_other_backend(clock, capsys):
+    from deezer.gw import APIError as GWAPIError
+
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    deezer = _deezer(breaker)
+    _open(breaker, "gw")
+    _open(breaker, "api")
+
+    clock.now += 30
+    breaker.allow("gw", "get_track")
+
+    def get_track():
+        raise GWAPIError("down")
+
+    # gw is probing, api is half open and gets the call with its own probe
+    assert deezer._api_fallback(get_track, lambda: {"id": 1}) == ({"id": 1}, "api")
+    assert breaker.state("api", "get_track") == CircuitBreaker.CLOSED
+    assert breaker.stats()["gw.get_track"]["short_circuited"] == 1
+
+    breaker.release("gw", "get_track")
+    _open(breaker, "api")
+    clock.now += 30
+
+    def get_track():
+        return {"id": 2}
+
+    # gw is half open and free, it gets the call and api is left untouched for its own probe
+    assert deezer._api_fallback(get_track, lambda: {"id": 1}) == ({"id": 2}, "gw")
+    assert breaker.state("gw", "get_track") == CircuitBreaker.CLOSED
+    assert breaker.allow("api", "get_track")
+    assert capsys.readouterr().out == ""
+
+
+def test_unexpected_probe_error_gives_the_slot_back(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    deezer = _deezer(breaker)
+    _open(breaker, "gw")
+
+    clock.now += 30
+
+    def get_track():
+        raise KeyError("DATA")
+
+    with pytest.raises(KeyError):
+        deezer._api_fallback(get_track, lambda: {"id": 1})
+
+    assert breaker.state("gw", "get_track") == CircuitBreaker.HALF_OPEN
+    assert not breaker.is_open("gw", "get_track")
@@ -0,0 +1,127 @@
+import os
+
+import pytest
+
+from pydeezer import DedupIndex
+from pydeezer.constants import job_states, track_formats
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = DedupIndex(str(tmp_path / "dedup.db"))
+
+    yield index
+
+    index.close()
+
+
+def _file(tmp_path, name, data=b"ID3 audio"):
+    file_path = tmp_path / name
+    file_path.write_bytes(data)
+
+    return str(file_path)
+
+
+def test_same_recording_is_found_by_isrc(tmp_path, index):
+    file_path = _file(tmp_path, "first.mp3")
+    index.add("1", "usabc1234567", track_formats.MP3_320, file_path)
+
+    # Another track id of the same recording, the ISRC is compared without case
+    entry = index.find("2", "USABC1234567", track_formats.MP3_320)
+
+    assert entry == {"path": file_path, "size": 9, "quality": track_formats.MP3_320,
+                     "track_id": "1", "isrc": "usabc1234567"}
+    assert index.find("2", "USABC1234567", track_formats.FLAC) is None
+    assert index.find("2", "USXYZ0000000", track_formats.MP3_320) is None
+
+
+def test_track_id_is_the_fallback_key(tmp_path, index):
+    file_path = _file(tmp_path, "first.mp3")
+    # A fallback quality also answers the requested one
+    index.add("1", None, track_formats.MP3_320, file_path, requested_quality=track_formats.FLAC)
+
+    assert index.find("1", None, track_formats.MP3_320)["path"] == file_path
+    assert index.find("1", "USABC1234567", track_formats.FLAC)["quality"] == track_formats.FLAC
+    assert index.find("2", None, track_formats.MP3_320) is None
+
+
+def test_stale_entries_are_dropped(tmp_path, index):
+    modified = _file(tmp_path, "modified.mp3")
+    removed = _file(tmp_path, "removed.mp3")
+    index.add("1", "USABC1234567", track_formats.MP3_320, modified)
+    index.add("2", None, track_formats.MP3_320, removed)
+
+    with open(modified, "ab") as f:
+        f.write(b"retagged")
+
+    os.remove(removed)
+
+    assert index.find("1", "USABC1234567", track_formats.MP3_320) is None
+    assert index.find("2", None, track_formats.MP3_320) is None
+
+    # Dropped from the index, not only skipped
+    with open(modified, "wb") as f:
+        f.write(b"ID3 audio")
+
+    assert index.find("1", "USABC1234567", track_formats.MP3_320) is None
+
+
+def test_reuse_links_the_file(tmp_path, index):
+    source = _file(tmp_path, "first.mp3")
+    index.add("1", None, track_formats.MP3_320, source)
+    entry = index.find("1", None, track_formats.MP3_320)
+
+    linked = str(tmp_path / "linked.mp3")
+    copied = str(tmp_path / "copied.mp3")
+
+    assert index.reuse(entry, linked) == DedupIndex.HARDLINK
+    assert os.path.samefile(source, linked)
+    assert index.reuse(entry, linked) == DedupIndex.EXISTING
+
+    # Another track gets its own tags, never a hard link
+    assert index.reuse(entry, copied, hardlink=False) in (DedupIndex.REFLINK, DedupIndex.COPY)
+    assert not os.path.samefile(source, copied)
+
+    assert index.stats()["hits"] == 3
+    assert index.stats()["saved_bytes"] == 3 * 9
+
+    with pytest.raises(ValueError):
+        DedupIndex(str(tmp_path / "other.db"), link_modes=["symlink"])
+
+
+def test_downloader_reuses_the_file_with_its_lyrics(stub_deezer, tmp_path, index):
+    from pydeezer import Downloader
+    from pydeezer.ProgressHandler import BaseProgressHandler
+
+    deezer = stub_deezer()
+    deezer.get_track_lyrics = lambda track_id: {
+        "info": {"LYRICS_SYNC_JSON": [{"lrc_timestamp": "[00:01.00]", "line": "Lyrics"}]}}
+
+    Downloader(deezer, ["1"], str(tmp_path / "first"), dedup_index=index,
+               progress_handler=BaseProgressHandler()).start()
+    result = Downloader(deezer, ["1"], str(tmp_path / "second"), dedup_index=index,
+                        progress_handler=BaseProgressHandler()).start()
+
+    assert deezer.transfers == ["1"]
+    assert result.deduplicated_count == 1
+    assert result.saved_bytes == 2048
+
+    with open(tmp_path / "second" / "Track 1.lrc", encoding="utf-8") as f:
+        assert f.read() == "[00:01.00]Lyrics\n"
+
+
+def test_only_done_jobs_count_as_deduplicated():
+    from pydeezer.Downloader import DownloadResult, Job
+
+    result = DownloadResult()
+
+    for state in (job_states.DONE, job_states.FAILED):
+        job = Job("1", track_formats.MP3_320)
+        job.state = state
+        job.deduplicated = DedupIndex.HARDLINK
+        job.size = 2048
+        result.add(job)
+
+    assert (result.done_count, result.failed_count) == (1, 1)
+    assert result.deduplicated_count == 1
+    assert result.saved_bytes == 2048
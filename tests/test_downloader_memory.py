@@ -0,0 +1,42 @@
+import tracemalloc
+
+import pytest
+
+TRACKS = 100000
+
+# Tracks downloaded before the baseline is taken, past the bounded caches of the path template
+WARMUP = 20000
+
+# Bytes the traced memory may grow by after the warm up, a few bytes kept per job would already pass it
+MAX_GROWTH = 4 * 1024 * 1024
+
+
+@pytest.mark.slow
+def test_memory_stays_flat_over_many_jobs(stub_deezer, tmp_path):
+    from pydeezer import Downloader
+    from pydeezer.ProgressHandler import BaseProgressHandler
+    # Imported by the summary printed at the end, not part of the jobs
+    import rich  # noqa: F401
+
+    baseline = []
+
+    def track_ids():
+        for i in range(TRACKS):
+            if i == WARMUP:
+                tracemalloc.reset_peak()
+                baseline.append(tracemalloc.get_traced_memory()[0])
+
+            yield str(i)
+
+    tracemalloc.start()
+
+    try:
+        result = Downloader(stub_deezer(flat=True), track_ids(), str(tmp_path), concurrent_downloads=8,
+                            progress_handler=BaseProgressHandler(), record_jobs=False).start()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert result.done_count == TRACKS
+    assert result.jobs == []
+    assert peak - baseline[0] < MAX_GROWTH
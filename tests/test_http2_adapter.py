@@ -0,0 +1,140 @@
+import http.server
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("h2")
+
+TRACK = bytes(range(256)) * 4096
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    # Answers like the gw api and the CDN: json with a session cookie, and a track with ranges
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path.startswith("/track"):
+            start = 0
+
+            if self.headers.get("Range"):
+                start = int(self.headers["Range"].split("=")[1].split("-")[0])
+
+            self.send_response(206 if start else 200)
+            self.send_header("Content-Length", str(len(TRACK) - start))
+            self.send_header("Content-Type", "audio/mpeg")
+            self.end_headers()
+            self.wfile.write(TRACK[start:])
+        elif self.path.startswith("/missing"):
+            self._reply(404, {"error": "not found"})
+        else:
+            self._reply(200, {"path": self.path, "headers": dict(self.headers)},
+                        cookies=["sid=abc; Path=/", "dzr_uniq_id=xyz; Path=/"])
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self._reply(200, {"path": self.path, "body": body, "headers": dict(self.headers)})
+
+    def _reply(self, status, data, cookies=()):
+        body = json.dumps(data).encode()
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+
+        for cookie in cookies:
+            self.send_header("Set-Cookie", cookie)
+
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def url():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=["requests", "http2"])
+def session(request):
+    # The same calls go through the default requests adapter and through the HTTP/2 one
+    from pydeezer import Deezer, HTTP2Adapter
+
+    deezer = Deezer(transport=HTTP2Adapter() if request.param == "http2" else None)
+    deezer.session.trust_env = False
+
+    yield deezer.session
+
+    deezer.session.close()
+
+
+def test_json_headers_and_cookies(session, url):
+    res = session.get(f"{url}/gw?method=song.getData", headers={"X-Test": "1"})
+
+    assert res.status_code == 200 and res.ok
+    assert res.headers["content-type"] == "application/json; charset=utf-8"
+    assert res.encoding == "utf-8"
+    assert res.json()["headers"]["X-Test"] == "1"
+    assert res.json()["path"] == "/gw?method=song.getData"
+    assert res.cookies["sid"] == "abc"
+    assert session.cookies.get("dzr_uniq_id") == "xyz"
+
+    # The session sends its cookies back, like the gw api expects
+    res = session.post(f"{url}/gw", params={"method": "deezer.getUserData"}, json={"sng_ids": ["1"]})
+
+    assert res.json()["body"] == {"sng_ids": ["1"]}
+    assert "sid=abc" in res.json()["headers"]["Cookie"]
+
+
+def test_status_of_errors(session, url):
+    res = session.get(f"{url}/missing")
+
+    assert res.status_code == 404 and not res.ok
+    assert res.json() == {"error": "not found"}
+
+
+def test_streamed_track(session, url):
+    with session.get(f"{url}/track", stream=True) as res:
+        assert res.status_code == 200
+        assert int(res.headers["Content-length"]) == len(TRACK)
+        assert b"".join(res.iter_content(16384)) == TRACK
+
+    # A resumed download asks for the rest of the file
+    offset = len(TRACK) - 1000
+
+    with session.get(f"{url}/track", stream=True, headers={"Range": f"bytes={offset}-"}) as res:
+        assert res.status_code == 206
+        assert int(res.headers["Content-Length"]) == 1000
+        assert b"".join(res.iter_content(256)) == TRACK[offset:]
+
+    # A probe closes the response without reading it, the connection is still usable
+    res = session.get(f"{url}/track", stream=True)
+    res.close()
+
+    assert session.get(f"{url}/gw").status_code == 200
+
+
+def test_refused_connection_raises_the_requests_error(session):
+    import socket
+
+    # A port nothing listens on
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    with pytest.raises(OSError) as e:
+        session.get(f"http://127.0.0.1:{port}/gw", timeout=5)
+
+    # Compared by name, deezer-py may load its own eventlet patched copy of requests before the tests import it
+    assert [f"{c.__module__}.{c.__name__}" for c in type(e.value).__mro__][:2] == \
+        ["requests.exceptions.ConnectionError", "requests.exceptions.RequestException"]
@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only imported once a client, a download or a prompt needs them
+HEAVY_MODULES = ["deezer", "requests", "cryptography", "mutagen", "rich", "PyInquirer"]
+
+# Microseconds the package may take to import on its own, far above its usual few milliseconds
+# so only an eager import of a heavy dependency trips it
+IMPORT_BUDGET = 150000
+
+
+def _run(code, *args):
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+
+    return subprocess.run([sys.executable, *args, "-c", code], capture_output=True, text=True, env=env,
+                          check=True, cwd=ROOT)
+
+
+@pytest.mark.parametrize("module", ["pydeezer", "pydeezer.cli"])
+def test_heavy_dependencies_are_not_imported(module):
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+
+    assert _run(code).stdout.strip() == ""
+
+
+def test_help_does_not_import_heavy_dependencies():
+    code = ("import sys\n"
+            "from click.testing import CliRunner\n"
+            "from pydeezer.cli import cli\n"
+            "for command in ([], ['batch'], ['download'], ['serve'], ['scan'], ['watch']):\n"
+            "    assert CliRunner().invoke(cli, command + ['--help']).exit_code == 0\n"
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+
+    assert _run(code).stdout.strip() == ""
+
+
+def test_lazy_attributes_still_import():
+    code = "import pydeezer; [getattr(pydeezer, a) for a in pydeezer._lazy_attributes]; print(pydeezer.Deezer.__name__)"
+
+    assert _run(code).stdout.strip() == "Deezer"
+
+
+def test_import_time_budget():
+    # e.g. "import time:       412 |       2310 | pydeezer"
+    stderr = _run("import pydeezer.cli", "-X", "importtime").stderr
+    times = {}
+
+    for line in stderr.splitlines():
+        parts = [part.strip() for part in line.split(":", 1)[-1].split("|")]
+
+        if len(parts) == 3 and parts[1].isdigit():
+            times[parts[2]] = int(parts[1])
+
+    assert times["pydeezer"] < IMPORT_BUDGET
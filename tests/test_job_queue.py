@@ -0,0 +1,133 @@
+import sys
+import time
+
+import pytest
+
+from pydeezer import JobQueue
+from pydeezer.constants import job_states
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    # The package attribute is the class, the module is only reachable through sys.modules
+    monkeypatch.setattr(sys.modules["pydeezer.JobQueue"], "time", clock)
+
+    return clock
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "queue.db")
+
+
+def test_jobs_are_leased_once(db_path, clock):
+    first = JobQueue(db_path, lease_duration=60, owner="first")
+    second = JobQueue(db_path, lease_duration=60, owner="second")
+
+    assert first.enqueue(["1", "2", "3"]) == 3
+    # Already queued tracks are left untouched
+    assert first.enqueue(["3", "4"]) == 1
+
+    assert [job["id"] for job in first.lease(limit=2)] == ["1", "2"]
+    assert [job["id"] for job in second.lease(limit=5)] == ["3", "4"]
+    assert first.lease() == [] and second.lease() == []
+
+
+def test_expired_lease_goes_to_another_worker(db_path, clock):
+    crashed = JobQueue(db_path, lease_duration=60, owner="crashed")
+    worker = JobQueue(db_path, lease_duration=60, owner="worker")
+
+    crashed.enqueue(["1"])
+    crashed.lease()
+    crashed.update("1", job_states.TRANSFERRING, metadata={"id": "1", "title": "Title"})
+
+    # The lease holds while it is renewed
+    clock.now += 50
+    crashed.renew(["1"])
+    clock.now += 50
+
+    assert worker.lease() == []
+
+    # The crashed worker stops renewing, the job is handed out again with what it had resolved
+    clock.now += 11
+    job, = worker.lease()
+
+    assert job["id"] == "1"
+    assert job["status"] == job_states.TRANSFERRING
+    assert job["metadata"] == {"id": "1", "title": "Title"}
+    assert job["attempts"] == 2
+
+    # The old owner lost the job, its late updates are ignored
+    crashed.finish("1", job_states.FAILED)
+    assert worker.get("1")["status"] == job_states.TRANSFERRING
+
+    worker.finish("1", job_states.DONE, path="/music/Title.mp3", size=2048)
+    job = worker.get("1")
+
+    assert (job["status"], job["path"], job["size"], job["errors"]) == (job_states.DONE, "/music/Title.mp3", 2048, [])
+
+
+def test_finished_jobs_are_not_enqueued_again(db_path, clock):
+    queue = JobQueue(db_path, lease_duration=60)
+
+    queue.enqueue(["1", "2"])
+    queue.lease(limit=2)
+    queue.finish("1", job_states.DONE)
+    queue.finish("2", job_states.FAILED, errors=[{"type": "network"}])
+
+    assert queue.enqueue(["1", "2"]) == 0
+    clock.now += 3600
+    assert queue.lease(limit=2) == []
+    assert queue.counts() == {job_states.DONE: 1, job_states.FAILED: 1}
+
+    # Only the failed ones come back, on request
+    assert queue.retry_failed() == 1
+    assert [job["id"] for job in queue.lease(limit=2)] == ["2"]
+
+
+def test_released_job_is_queued_again(db_path, clock):
+    queue = JobQueue(db_path, lease_duration=60)
+
+    queue.enqueue(["1"])
+    queue.lease()
+    queue.update("1", job_states.RESOLVING)
+    queue.release("1")
+
+    assert queue.get("1")["status"] == job_states.QUEUED
+    assert [job["id"] for job in queue.lease()] == ["1"]
+
+
+def test_downloader_resumes_the_queue(stub_deezer, tmp_path, db_path):
+    from pydeezer import Downloader
+    from pydeezer.ProgressHandler import BaseProgressHandler
+
+    queue = JobQueue(db_path, lease_duration=0.5, owner="crashed")
+    queue.enqueue(["1", "2", "3"])
+
+    # An earlier process finished the first track and crashed while transferring the second one
+    queue.lease(limit=2)
+    queue.finish("1", job_states.DONE, path=str(tmp_path / "Track 1.mp3"), size=2048)
+    queue.update("2", job_states.TRANSFERRING, metadata={
+        "id": "2", "title": "Track 2", "track_token": "token", "md5_origin": "0" * 32, "media_version": "1"})
+
+    # The lease of the crashed process runs out
+    time.sleep(0.6)
+
+    deezer = stub_deezer()
+    # Every track is given again, e.g. the same batch command is run again
+    result = Downloader(deezer, ["1", "2", "3"], str(tmp_path), queue=JobQueue(db_path, lease_duration=0.5),
+                        progress_handler=BaseProgressHandler()).start()
+
+    assert sorted(deezer.transfers) == ["2", "3"]
+    assert result.done_count == 2
+    assert queue.counts() == {job_states.DONE: 3}
+    assert queue.get("2")["path"] == str(tmp_path / "Track 2.mp3")
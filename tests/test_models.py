@@ -0,0 +1,151 @@
+import time
+import tracemalloc
+
+import pytest
+
+from pydeezer import util
+from pydeezer.models import Album, Contributor, Track
+
+
+def _gw_track(i):
+    return {
+        "SNG_ID": str(i),
+        "SNG_TITLE": f"Title {i}",
+        "ALB_ID": str(100000 + i // 10),
+        "ALB_PICTURE": f"{i:032x}",
+        "ALB_TITLE": f"Album {i // 10}",
+        "ARTISTS": [{
+            "ART_ID": str(200000 + i % 50 + n),
+            "ART_NAME": f"Artist {n}",
+            "ROLE_ID": "0" if n == 0 else "5",
+            "ART_PICTURE": f"{i + n:032x}",
+            "RANK": "1000",
+            "LOCALES": [],
+            "SMARTRADIO": 0,
+            "__TYPE__": "artist"
+        } for n in range(3)],
+        "MD5_ORIGIN": f"{i:032x}",
+        "PHYSICAL_RELEASE_DATE": "2020-01-01",
+        "TRACK_NUMBER": str(i % 12 + 1),
+        "DISK_NUMBER": "1",
+        "DURATION": "215",
+        "EXPLICIT_LYRICS": "0",
+        "EXPLICIT_TRACK_CONTENT": {"EXPLICIT_LYRICS_STATUS": 0, "EXPLICIT_COVER_STATUS": 0},
+        "ISRC": f"USABC{i:07d}",
+        "MEDIA_VERSION": "1",
+        "TRACK_TOKEN": "token",
+        "TRACK_TOKEN_EXPIRE": 1700000000,
+        "MEDIA": [{"TYPE": "preview", "HREF": f"https://cdns-preview.dzcdn.net/{i}.mp3"}],
+        "__TYPE__": "song"
+    }
+
+
+def _measure(map_track, tracks):
+    # Memory held by the mapped tracks once built
+    tracemalloc.start()
+
+    try:
+        mapped = [map_track(track) for track in tracks]
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    return mapped, size
+
+
+def _time(map_track, tracks):
+    # Untraced, tracemalloc slows every allocation down
+    start = time.perf_counter()
+    [map_track(track) for track in tracks]
+
+    return time.perf_counter() - start
+
+
+def test_compact_track_reads_like_the_mapped_dict():
+    gw_track = _gw_track(7)
+    mapped = util.map_gw_track(gw_track)
+    track = util.map_gw_track(gw_track, compact=True)
+
+    assert isinstance(track, Track)
+    assert track.to_dict() == mapped
+    assert dict(track)["title"] == mapped["title"]
+    assert len(track) == len(mapped) and list(track) == list(mapped)
+
+    for key, value in mapped.items():
+        assert key in track
+        assert track.get(key) == (track[key] if key in ("album", "artist", "contributors") else value)
+
+    assert track["album"]["id"] == mapped["album"]["id"]
+    assert track["artist"]["name"] == "Artist 0"
+    assert [c["role"] for c in track["contributors"]] == ["Main", "Featured", "Featured"]
+    assert track["release_date"] == "2020-01-01"
+
+    assert "md5" not in track and "picture" not in track["album"]
+    assert track.get("md5") is None and track.get("md5", "default") == "default"
+
+    with pytest.raises(KeyError):
+        track["md5"]
+
+    # Only the listed keys are reachable through the mapping, not the other attributes
+    with pytest.raises(KeyError):
+        track["to_dict"]
+
+
+def test_album_and_contributor_read_like_the_mapped_dicts():
+    mapped = util.map_gw_track(_gw_track(3))
+    track = Track.from_gw(_gw_track(3))
+
+    assert isinstance(track["album"], Album) and isinstance(track["artist"], Contributor)
+    assert dict(track["album"]) == mapped["album"]
+    assert dict(track["artist"]) == mapped["artist"]
+    assert track["artist"].get("picture_xl") == mapped["artist"]["picture_xl"]
+    assert "cover_small" in track["album"] and "picture_small" in track["artist"]
+
+
+def test_image_urls_are_built_on_access():
+    album = Album("1", "a" * 32, "Album")
+    artist = Contributor("2", "Artist", "Main", md5_picture="b" * 32)
+
+    # Only the md5 is stored, the urls are not attributes of their own
+    assert "cover_xl" not in Album.__slots__ and not hasattr(album, "__dict__")
+    assert "picture_xl" not in Contributor.__slots__ and not hasattr(artist, "__dict__")
+
+    assert album["cover_xl"] == f"https://e-cdns-images.dzcdn.net/images/cover/{'a' * 32}/1000x1000-000000-80-0-0.jpg"
+    assert album.cover_url(120).endswith("/120x120-000000-80-0-0.jpg")
+
+    album.md5_image = "c" * 32
+    artist.md5_picture = "d" * 32
+
+    assert "c" * 32 in album["cover_medium"]
+    assert "d" * 32 in artist["picture_big"]
+    assert album["cover"] == "https://api.deezer.com/album/1/image"
+
+
+def test_compact_tracks_take_a_fraction_of_the_memory():
+    tracks = [_gw_track(i) for i in range(2000)]
+
+    _, dict_size = _measure(util.map_gw_track, tracks)
+    _, compact_size = _measure(Track.from_gw, tracks)
+
+    assert compact_size * 4 < dict_size
+
+
+@pytest.mark.slow
+def test_compact_models_memory_and_time():
+    # The comparison of the user-facing mapping on 20k tracks with 3 contributors each
+    tracks = [_gw_track(i) for i in range(20000)]
+    results = {}
+
+    for name, map_track in (("dicts", util.map_gw_track),
+                            ("compact", lambda track: util.map_gw_track(track, compact=True))):
+        size = _measure(map_track, tracks)[1]
+        # Best of a few runs, the first one also warms up the caches of the interpreter
+        elapsed = min(_time(map_track, tracks) for _ in range(3))
+        results[name] = size, elapsed
+
+        print(f"{name:8} {size / 1024 / 1024:6.1f} MB {size / len(tracks):6.0f} B/track {elapsed * 1000:5.0f} ms")
+
+    assert results["compact"][0] * 4 < results["dicts"][0]
+    # Building the slotted objects costs about as much as formatting the urls of the dicts,
+    # the bound leaves room for the noise of a shared machine
+    assert results["compact"][1] < results["dicts"][1] * 1.5
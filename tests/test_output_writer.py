@@ -0,0 +1,154 @@
+import os
+
+import pytest
+
+from pydeezer import OutputWriter
+
+DATA = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    calls = []
+    fsync = os.fsync
+
+    def counted(fd):
+        calls.append(fd)
+        fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", counted)
+
+    return calls
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_file_is_renamed_once_complete(tmp_path, use_mmap):
+    file_path = str(tmp_path / "track.mp3")
+    writer = OutputWriter(buffer_size=100, use_mmap=use_mmap)
+
+    with writer.open(file_path, len(DATA)) as f:
+        f.write(DATA[:500])
+
+        # Only the temporary file exists while the download runs
+        assert not os.path.exists(file_path)
+        assert os.path.exists(writer.temp_path(file_path))
+
+        f.write(DATA[500:])
+
+    with open(file_path, "rb") as f:
+        assert f.read() == DATA
+
+    assert os.listdir(tmp_path) == ["track.mp3"]
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_failed_download_is_resumed_from_the_part_file(tmp_path, use_mmap):
+    file_path = str(tmp_path / "track.mp3")
+    writer = OutputWriter(buffer_size=100, use_mmap=use_mmap)
+
+    # An older copy stays in place until the new one is complete
+    with open(file_path, "wb") as f:
+        f.write(b"old")
+
+    with pytest.raises(ConnectionError):
+        with writer.open(file_path, len(DATA)) as f:
+            f.write(DATA[:300])
+            raise ConnectionError
+
+    with open(file_path, "rb") as f:
+        assert f.read() == b"old"
+
+    # The preallocated space is given back, the temporary file holds the received data
+    offset = writer.resume_offset(file_path)
+
+    assert offset == 300
+    assert os.path.getsize(writer.temp_path(file_path)) == 300
+
+    with writer.open(file_path, len(DATA), offset=offset) as f:
+        f.write(DATA[offset:])
+
+    with open(file_path, "rb") as f:
+        assert f.read() == DATA
+
+    assert os.listdir(tmp_path) == ["track.mp3"]
+
+
+def test_crashed_download_is_resumed_from_the_checkpoint(tmp_path):
+    file_path = str(tmp_path / "track.mp3")
+    writer = OutputWriter(buffer_size=100)
+
+    f = writer.open(file_path, len(DATA))
+    f.write(DATA[:200])
+    # Still in the buffer when the process dies without closing the file
+    f.write(DATA[200:250])
+    # The preallocated file is full size
+    os.close(f._fd)
+
+    temp_path = writer.temp_path(file_path)
+
+    assert os.path.getsize(temp_path) == len(DATA)
+    assert os.path.exists(temp_path + OutputWriter.POSITION_SUFFIX)
+    assert writer.resume_offset(file_path) == 200
+
+    # Without the checkpoint, the size of the temporary file is all there is
+    os.remove(temp_path + OutputWriter.POSITION_SUFFIX)
+    os.truncate(temp_path, 200)
+
+    assert writer.resume_offset(file_path) == 200
+    assert writer.resume_offset(str(tmp_path / "other.mp3")) == 0
+
+    with writer.open(file_path, len(DATA), offset=200) as f:
+        f.write(DATA[200:])
+
+    with open(file_path, "rb") as f:
+        assert f.read() == DATA
+
+    assert os.listdir(tmp_path) == ["track.mp3"]
+
+
+@pytest.mark.parametrize("buffer_size", [100, 4096])
+def test_mmap_takes_more_bytes_than_announced(tmp_path, buffer_size):
+    file_path = str(tmp_path / "track.mp3")
+    writer = OutputWriter(buffer_size=buffer_size, use_mmap=True)
+
+    with writer.open(file_path, 600) as f:
+        for i in range(0, len(DATA), 100):
+            f.write(DATA[i:i + 100])
+
+    with open(file_path, "rb") as f:
+        assert f.read() == DATA
+
+
+def test_fsync_policies(tmp_path, fsyncs):
+    def download(writer, name):
+        with writer.open(str(tmp_path / name), len(DATA)) as f:
+            f.write(DATA)
+
+    download(OutputWriter(fsync=OutputWriter.NONE), "none.mp3")
+
+    assert fsyncs == []
+
+    # The file and then its directory, once renamed
+    download(OutputWriter(fsync=OutputWriter.FILE), "file.mp3")
+
+    assert len(fsyncs) == 2
+
+    del fsyncs[:]
+    writer = OutputWriter(fsync=OutputWriter.BATCH, fsync_batch=2)
+    download(writer, "batch1.mp3")
+
+    assert fsyncs == []
+
+    # Both files and their shared directory
+    download(writer, "batch2.mp3")
+
+    assert len(fsyncs) == 3
+
+    del fsyncs[:]
+    download(writer, "batch3.mp3")
+    writer.flush()
+
+    assert len(fsyncs) == 2
+
+    with pytest.raises(ValueError):
+        OutputWriter(fsync="always")
@@ -0,0 +1,140 @@
+import os
+import socket
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from pydeezer import PathTemplate
+
+
+def _fields(track_id, title="Same title"):
+    return PathTemplate.fields(track_id, {}, {"title": title}, "MP3_320")
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+
+    return process.pid
+
+
+def _placeholder(file_path, owner, pid):
+    with open(file_path, "wb") as f:
+        f.write(PathTemplate.CLAIM_MARKER + f"{owner}\n{socket.gethostname()}\n{pid}".encode())
+
+
+def test_concurrent_claims_get_suffixes(tmp_path):
+    template = PathTemplate("{title}")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        paths = list(pool.map(lambda i: template.resolve(str(tmp_path), _fields(str(i)), ".mp3"), range(8)))
+
+    filenames = sorted(filename for _, filename in paths)
+
+    assert filenames == sorted(["Same title.mp3"] + [f"Same title ({i}).mp3" for i in range(2, 9)])
+    assert not any(template.exists(os.path.join(directory, filename)) for directory, filename in paths)
+
+
+def test_claimer_keeps_its_path(tmp_path):
+    template = PathTemplate("{title}")
+
+    first = template.resolve(str(tmp_path), _fields("1"), ".mp3")
+
+    assert template.resolve(str(tmp_path), _fields("1"), ".mp3") == first
+    assert template.release(os.path.join(*first), "2") is False
+    assert template.release(os.path.join(*first), "1") is True
+    assert not os.path.exists(os.path.join(*first))
+
+
+def test_downloaded_file_keeps_its_path_unless_owned_by_another_track(tmp_path):
+    template = PathTemplate("{title}")
+    file_path = tmp_path / "Same title.mp3"
+    file_path.write_bytes(b"ID3 audio")
+
+    # A file of an earlier run is replaced by the new download and found by a re-run
+    assert template.resolve(str(tmp_path), _fields("1"), ".mp3") == (str(tmp_path), "Same title.mp3")
+    assert template.existing(str(tmp_path), _fields("1"), ".mp3") == str(file_path)
+    assert template.release(str(file_path), "1") is False
+
+    template.set_owner(str(file_path), "1")
+
+    if template.existing(str(tmp_path), _fields("2"), ".mp3") is None:
+        # The filesystem keeps the owner, another track gets a suffix
+        assert template.resolve(str(tmp_path), _fields("2"), ".mp3")[1] == "Same title (2).mp3"
+
+
+def test_stale_placeholders_are_removed(tmp_path):
+    template = PathTemplate("{title}")
+    stale = tmp_path / "Same title.mp3"
+    running = tmp_path / "Other title.mp3"
+    downloaded = tmp_path / "Small.mp3"
+
+    _placeholder(stale, "1", _dead_pid())
+    _placeholder(running, "2", os.getpid())
+    downloaded.write_bytes(b"ID3")
+
+    assert template.remove_stale(str(tmp_path)) == [str(stale)]
+    assert running.exists() and downloaded.exists()
+    # The path of the crashed claim is free again
+    assert template.resolve(str(tmp_path), _fields("3"), ".mp3")[1] == "Same title.mp3"
+
+
+def test_rerun_skips_downloaded_tracks(stub_deezer, tmp_path):
+    from pydeezer import Downloader
+    from pydeezer.ProgressHandler import BaseProgressHandler
+
+    titles = {"1": "Same title", "2": "Same title", "3": "Other title"}
+    # A placeholder left by a crashed run under a path of this run
+    _placeholder(tmp_path / "Other title.mp3", "4", _dead_pid())
+
+    def run(**options):
+        deezer = stub_deezer(titles)
+        result = Downloader(deezer, ["1", "2", "3"], str(tmp_path), concurrent_downloads=3,
+                            progress_handler=BaseProgressHandler(), **options).start()
+
+        return deezer, result
+
+    deezer, result = run()
+    filenames = sorted(os.listdir(tmp_path))
+
+    assert result.done_count == 3 and result.skipped_count == 0
+    assert sorted(deezer.transfers) == ["1", "2", "3"]
+    assert filenames == ["Other title.mp3", "Same title (2).mp3", "Same title.mp3"]
+
+    deezer, result = run()
+
+    assert result.done_count == 3 and result.skipped_count == 3
+    assert deezer.transfers == []
+    assert sorted(os.listdir(tmp_path)) == filenames
+
+    deezer, result = run(overwrite=True)
+
+    assert result.done_count == 3 and result.skipped_count == 0
+    assert sorted(deezer.transfers) == ["1", "2", "3"]
+    assert sorted(os.listdir(tmp_path)) == filenames
+
+
+def test_lyrics_are_named_like_the_track(stub_deezer, tmp_path):
+    from pydeezer import Downloader
+    from pydeezer.ProgressHandler import BaseProgressHandler
+
+    deezer = stub_deezer({"1": "Café Ünïcode: Live?"})
+    deezer.get_track_lyrics = lambda track_id: {
+        "info": {"LYRICS_SYNC_JSON": [{"lrc_timestamp": "[00:01.00]", "line": "Lyrics"}]}}
+
+    Downloader(deezer, ["1"], str(tmp_path), output_template=PathTemplate("{title}"),
+               progress_handler=BaseProgressHandler()).start()
+
+    # The lyrics keep the characters the template kept, not the ascii-only names
+    assert sorted(os.listdir(tmp_path)) == ["Café Ünïcode_ Live_.lrc", "Café Ünïcode_ Live_.mp3"]
+
+
+def test_every_downloading_command_takes_the_path_policies():
+    from click.testing import CliRunner
+
+    from pydeezer.cli import cli
+
+    for command in ("download", "batch", "serve", "watch"):
+        output = CliRunner().invoke(cli, [command, "--help"]).output
+
+        assert "--filesystem" in output and "--unicode" in output
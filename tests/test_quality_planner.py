@@ -0,0 +1,78 @@
+from pydeezer.QualityPlanner import QualityPlanner
+from pydeezer.constants import track_formats
+
+MB = 1024 * 1024
+
+
+def _track(track_id, **sizes):
+    return dict({"SNG_ID": track_id}, **{f"FILESIZE_{quality}": size for quality, size in sizes.items()})
+
+
+def test_skipped_intermediate_quality_is_used():
+    # MP3_320 lies under the hull from MP3_128 to FLAC, FLAC does not fit but MP3_320 does
+    track = _track("1", MP3_128=4 * MB, MP3_320=20 * MB, FLAC=25 * MB)
+
+    plan = QualityPlanner(None, 21 * MB, tag_overhead=0).plan([track])
+
+    assert plan.quality_of("1") == track_formats.MP3_320
+    assert plan.total_size == 20 * MB
+
+
+def test_plan_stays_within_budget():
+    tracks = [_track(str(i), MP3_128=(3 + i % 4) * MB, MP3_320=(8 + i % 5) * MB, FLAC=(25 + i % 7) * MB)
+              for i in range(50)]
+    budget = 700 * MB
+
+    plan = QualityPlanner(None, budget, tag_overhead=0).plan(tracks)
+
+    assert len(plan) == 50
+    assert plan.fits
+    assert plan.total_size <= budget
+
+    # What is left does not pay for a better quality of any track
+    left = budget - plan.total_size
+    qualities = [track_formats.MP3_128, track_formats.MP3_320, track_formats.FLAC]
+
+    for track in tracks:
+        planned = plan.quality_of(track["SNG_ID"])
+        size = track[f"FILESIZE_{planned}"]
+
+        assert all(track[f"FILESIZE_{quality}"] - size > left for quality in qualities[qualities.index(planned) + 1:])
+
+
+def test_planned_track_never_goes_below_min_quality(tmp_path):
+    from pydeezer import Deezer, Downloader
+    from pydeezer.QualityPlanner import QualityPlan
+    from pydeezer.ProgressHandler import BaseProgressHandler
+    from pydeezer.constants import error_types, job_states
+    from pydeezer.exceptions import QualityUnavailableError
+
+    requested = []
+
+    class StubDeezer(Deezer):
+        # Every url resolves, but the CDN refuses each quality once the transfer starts
+        def get_track_info(self, track_id, **kwargs):
+            return {"id": track_id, "title": "Title"}
+
+        def get_track_tags(self, track, **kwargs):
+            return {"title": track["title"]}
+
+        def get_track_download_url(self, track, quality=None, **kwargs):
+            # Like the real one, no quality means MP3_128
+            quality = quality or track_formats.MP3_128
+            requested.append(quality)
+            return "https://cdn/track", quality
+
+        def download_track(self, track, download_dir, **kwargs):
+            raise QualityUnavailableError(f"Track {track['id']} is not available.")
+
+    plan = QualityPlan(100 * MB, track_formats.MP3_320, track_formats.FLAC, 0)
+    plan.add({"SNG_ID": "1"}, track_formats.FLAC, 30 * MB)
+
+    result = Downloader(StubDeezer(), ["1"], str(tmp_path), quality=track_formats.FLAC, quality_plan=plan,
+                        progress_handler=BaseProgressHandler()).start()
+    job = result.jobs[0]
+
+    assert requested == [track_formats.FLAC, track_formats.MP3_320]
+    assert job.state == job_states.FAILED
+    assert job.errors[-1]["type"] == error_types.QUALITY_UNAVAILABLE
@@ -0,0 +1,96 @@
+import pytest
+
+from pydeezer import Scheduler
+from pydeezer.constants import track_formats
+
+
+def _track(track_id, **sizes):
+    return {"SNG_ID": track_id, **{f"FILESIZE_{quality}": size for quality, size in sizes.items()}}
+
+
+def _ids(tracks):
+    return [track["SNG_ID"] if isinstance(track, dict) else track for track in tracks]
+
+
+def _pop_all(scheduler):
+    tracks = []
+
+    while len(scheduler):
+        tracks.append(scheduler.pop())
+
+    return _ids(tracks)
+
+
+TRACKS = [_track("1", MP3_320=3000), "2", _track("3", MP3_320=1000), _track("4", MP3_320=2000),
+          _track("5", MP3_320=1000)]
+
+
+@pytest.mark.parametrize("policy, order", [
+    (Scheduler.FIFO, ["1", "2", "3", "4", "5"]),
+    # Equal sizes keep their input order, the unknown sizes go last
+    (Scheduler.SHORTEST_FIRST, ["3", "5", "4", "1", "2"]),
+    (Scheduler.LONGEST_FIRST, ["1", "4", "3", "5", "2"]),
+])
+def test_policies(policy, order):
+    scheduler = Scheduler(policy)
+
+    for track in TRACKS:
+        scheduler.push(track)
+
+    assert _ids(scheduler.peek(2)) == order[:2]
+    assert _pop_all(scheduler) == order
+    assert scheduler.pop() is None
+
+
+def test_priorities_go_first_whatever_the_policy():
+    scheduler = Scheduler(Scheduler.SHORTEST_FIRST)
+
+    for track in TRACKS:
+        scheduler.push(track)
+
+    scheduler.push(_track("6", MP3_320=9000), priority=1)
+    scheduler.push("7", priority=2)
+
+    assert _pop_all(scheduler) == ["7", "6", "3", "5", "4", "1", "2"]
+
+    with pytest.raises(ValueError):
+        Scheduler("random")
+
+
+def test_expected_size_of_the_given_quality():
+    track = _track("1", MP3_128=1000, FLAC=9000)
+
+    assert Scheduler.expected_size(track, track_formats.FLAC) == 9000
+    # Falls back like the downloads do
+    assert Scheduler.expected_size(track, track_formats.MP3_320) == 1000
+    assert Scheduler.expected_size("1", track_formats.MP3_320) is None
+
+    scheduler = Scheduler(Scheduler.SHORTEST_FIRST, quality=track_formats.FLAC)
+    scheduler.push(_track("1", MP3_128=1000, FLAC=9000), quality=track_formats.MP3_128)
+    scheduler.push(_track("2", MP3_128=3000, FLAC=5000))
+
+    assert _pop_all(scheduler) == ["1", "2"]
+
+
+def test_downloader_orders_by_the_planned_quality(stub_deezer, tmp_path):
+    from pydeezer import Downloader
+    from pydeezer.QualityPlanner import QualityPlan
+
+    # The first track only fits the budget in a lower quality, the second one keeps FLAC
+    tracks = [_track("1", MP3_128=3000, FLAC=30000), _track("2", MP3_128=4000, FLAC=20000),
+              _track("3", MP3_128=5000, FLAC=25000)]
+    plan = QualityPlan(60000, track_formats.MP3_128, track_formats.FLAC, 0)
+
+    for track, quality in zip(tracks, (track_formats.MP3_128, track_formats.FLAC, track_formats.MP3_128)):
+        plan.add(track, quality, int(track[f"FILESIZE_{quality}"]))
+
+    downloader = Downloader(stub_deezer(), tracks, str(tmp_path), quality=track_formats.FLAC,
+                            scheduling=Scheduler.SHORTEST_FIRST, quality_plan=plan)
+
+    assert _ids(iter(downloader._next_track, None)) == ["1", "3", "2"]
+
+    downloader.add(_track("4", MP3_128=1000, FLAC=50000))
+    downloader.add(_track("5", MP3_128=1000, FLAC=10000))
+
+    # A track missing from the plan gets the quality of the downloader
+    assert _ids(iter(downloader._next_track, None)) == ["5", "4"]
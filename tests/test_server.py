@@ -0,0 +1,136 @@
+import threading
+import time
+
+import pytest
+
+from pydeezer.constants import job_states, track_formats
+from pydeezer.exceptions import APIRequestError
+
+
+@pytest.fixture
+def serve(tmp_path):
+    """Starts a {Server} around the given client on a free port, returns it with a connected {Client}"""
+
+    from pydeezer import Client, Server
+
+    started = []
+
+    def start(deezer, socket_path=None, **options):
+        server = Server(deezer, str(tmp_path / "music"), port=0, socket_path=socket_path, **options)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        started.append((server, thread))
+
+        if socket_path:
+            return server, Client(socket_path=socket_path, timeout=5)
+
+        return server, Client(server.address, timeout=5)
+
+    yield start
+
+    for server, thread in started:
+        server.shutdown()
+        thread.join(10)
+
+
+def _wait(client, track_id, timeout=10):
+    deadline = time.time() + timeout
+
+    while time.time() < deadline:
+        try:
+            status = client.status(track_id)
+        except APIRequestError:
+            status = None
+
+        if status and status["state"] in (job_states.DONE, job_states.FAILED, job_states.CANCELLED):
+            return status
+
+        time.sleep(0.01)
+
+    raise AssertionError(f"Job {track_id} did not finish")
+
+
+def test_submitted_tracks_are_downloaded(serve, stub_deezer):
+    deezer = stub_deezer()
+    server, client = serve(deezer)
+
+    assert client.submit(["1", "track:2"]) == {"queued": ["1", "2"], "expanding": []}
+
+    for track_id in ("1", "2"):
+        status = _wait(client, track_id)
+
+        assert status["state"] == job_states.DONE
+        assert status["path"].endswith(f"Track {track_id}.mp3")
+
+    assert sorted(job["id"] for job in client.jobs(state=job_states.DONE)) == ["1", "2"]
+
+    # A track submitted again is skipped, its file is already there
+    client.submit(["1"])
+    assert _wait(client, "1")["skipped"]
+
+    metrics = client.metrics()
+
+    assert metrics["jobs"]["done"] == 3
+    assert metrics["jobs"]["skipped"] == 1
+    assert metrics["bytes"] == 2 * 2048
+    assert sorted(deezer.transfers) == ["1", "2"]
+
+
+def test_unknown_jobs_and_endpoints_are_errors(serve, stub_deezer):
+    server, client = serve(stub_deezer())
+
+    with pytest.raises(APIRequestError, match="Unknown job"):
+        client.status("404")
+
+    with pytest.raises(APIRequestError, match="Unknown job"):
+        client.cancel("404")
+
+    with pytest.raises(APIRequestError):
+        client.submit(["https://example.com/not-deezer"])
+
+    assert client._request("GET", "/metrics")["jobs"]["done"] == 0
+
+
+def test_history_is_bounded(serve, stub_deezer):
+    server, client = serve(stub_deezer(), history=1)
+
+    client.submit(["1"])
+    _wait(client, "1")
+    client.submit(["2"])
+    _wait(client, "2")
+
+    # The server result only keeps the counters, the finished jobs live in the bounded history
+    assert server.downloader.result.jobs == []
+    assert server.downloader.result.done_count == 2
+    assert [job["id"] for job in client.jobs()] == ["2"]
+
+    with pytest.raises(APIRequestError):
+        client.status("1")
+
+
+def test_albums_are_expanded_with_an_account_pool(serve, stub_deezer):
+    from pydeezer import AccountPool
+
+    deezer = stub_deezer()
+    deezer.current_user = {"name": "stub"}
+    deezer.get_allowed_qualities = lambda: list(track_formats.FORMAT_LIST)
+    deezer.iter_album_tracks = lambda album_id: iter(["11", "12"])
+
+    server, client = serve(AccountPool([deezer]))
+
+    assert client.submit(["album:302127"]) == {"queued": [], "expanding": ["album:302127"]}
+
+    for track_id in ("11", "12"):
+        assert _wait(client, track_id)["state"] == job_states.DONE
+
+    # The listing borrowed the account as well
+    assert client.metrics()["accounts"][0]["successes"] == 3
+
+
+def test_client_over_unix_socket(serve, stub_deezer, tmp_path):
+    server, client = serve(stub_deezer(), socket_path=str(tmp_path / "pydeezer.sock"))
+
+    client.submit(["1"])
+
+    assert _wait(client, "1")["state"] == job_states.DONE
+    assert client.set_limits(rate=1024)["rate"] == 1024
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+
+import pytest
+
+from pydeezer import SingleFlight
+
+
+def _waiters(flight, key, function, count):
+    # Starts {count} callers while the first call is held in flight, returns their results or exceptions
+    results = [None] * count
+
+    def call(i):
+        try:
+            results[i] = flight.do(key, function)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+
+    for thread in threads:
+        thread.start()
+
+    return threads, results
+
+
+def _wait_for_waiters(flight, count):
+    # Every caller but the leader waits on the call
+    while flight.stats()["coalesced"] < count - 1:
+        threading.Event().wait(0.001)
+
+
+def test_waiters_share_the_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def function():
+        calls.append(1)
+        release.wait(5)
+
+        return {"id": "1", "contributors": ["Artist"]}
+
+    threads, results = _waiters(flight, ("song.getData", "1"), function, 4)
+    _wait_for_waiters(flight, 4)
+    release.set()
+
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert all(result == {"id": "1", "contributors": ["Artist"]} for result in results)
+    # Every caller may change its own copy
+    assert len({id(result) for result in results}) == 4
+    assert flight.stats() == {"calls": 4, "coalesced": 3, "in_flight": 0}
+
+    # Nothing is kept once the call returned
+    assert flight.do(("song.getData", "1"), lambda: "again") == "again"
+
+
+def test_waiters_get_the_exception():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def function():
+        release.wait(5)
+
+        raise ValueError("Track not found")
+
+    threads, results = _waiters(flight, "key", function, 3)
+    _wait_for_waiters(flight, 3)
+    release.set()
+
+    for thread in threads:
+        thread.join(5)
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len({id(result) for result in results}) == 1
+    assert flight.stats()["in_flight"] == 0
+
+    # The failed call is not remembered either
+    assert flight.do("key", lambda: "retried") == "retried"
+
+
+def test_different_keys_are_not_coalesced():
+    flight = SingleFlight()
+
+    assert [flight.do(key, lambda key=key: key) for key in ("a", "b", "a")] == ["a", "b", "a"]
+    assert flight.stats()["coalesced"] == 0
+
+
+def test_async_waiters_share_one_task():
+    flight = SingleFlight()
+    calls = []
+
+    async def function():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+
+        return ["Track"]
+
+    async def failing():
+        await asyncio.sleep(0.01)
+
+        raise ValueError("Track not found")
+
+    async def main():
+        results = await asyncio.gather(*[flight.do_async("key", function) for _ in range(3)])
+        errors = await asyncio.gather(*[flight.do_async("failing", failing) for _ in range(2)],
+                                      return_exceptions=True)
+
+        return results, errors
+
+    results, errors = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert results == [["Track"]] * 3
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert flight.stats() == {"calls": 5, "coalesced": 3, "in_flight": 0}
+
+    with pytest.raises(ValueError):
+        asyncio.run(flight.do_async("failing", failing))
@@ -0,0 +1,116 @@
+import sys
+
+import pytest
+
+from pydeezer import TokenManager
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class _Gw:
+    # Answers song.getListData with tokens valid for an hour, leaves the {missing} tracks out
+    def __init__(self, clock, missing=()):
+        self.clock = clock
+        self.missing = missing
+        self.requests = []
+
+    def api_call(self, method, params):
+        self.requests.append(params["sng_ids"])
+
+        return {"data": [{"SNG_ID": track_id, "TRACK_TOKEN": f"token {len(self.requests)}",
+                          "TRACK_TOKEN_EXPIRE": int(self.clock.now) + 3600}
+                         for track_id in params["sng_ids"] if track_id not in self.missing]}
+
+
+class _Deezer:
+    def __init__(self, gw):
+        self.gw = gw
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    # The package attribute is the class, the module is only reachable through sys.modules
+    monkeypatch.setattr(sys.modules["pydeezer.TokenManager"], "time", clock)
+
+    return clock
+
+
+def test_expiring_tracks_are_renewed_in_bulk(clock):
+    gw = _Gw(clock, missing=["3"])
+    manager = TokenManager(_Deezer(gw), batch_size=2)
+    fresh = {"SNG_ID": "4", "TRACK_TOKEN_EXPIRE": int(clock.now) + 3600}
+
+    assert not manager.is_prepared("1")
+    assert manager.is_prepared(fresh)
+
+    manager.prepare(["1", "2", "3", fresh])
+
+    assert gw.requests == [["1", "2"], ["3"]]
+    assert all(manager.is_prepared(track) for track in ("1", "2", "3", fresh))
+
+    assert manager.take("1")["TRACK_TOKEN"] == "token 1"
+    # Left for the worker to resolve, not asked for again
+    assert manager.take("3") == "3"
+    assert manager.take(fresh) is fresh
+    assert manager.stats() == {"requests": 2, "renewed": 2, "resolved": 0, "waiting": 1}
+
+
+def test_renewed_track_expiring_again_is_renewed_again(clock):
+    gw = _Gw(clock)
+    manager = TokenManager(_Deezer(gw), margin=600)
+
+    manager.prepare(["1"])
+    clock.now += 2000
+
+    assert manager.is_prepared("1")
+
+    # Waited in the scheduler until its renewed token is within the margin
+    clock.now += 1100
+
+    assert not manager.is_prepared("1")
+
+    manager.prepare(["1"])
+
+    assert len(gw.requests) == 2
+    assert manager.take("1")["TRACK_TOKEN"] == "token 2"
+
+
+def test_tracks_never_taken_are_evicted(clock):
+    gw = _Gw(clock, missing=["3"])
+    manager = TokenManager(_Deezer(gw), margin=600,
+                           resolver=lambda deezer, tracks, quality: {
+                               track["SNG_ID"]: (f"https://cdn/{track['SNG_ID']}", quality) for track in tracks})
+    fresh = {"SNG_ID": "4", "TRACK_TOKEN_EXPIRE": int(clock.now) + 1800}
+
+    # e.g. cancelled or skipped before their turn
+    manager.prepare(["1", "2", "3", fresh], "MP3_320")
+
+    assert manager.stats()["waiting"] == 4
+    assert manager.stats()["resolved"] == 3
+
+    # The track the request did not return may be asked for again
+    clock.now += 601
+    manager.prepare([])
+
+    assert manager.stats()["waiting"] == 3
+
+    # The renewed tracks are expiring, the fresh one expired
+    clock.now += 2400
+    manager.prepare([])
+
+    assert manager.stats()["waiting"] == 0
+    assert manager.take_url("1") == ("https://cdn/1", "MP3_320")
+    assert manager.take_url("4") is None
+
+    # The urls live as long as their token
+    clock.now += 600
+    manager.prepare([])
+
+    assert manager._urls == {}